@@ -0,0 +1,7 @@
+# api/__init__.py
+# Rutas HTTP servidas directamente por el servidor Flask de la app (fuera de los callbacks de Dash).
+
+from api.exportacion import bp_exportacion, url_exportacion, opciones_formato_exportacion
+from api.kpis import bp_kpis
+from api.memoria import bp_memoria
+from api.precalculo import bp_precalculo
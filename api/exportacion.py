@@ -0,0 +1,105 @@
+# api/exportacion.py
+# Descarga de los registros filtrados de cada página. Se sirve desde una ruta Flask con respuesta en
+# streaming, así el archivo no viaja dentro del JSON de un callback ni bloquea a los demás.
+
+import os
+import tempfile
+import traceback
+from urllib.parse import urlencode
+
+import dash
+import pandas as pd
+from flask import Blueprint, Response, abort, request, stream_with_context
+
+from datos import obtener_dataset, obtener_textos
+from datos.exportacion import (
+    FORMATOS_EXPORTACION, COLUMNAS_EXPORTACION, formato_disponible, filas_pagina, columnas_pagina,
+    csv_en_bloques, escribir_xlsx, escribir_parquet,
+)
+from datos.filtros import rango_desde_slider
+
+bp_exportacion = Blueprint('exportacion', __name__)
+
+# Tamaño de lectura al enviar archivos temporales (xlsx/parquet)
+BLOQUE_ENVIO_BYTES = 1024 * 1024
+
+ETIQUETAS_FORMATO = {'csv': 'CSV (.csv)', 'xlsx': 'Excel (.xlsx)', 'parquet': 'Parquet (.parquet)'}
+
+
+# --- Helpers para las páginas ---
+def opciones_formato_exportacion():
+    """Opciones del dropdown de formato (deshabilitadas si falta la librería)."""
+    return [{'label': ETIQUETAS_FORMATO[f], 'value': f, 'disabled': not formato_disponible(f)} for f in FORMATOS_EXPORTACION]
+
+
+def url_exportacion(pagina, formato, rango_fechas_slider, **filtros):
+    """URL relativa de descarga con los filtros actuales de la página."""
+    parametros = {'formato': formato or 'csv'}
+    if rango_fechas_slider:
+        parametros['desde'], parametros['hasta'] = int(rango_fechas_slider[0]), int(rango_fechas_slider[1])
+    parametros.update({k: v for k, v in filtros.items() if v})
+    return dash.get_relative_path(f"/exportar/{pagina}") + '?' + urlencode(parametros)
+
+
+def _enviar_y_borrar(ruta):
+    try:
+        with open(ruta, 'rb') as f:
+            while True:
+                datos = f.read(BLOQUE_ENVIO_BYTES)
+                if not datos:
+                    break
+                yield datos
+    finally:
+        os.remove(ruta)
+
+
+# --- Ruta de descarga ---
+@bp_exportacion.route('/exportar/<pagina>')
+def exportar(pagina):
+    if pagina not in COLUMNAS_EXPORTACION:
+        abort(404)
+    formato = request.args.get('formato', 'csv')
+    if formato not in FORMATOS_EXPORTACION:
+        abort(400, description=f"Formato no soportado: {formato}")
+    if not formato_disponible(formato):
+        abort(501, description=f"Formato '{formato}' no disponible en este servidor (falta la librería).")
+
+    fecha_inicio = fecha_fin = None
+    try:
+        if request.args.get('desde') and request.args.get('hasta'):
+            fecha_inicio, fecha_fin = rango_desde_slider([request.args['desde'], request.args['hasta']])
+    except ValueError:
+        abort(400, description="Rango de fechas inválido.")
+
+    df, version = obtener_dataset()
+    textos = obtener_textos()
+    filas = filas_pagina(df, pagina, fecha_inicio, fecha_fin,
+                         producto=request.args.get('producto'), maquina=request.args.get('maquina'),
+                         planta=request.args.get('planta'), textos=textos)
+    columnas = columnas_pagina(df, pagina, textos)
+    extension, tipo_mime = FORMATOS_EXPORTACION[formato]
+    nombre = f"{pagina}_{pd.Timestamp.now():%Y%m%d_%H%M}.{extension}"
+    print(f"Exportando {len(filas)} registros de '{pagina}' en {formato} (versión {version}).")
+
+    if formato == 'csv':
+        cuerpo = stream_with_context(csv_en_bloques(df, filas, columnas, textos=textos))
+    else:
+        # Excel y Parquet necesitan el archivo completo (índices al final): se escriben por bloques a un
+        # temporal en disco y se envían de a BLOQUE_ENVIO_BYTES.
+        descriptor, ruta = tempfile.mkstemp(suffix=f".{extension}")
+        os.close(descriptor)
+        try:
+            if formato == 'xlsx':
+                escribir_xlsx(df, filas, columnas, ruta, hoja=pagina, textos=textos)
+            else:
+                escribir_parquet(df, filas, columnas, ruta, textos=textos)
+        except Exception:
+            traceback.print_exc()
+            os.remove(ruta)
+            abort(500)
+        cuerpo = _enviar_y_borrar(ruta)
+
+    respuesta = Response(cuerpo, mimetype=tipo_mime)
+    respuesta.headers['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    respuesta.headers['Cache-Control'] = 'no-store'
+    return respuesta
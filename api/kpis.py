@@ -0,0 +1,112 @@
+# api/kpis.py
+# API JSON de solo lectura con los KPIs del tablero para otros sistemas de planta.
+# Usa el mismo motor que las páginas (datos/kpis.py). Las respuestas llevan ETag y Last-Modified
+# de la versión del dataset: un sondeo sin cambios en el CSV recibe 304 sin recalcular nada.
+
+import math
+
+import numpy as np
+import pandas as pd
+from flask import Blueprint, Response, abort, jsonify, request
+from werkzeug.http import is_resource_modified
+
+from datos import CacheLRU, obtener_dataset, obtener_indice_fechas, fecha_version
+from datos.columnas import COLUMNA_MAQUINA_PROD, COLUMNA_UNIDAD, COLUMNA_CANTIDAD
+from datos.filtros import VALORES_SIN_FILTRO, filas_produccion
+from datos.kpis import (
+    VALOR_TODAS, kpis_resumen, kpis_comparativos, agregar_produccion_por_maquina, produccion_diaria_por_maquina, fin_del_dia,
+)
+
+bp_kpis = Blueprint('kpis', __name__, url_prefix='/api/kpis')
+
+# Respuestas ya calculadas. Clave: (ruta, versión del dataset, parámetros)
+cache_respuestas = CacheLRU(max_entradas=128)
+
+
+# --- Helpers ---
+def _a_json(valor):
+    """Convierte tipos de numpy/pandas a tipos JSON (inf/NaN -> None, fechas -> ISO)."""
+    if isinstance(valor, dict): return {str(k): _a_json(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)): return [_a_json(v) for v in valor]
+    if isinstance(valor, (pd.Timestamp, np.datetime64)): return pd.Timestamp(valor).isoformat()
+    if hasattr(valor, 'isoformat'): return valor.isoformat()
+    if isinstance(valor, np.integer): return int(valor)
+    if isinstance(valor, (float, np.floating)): return float(valor) if math.isfinite(valor) else None
+    if valor is pd.NA or valor is pd.NaT: return None
+    return valor
+
+def _registros(df):
+    return _a_json(df.to_dict(orient='records'))
+
+def _rango_fechas(df, version):
+    """Rango pedido (?desde=AAAA-MM-DD&hasta=AAAA-MM-DD); por defecto, todas las fechas de evento. Días
+    completos: las consultas incluyen todo el día `hasta` (la API no tiene slider que lo acote a medianoche)."""
+    indice_fechas = obtener_indice_fechas(df, version)
+    try:
+        desde = pd.Timestamp(request.args['desde']).normalize() if request.args.get('desde') else indice_fechas.fecha_minima()
+        hasta = pd.Timestamp(request.args['hasta']).normalize() if request.args.get('hasta') else indice_fechas.fecha_maxima()
+    except ValueError:
+        abort(400, description="Fechas inválidas: usar AAAA-MM-DD.")
+    if desde is None or hasta is None:
+        abort(404, description="El dataset no tiene fechas de evento.")
+    return desde.normalize(), hasta.normalize()
+
+def _respuesta_condicional(calcular):
+    """304 si el cliente ya tiene esta versión; si no, JSON (cacheado por versión y parámetros). El df y la
+    versión se toman juntos una sola vez: el 304, la clave del cache, el ETag y Last-Modified usan la misma."""
+    try:
+        df, version = obtener_dataset()
+    except FileNotFoundError as e:
+        respuesta = jsonify({'error': f"Archivo de respuestas no encontrado: {e.filename or e}"})
+        respuesta.status_code = 503
+        return respuesta
+    ultima_modificacion = fecha_version(version)
+    if not is_resource_modified(request.environ, etag=version, last_modified=ultima_modificacion):
+        respuesta = Response(status=304)
+    else:
+        clave = (request.path, version, tuple(sorted(request.args.items())))
+        cuerpo = cache_respuestas.obtener(clave)
+        if cuerpo is None:
+            cuerpo = cache_respuestas.guardar(clave, {'version': version, **_a_json(calcular(df, version))})
+        respuesta = jsonify(cuerpo)
+    respuesta.set_etag(version)
+    respuesta.last_modified = ultima_modificacion
+    respuesta.headers['Cache-Control'] = 'no-cache'  # Siempre revalidar (barato: 304)
+    return respuesta
+
+
+# --- Rutas ---
+@bp_kpis.route('/resumen')
+def resumen():
+    """KPIs de la página Resumen: ?desde&hasta&maquina&planta (conteos y producción) y ?producto (comparativos)."""
+    def calcular(df, version):
+        desde, hasta = _rango_fechas(df, version)
+        maquina = request.args.get('maquina') or VALOR_TODAS
+        planta = request.args.get('planta')
+        resultado = kpis_resumen(df, version, [desde.toordinal(), hasta.toordinal()], maquina, planta, incluir_dia_final=True)
+        resultado['comparativos'] = kpis_comparativos(df, version, producto=request.args.get('producto'), planta=planta)
+        return {'desde': desde, 'hasta': hasta, 'maquina': maquina, 'planta': planta, **resultado}
+    return _respuesta_condicional(calcular)
+
+
+@bp_kpis.route('/produccion')
+def produccion():
+    """Agregados de la página Producción: ?producto&maquina&planta&desde&hasta, por máquina/unidad y por día."""
+    def calcular(df, version):
+        desde, hasta = _rango_fechas(df, version)
+        producto = request.args.get('producto')
+        maquina = request.args.get('maquina')
+        planta = request.args.get('planta')
+        df_filtrado = df.iloc[filas_produccion(df, producto, desde, fin_del_dia(hasta), planta)]
+        if maquina not in VALORES_SIN_FILTRO:
+            df_filtrado = df_filtrado[df_filtrado[COLUMNA_MAQUINA_PROD] == maquina]
+        por_maquina = agregar_produccion_por_maquina(df_filtrado).rename(columns={COLUMNA_MAQUINA_PROD: 'maquina', COLUMNA_UNIDAD: 'unidad'})
+        diaria = produccion_diaria_por_maquina(df_filtrado).rename(columns={COLUMNA_MAQUINA_PROD: 'maquina', 'Fecha': 'fecha', COLUMNA_CANTIDAD: 'cantidad'})
+        return {
+            'desde': desde, 'hasta': hasta, 'producto': producto, 'maquina': maquina, 'planta': planta,
+            'registros': len(df_filtrado),
+            'total_por_unidad': df_filtrado.groupby(COLUMNA_UNIDAD)[COLUMNA_CANTIDAD].sum().to_dict(),
+            'por_maquina': _registros(por_maquina),
+            'diaria': _registros(diaria),
+        }
+    return _respuesta_condicional(calcular)
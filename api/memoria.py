@@ -0,0 +1,41 @@
+# api/memoria.py
+# Perfilado de memoria del worker que atiende el pedido: huella de cada estructura en memoria (dataset,
+# particiones, cachés, índices; datos/memoria.py), RSS del proceso y, por callback, pico de memoria y
+# latencia registrados por datos/instrumentacion.py. El perfilado con tracemalloc se activa y desactiva
+# en caliente con POST /api/memoria/perfilado?activo=1|0 (solo en el worker que recibe el pedido).
+
+from flask import Blueprint, jsonify, request
+
+from datos.instrumentacion import activar_perfilado, perfilado_activo, resumen_callbacks
+from datos.memoria import huella_memoria, memoria_proceso
+
+bp_memoria = Blueprint('memoria', __name__, url_prefix='/api/memoria')
+
+
+def _respuesta(cuerpo, estado=200):
+    respuesta = jsonify(cuerpo)
+    respuesta.status_code = estado
+    respuesta.headers['Cache-Control'] = 'no-store'
+    return respuesta
+
+
+@bp_memoria.route('')
+def huella():
+    componentes = huella_memoria()
+    return _respuesta({
+        'rss_bytes': memoria_proceso(),
+        'total_bytes': sum(c['bytes'] for c in componentes),
+        'componentes': componentes,
+        'perfilado_activo': perfilado_activo(),
+        'callbacks': resumen_callbacks(),
+    })
+
+
+@bp_memoria.route('/perfilado', methods=['GET', 'POST'])
+def perfilado():
+    if request.method == 'POST':
+        activo = request.args.get('activo', request.form.get('activo'))
+        if activo not in ('0', '1'):
+            return _respuesta({'error': "Parámetro 'activo' debe ser 0 o 1"}, 400)
+        activar_perfilado(activo == '1')
+    return _respuesta({'perfilado_activo': perfilado_activo()})
@@ -0,0 +1,17 @@
+# api/precalculo.py
+# Estado del precálculo en segundo plano (datos/precalculo.py): qué artefactos hay, de qué versión del
+# dataset, cuánto tardaron y si están al día. Sirve para vigilar que las páginas no calculen en línea.
+
+from flask import Blueprint, jsonify
+
+from datos.precalculo import estado_precalculo
+
+bp_precalculo = Blueprint('precalculo', __name__, url_prefix='/api/precalculo')
+
+
+@bp_precalculo.route('')
+def estado():
+    artefactos = estado_precalculo()
+    respuesta = jsonify({'al_dia': all(a['al_dia'] for a in artefactos), 'artefactos': artefactos})
+    respuesta.headers['Cache-Control'] = 'no-store'
+    return respuesta
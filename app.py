@@ -6,34 +6,44 @@ from dash import html, dcc # dcc para Store
 import pandas as pd
 import plotly.io as pio
 
-# --- Carga de Datos Inicial ---
-# Cargar datos aquí, fuera de cualquier layout o callback
-try:
-    df_original = pd.read_csv('RESPONSES_SIPROSA.csv')
-    # --- Conversiones de Fecha y Numéricas ---
-    df_original['Timestamp'] = pd.to_datetime(df_original['Timestamp'], errors='coerce')
-    df_original['FECHA DE LA PRODUCCIÓN'] = pd.to_datetime(df_original.get('FECHA DE LA PRODUCCIÓN'), errors='coerce') # Usar .get para seguridad
-    df_original['FECHA DEL SUCESO (INCIDENTE)'] = pd.to_datetime(df_original.get('FECHA DEL SUCESO (INCIDENTE)'), errors='coerce')
-    df_original['CANTIDAD PRODUCIDA'] = pd.to_numeric(df_original.get('CANTIDAD PRODUCIDA'), errors='coerce')
-    df_original.dropna(subset=['Timestamp'], inplace=True) # Timestamp es vital
-
-    # Calcular fecha máxima una vez
-    fecha_maxima_datos = df_original['Timestamp'].max().normalize() if not df_original.empty else pd.Timestamp('now').normalize()
-    fecha_maxima_str = fecha_maxima_datos.isoformat() # Guardar como texto ISO para JSON
-
-    # Convertir el DataFrame principal a JSON para el Store
-    # Usar 'split' orientation es generalmente eficiente
-    data_json = df_original.to_json(date_format='iso', orient='split')
-    print(f"Datos cargados. Fecha máx: {fecha_maxima_str}. Tamaño JSON: {len(data_json)} bytes")
-
-except FileNotFoundError:
-    print("ERROR CRÍTICO: 'RESPONSES_SIPROSA.csv' no encontrado. Creando datos vacíos.")
-    data_json = pd.DataFrame().to_json(date_format='iso', orient='split')
-    fecha_maxima_str = pd.Timestamp('now').normalize().isoformat()
-except Exception as e:
-    print(f"Error cargando datos en app.py: {e}. Creando datos vacíos.")
-    data_json = pd.DataFrame().to_json(date_format='iso', orient='split')
-    fecha_maxima_str = pd.Timestamp('now').normalize().isoformat()
+from api import bp_exportacion, bp_kpis, bp_memoria, bp_precalculo
+from datos import obtener_dataset, archivos_configurados
+from datos.instrumentacion import instrumentar
+from datos.precalculo import iniciar_precalculo
+
+# --- Carga de Datos ---
+# El dataset tipado (todas las plantas configuradas, ver datos/carga.py) vive en el servidor;
+# los stores solo llevan la versión (disparador de inicialización de las páginas) y la fecha máxima.
+# Se leen en cada carga de página (el layout es una función): si el CSV cambió, el navegador recibe la
+# versión nueva y los callbacks que dependen del store vuelven a correr con los datos recargados.
+def datos_stores():
+    """(versión del dataset, fecha máxima en ISO) para los stores; (None, hoy) si no se pudo cargar."""
+    try:
+        df_original, version_datos = obtener_dataset()
+
+        # Calcular fecha máxima (el dataset se cachea por versión: no se relee el CSV si no cambió)
+        fechas_validas = df_original['Timestamp'].dropna()
+        fecha_maxima_datos = fechas_validas.max().normalize() if not fechas_validas.empty else pd.Timestamp('now').normalize()
+        return version_datos, fecha_maxima_datos.isoformat() # Guardar como texto ISO para JSON
+
+    except FileNotFoundError as e:
+        print(f"ERROR CRÍTICO: archivo de respuestas no encontrado ({e}). Las páginas quedarán sin datos.")
+    except Exception as e:
+        print(f"Error cargando datos en app.py: {e}. Las páginas quedarán sin datos.")
+    return None, pd.Timestamp('now').normalize().isoformat()
+
+
+# Carga inicial (deja el dataset en memoria antes de la primera visita)
+data_json, fecha_maxima_str = datos_stores()
+if data_json:
+    print(f"Datos cargados. Fecha máx: {fecha_maxima_str}. Filas: {len(obtener_dataset()[0])} (versión {data_json})")
+
+# Datos derivados pesados (cubo OEE, KPIs comparativos, confiabilidad...) se construyen en un hilo aparte
+# y se guardan en disco; los callbacks solo los leen (ver datos/precalculo.py y /api/precalculo)
+iniciar_precalculo()
+
+# Plantas configuradas (una por archivo de respuestas) para el filtro global
+plantas_configuradas = sorted({planta for planta, _ in archivos_configurados()})
 
 
 # --- Configuración de la App ---
@@ -43,6 +53,15 @@ pio.templates.default = "plotly_dark"
 app = dash.Dash(__name__, external_stylesheets=[BOOTSTRAP_THEME], use_pages=True, suppress_callback_exceptions=True) # suppress_callback_exceptions a veces necesario con stores/pages
 server = app.server
 
+# --- Rutas HTTP adicionales (descarga de registros filtrados, API JSON de KPIs, estado del precálculo y memoria) ---
+server.register_blueprint(bp_exportacion)
+server.register_blueprint(bp_kpis)
+server.register_blueprint(bp_precalculo)
+server.register_blueprint(bp_memoria)
+
+# Registro por invocación de callback (latencia y, con el perfilado activo, pico de memoria; ver /api/memoria)
+instrumentar(server)
+
 # --- Navbar Común ---
 navbar = dbc.NavbarSimple(
     children=[
@@ -55,18 +74,28 @@ navbar = dbc.NavbarSimple(
 )
 
 # --- Layout Principal de la Aplicación ---
-app.layout = html.Div([
-    # --- Almacenes de Datos (ocultos) ---
-    # Almacena el DataFrame principal como JSON
-    dcc.Store(id='store-main-data', data=data_json),
-    # Almacena la fecha máxima calculada
-    dcc.Store(id='store-max-date', data=fecha_maxima_str),
-    # Podríamos añadir más stores si fuera necesario para datos pre-calculados
-
-    # --- Elementos Visibles ---
-    navbar,
-    dash.page_container # Contenedor donde se cargan las páginas
-])
+def layout_principal():
+    version_datos, fecha_maxima = datos_stores()
+    return html.Div([
+        # --- Almacenes de Datos (ocultos) ---
+        # Versión del dataset (los datos se leen en el servidor con obtener_dataset)
+        dcc.Store(id='store-main-data', data=version_datos),
+        # Almacena la fecha máxima calculada
+        dcc.Store(id='store-max-date', data=fecha_maxima),
+        # Podríamos añadir más stores si fuera necesario para datos pre-calculados
+
+        # --- Elementos Visibles ---
+        navbar,
+        # Filtro global de planta: lo leen los callbacks de todas las páginas
+        dbc.Container(dbc.Row([
+            dbc.Col(html.Label('Planta:', className="mb-0 small text-muted"), width="auto"),
+            dbc.Col(dcc.Dropdown(id='filtro-planta', options=[{'label': 'Todas', 'value': 'Todas'}] + [{'label': p, 'value': p} for p in plantas_configuradas],
+                                 value='Todas', clearable=False, persistence=True), width=6, md=3),
+        ], className="align-items-center g-2 justify-content-end"), fluid=True, className="dbc"),
+        dash.page_container # Contenedor donde se cargan las páginas
+    ])
+
+app.layout = layout_principal  # Función: Dash la evalúa en cada carga de página
 
 # --- Ejecutar la Aplicación ---
 if __name__ == '__main__':
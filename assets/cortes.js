@@ -0,0 +1,96 @@
+// assets/cortes.js
+// Filtrado en el navegador de los cortes por columnas que arma datos/cortes.py (Observaciones e Incidentes).
+// El servidor solo envía el corte cuando cambia la versión del dataset o la planta; el slider de fechas y el
+// dropdown de máquina se resuelven aquí, sin pedidos al servidor.
+
+(function () {
+    var ORDINAL_EPOCA = 719163;  // Igual que datos/cortes.py
+    var NO_UPDATE = function () { return window.dash_clientside.no_update; };
+
+    function componente(tipo, props, namespace) {
+        return {type: tipo, namespace: namespace || 'dash_html_components', props: props};
+    }
+
+    function fecha(ordinal) {
+        var d = new Date((Math.floor(ordinal) - ORDINAL_EPOCA) * 86400000);
+        var dos = function (n) { return (n < 10 ? '0' : '') + n; };
+        return {
+            larga: dos(d.getUTCDate()) + '/' + dos(d.getUTCMonth() + 1) + '/' + d.getUTCFullYear(),
+            corta: dos(d.getUTCDate()) + '/' + dos(d.getUTCMonth() + 1) + '/' + String(d.getUTCFullYear()).slice(-2),
+        };
+    }
+
+    function textoRango(rango) {
+        return fecha(rango[0]).corta + ' - ' + fecha(rango[1]).corta;
+    }
+
+    function valor(corte, columna, fila) {
+        var categorica = corte.categoricas[columna];
+        if (categorica) {
+            var codigo = categorica.codigos[fila];
+            return codigo < 0 ? null : categorica.valores[codigo];
+        }
+        return corte.columnas[columna][fila];
+    }
+
+    // Filas (en el orden del corte) con instante en [desde, hasta], opcionalmente dentro de los días
+    // seleccion.inicio..seleccion.fin y con una categórica igual a un valor
+    function filtrar(corte, desde, hasta, seleccion, categorica, buscado) {
+        var filas = [];
+        var codigos = null, codigo = -1;
+        if (categorica) {
+            if (!corte.categoricas[categorica]) { return filas; }
+            codigos = corte.categoricas[categorica].codigos;
+            codigo = corte.categoricas[categorica].valores.indexOf(buscado);
+            if (codigo < 0) { return filas; }
+        }
+        for (var i = 0; i < corte.n; i++) {
+            var dia = corte.dia[i];
+            if (dia === null || dia < desde || dia > hasta) { continue; }
+            if (seleccion && (Math.floor(dia) < seleccion.inicio || Math.floor(dia) > seleccion.fin)) { continue; }
+            if (codigos && codigos[i] !== codigo) { continue; }
+            filas.push(i);
+        }
+        return filas;
+    }
+
+    // Misma estructura que dbc.Table.from_dataframe
+    function tabla(corte, filas, clase) {
+        var encabezado = corte.orden.map(function (c) { return componente('Th', {children: c, colSpan: 1}); });
+        var cuerpo = filas.map(function (fila) {
+            return componente('Tr', {children: corte.orden.map(function (c) { return componente('Td', {children: valor(corte, c, fila)}); })});
+        });
+        return componente('Table', {
+            children: [componente('Thead', {children: [componente('Tr', {children: encabezado})]}), componente('Tbody', {children: cuerpo})],
+            striped: true, bordered: true, hover: true, responsive: true, class_name: clase,
+        }, 'dash_bootstrap_components');
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        cortes: {
+            // Listado de observaciones del rango (más recientes primero: el corte ya viene ordenado)
+            observaciones: function (rango, corte) {
+                if (!rango || !corte) { return [NO_UPDATE(), NO_UPDATE()]; }
+                var filas = filtrar(corte, rango[0], rango[1], null);
+                if (!filas.length) { return [componente('Div', {children: 'No hay observaciones en el período seleccionado.'}), textoRango(rango)]; }
+                return [tabla(corte, filas, 'align-middle small'), textoRango(rango)];
+            },
+            // Detalle de incidentes del rango y máquina; `seleccion` ({inicio, fin} en ordinales) es el día o
+            // período clickeado en el gráfico de frecuencia y solo vale si el último cambio fue ese clic
+            incidentes: function (rango, maquina, seleccion, corte) {
+                if (!rango || !corte) { return [NO_UPDATE(), NO_UPDATE()]; }
+                var disparo = (window.dash_clientside.callback_context.triggered || []).map(function (t) { return t.prop_id; });
+                if (disparo.indexOf('incid-store-seleccion.data') < 0) { seleccion = null; }
+                var porMaquina = maquina && maquina !== 'Todas';
+                var filas = porMaquina ? filtrar(corte, rango[0], rango[1], seleccion, 'Máquina', maquina) : filtrar(corte, rango[0], rango[1], seleccion);
+                if (!filas.length) {
+                    var detalle = '';
+                    if (seleccion && seleccion.inicio === seleccion.fin) { detalle = ' para la fecha ' + fecha(seleccion.inicio).larga; }
+                    else if (seleccion) { detalle = ' entre el ' + fecha(seleccion.inicio).larga + ' y el ' + fecha(seleccion.fin).larga; }
+                    return [componente('Div', {children: 'No hay detalles de incidentes para mostrar' + detalle + '.'}), textoRango(rango)];
+                }
+                return [tabla(corte, filas, 'align-middle small'), textoRango(rango)];
+            },
+        },
+    });
+})();
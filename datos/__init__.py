@@ -0,0 +1,9 @@
+# datos/__init__.py
+# Capa de datos compartida por las páginas: carga tipada del CSV, cachés en memoria e índices.
+
+from datos.carga import CSV_FILE, obtener_dataset, obtener_textos, obtener_indice_texto, archivos_configurados, version_archivo, version_dataset, fecha_version
+from datos.cache import CacheLRU
+from datos.textos import AlmacenTextos
+from datos.busqueda import IndiceTexto
+from datos.bitmap import IndiceBitmap, obtener_indice_bitmap
+from datos.indice_fechas import IndiceFechas, obtener_indice_fechas
@@ -0,0 +1,110 @@
+# datos/actividad.py
+# Actividad diaria por máquina para el gráfico "Producción vs. Eventos" de Incidentes: por (planta, máquina,
+# día) la cantidad producida, la unidad y la cantidad de incidentes y de mantenimientos realizados. Se arma
+# con un solo groupby sobre las filas de los tres tipos de evento, cacheado por versión del dataset (y
+# precalculado en segundo plano); comparar una o diez máquinas es el mismo filtro (isin) sobre el cubo.
+
+import numpy as np
+import pandas as pd
+
+from datos.cache import CacheLRU, LockProceso
+from datos.columnas import (
+    COLUMNA_PLANTA, COLUMNA_EVENTO, COLUMNA_HUBO_PRODUCCION, COLUMNA_MAQUINA_PROD, COLUMNA_FECHA_PROD,
+    COLUMNA_CANTIDAD, COLUMNA_UNIDAD, COLUMNA_MAQUINA_MANT, COLUMNA_FECHA_MANT, COLUMNA_MAQUINA_INCID,
+    COLUMNA_FECHA_INCID, VALOR_PRODUCCION, VALOR_SI,
+)
+from datos.filtros import VALORES_SIN_FILTRO, filas_mantenimiento, filas_incidentes
+from datos.precalculo import leer_artefacto
+
+COLUMNAS_ACTIVIDAD = [COLUMNA_PLANTA, 'maquina', 'fecha', 'produccion', 'unidad', 'incidentes', 'mantenimientos']
+COLUMNAS_SUMABLES = ['produccion', 'incidentes', 'mantenimientos']
+
+_cache_actividad = CacheLRU(max_entradas=2)
+_lock_actividad = LockProceso()
+
+
+def _filas_produccion_con_cantidad(df):
+    """Producción registrada ('Sí') con máquina, fecha y cantidad numérica (el criterio del gráfico combinado)."""
+    columnas = [COLUMNA_EVENTO, COLUMNA_HUBO_PRODUCCION, COLUMNA_MAQUINA_PROD, COLUMNA_FECHA_PROD, COLUMNA_CANTIDAD]
+    if not all(col in df.columns for col in columnas):
+        return np.zeros(0, dtype=np.int64)
+    mascara = (
+        (df[COLUMNA_EVENTO] == VALOR_PRODUCCION) & (df[COLUMNA_HUBO_PRODUCCION] == VALOR_SI) &
+        df[COLUMNA_MAQUINA_PROD].notna() & df[COLUMNA_FECHA_PROD].notna() &
+        pd.to_numeric(df[COLUMNA_CANTIDAD], errors='coerce').notna()
+    )
+    return np.flatnonzero(mascara.to_numpy(dtype=bool, na_value=False))
+
+
+def _eventos(df, filas, columna_maquina, columna_fecha, **valores):
+    """Filas de un tipo de evento como (planta, maquina, fecha, columnas sumables)."""
+    planta = df[COLUMNA_PLANTA].iloc[filas].to_numpy() if COLUMNA_PLANTA in df.columns else np.full(len(filas), '')
+    eventos = pd.DataFrame({
+        COLUMNA_PLANTA: planta,
+        'maquina': df[columna_maquina].iloc[filas].to_numpy(),
+        'fecha': df[columna_fecha].iloc[filas].dt.normalize().to_numpy(),
+    })
+    for columna in COLUMNAS_SUMABLES:
+        eventos[columna] = valores.get(columna, 0)
+    eventos['unidad'] = valores.get('unidad', None)
+    return eventos
+
+
+def construir_actividad_diaria(df):
+    """Producción, incidentes y mantenimientos por (planta, máquina, día), en un solo groupby."""
+    partes = []
+    filas = _filas_produccion_con_cantidad(df)
+    if len(filas):
+        unidad = df[COLUMNA_UNIDAD].iloc[filas].to_numpy() if COLUMNA_UNIDAD in df.columns else None
+        partes.append(_eventos(df, filas, COLUMNA_MAQUINA_PROD, COLUMNA_FECHA_PROD,
+                               produccion=pd.to_numeric(df[COLUMNA_CANTIDAD].iloc[filas], errors='coerce').to_numpy(dtype=float),
+                               unidad=unidad))
+    if {COLUMNA_MAQUINA_INCID, COLUMNA_FECHA_INCID} <= set(df.columns):
+        filas = filas_incidentes(df)
+        partes.append(_eventos(df, filas[df[COLUMNA_MAQUINA_INCID].iloc[filas].notna().to_numpy()],
+                               COLUMNA_MAQUINA_INCID, COLUMNA_FECHA_INCID, incidentes=1))
+    if {COLUMNA_MAQUINA_MANT, COLUMNA_FECHA_MANT} <= set(df.columns):
+        filas = filas_mantenimiento(df)
+        partes.append(_eventos(df, filas[df[COLUMNA_MAQUINA_MANT].iloc[filas].notna().to_numpy()],
+                               COLUMNA_MAQUINA_MANT, COLUMNA_FECHA_MANT, mantenimientos=1))
+    partes = [p for p in partes if not p.empty]
+    if not partes:
+        return pd.DataFrame(columns=COLUMNAS_ACTIVIDAD)
+    eventos = pd.concat(partes, ignore_index=True)
+    actividad = eventos.groupby([COLUMNA_PLANTA, 'maquina', 'fecha'], dropna=False).agg(
+        produccion=('produccion', 'sum'), unidad=('unidad', 'first'),
+        incidentes=('incidentes', 'sum'), mantenimientos=('mantenimientos', 'sum'),
+    )
+    return actividad.reset_index()[COLUMNAS_ACTIVIDAD].sort_values(['fecha', 'maquina'], ignore_index=True)
+
+
+def obtener_actividad_diaria(df, version_datos):
+    """Actividad diaria por máquina para esta versión del dataset: precalculada o construida una sola vez."""
+    actividad = _cache_actividad.obtener(version_datos)
+    if actividad is None:
+        with _lock_actividad:
+            actividad = _cache_actividad.obtener(version_datos)
+            if actividad is None:
+                actividad = leer_artefacto('actividad_diaria', version_datos)
+                actividad = _cache_actividad.guardar(version_datos, construir_actividad_diaria(df) if actividad is None else actividad)
+    return actividad
+
+
+def filtrar_actividad(actividad, fecha_inicio=None, fecha_fin=None, maquinas=None, planta=None):
+    mascara = np.ones(len(actividad), dtype=bool)
+    if fecha_inicio is not None: mascara &= (actividad['fecha'] >= fecha_inicio).to_numpy()
+    if fecha_fin is not None: mascara &= (actividad['fecha'] <= fecha_fin).to_numpy()
+    if maquinas: mascara &= actividad['maquina'].isin(maquinas).to_numpy()
+    if planta not in VALORES_SIN_FILTRO: mascara &= (actividad[COLUMNA_PLANTA] == planta).to_numpy()
+    return actividad[mascara]
+
+
+def actividad_por_maquina(actividad, fechas):
+    """Por máquina del recorte: (unidad, DataFrame diario con una fila por fecha de `fechas` y las columnas sumables)."""
+    por_dia = actividad.groupby(['maquina', 'fecha'])[COLUMNAS_SUMABLES].sum()
+    unidades = actividad.dropna(subset=['unidad']).groupby('maquina')['unidad'].first()
+    resultado = {}
+    for maquina, diario in por_dia.groupby(level='maquina', sort=False):
+        diario = diario.droplevel('maquina').reindex(fechas, fill_value=0)
+        resultado[maquina] = (unidades.get(maquina), diario)
+    return resultado
@@ -0,0 +1,151 @@
+# datos/anomalias.py
+# Detección en línea de corridas de producción atípicas: por (planta, máquina, producto) se lleva una media
+# y una varianza con ponderación exponencial (EWMA) de las unidades/hora, actualizadas fila a fila en el
+# orden de ingreso al formulario. Cada corrida se compara con la banda media ± K desvíos previa a ella.
+# El estado se conserva entre recargas: si el archivo solo creció (ninguna fila ya procesada cambió), se
+# procesan únicamente las filas nuevas (O(1) por fila, sin volver a recorrer el historial); si no, se
+# reconstruye. Las marcas quedan en una tabla por ID_FILA.
+
+import math
+import numpy as np
+import pandas as pd
+
+from datos.cache import LockProceso
+from datos.carga import firma_prefijo
+from datos.columnas import (
+    COLUMNA_PLANTA, COLUMNA_TIMESTAMP, COLUMNA_ID_FILA, COLUMNA_MAQUINA_PROD, COLUMNA_PRODUCTO, COLUMNA_CANTIDAD,
+    COLUMNA_FECHA_PROD, COLUMNA_HORA_INI_PROD, COLUMNA_HORA_FIN_PROD, COLUMNA_EVENTO, COLUMNA_HUBO_PRODUCCION,
+    COLUMNA_UNIDAD,
+)
+from datos.filtros import filas_produccion
+from datos.intervalos import intervalos
+from datos.precalculo import ultimo_artefacto
+
+# Peso de la corrida nueva en la media/varianza exponencial
+ALFA_EWMA = 0.2
+# Ancho de la banda en desvíos
+K_DESVIOS = 3.0
+# Corridas previas de la misma máquina y producto antes de empezar a marcar
+MIN_CORRIDAS = 5
+# Valores de la columna 'anomalia'
+ANOMALIA_BAJA = 'baja'
+ANOMALIA_ALTA = 'alta'
+
+COLUMNAS_MARCAS = ['rendimiento_hora', 'media_ewma', 'desvio_ewma', 'anomalia']
+# Columnas que leen el filtro de producción y el cálculo de horas (firma del prefijo ya procesado)
+COLUMNAS_FIRMA = [COLUMNA_TIMESTAMP, COLUMNA_PLANTA, COLUMNA_EVENTO, COLUMNA_HUBO_PRODUCCION, COLUMNA_MAQUINA_PROD,
+                  COLUMNA_PRODUCTO, COLUMNA_UNIDAD, COLUMNA_CANTIDAD, COLUMNA_FECHA_PROD, COLUMNA_HORA_INI_PROD,
+                  COLUMNA_HORA_FIN_PROD]
+
+_lock_detector = LockProceso()
+_detector = None
+
+
+class EstadoEWMA:
+    """Media y varianza exponenciales de una serie, actualizables en O(1)."""
+    __slots__ = ('n', 'media', 'varianza')
+
+    def __init__(self):
+        self.n = 0
+        self.media = 0.0
+        self.varianza = 0.0
+
+    def actualizar(self, valor, alfa=ALFA_EWMA):
+        if self.n == 0:
+            self.media = valor
+        else:
+            diferencia = valor - self.media
+            incremento = alfa * diferencia
+            self.media += incremento
+            self.varianza = (1 - alfa) * (self.varianza + diferencia * incremento)
+        self.n += 1
+
+
+class DetectorRendimiento:
+    """Estado EWMA por (planta, máquina, producto) y marcas por fila, extendibles con filas nuevas."""
+
+    def __init__(self, alfa=ALFA_EWMA, k_desvios=K_DESVIOS, min_corridas=MIN_CORRIDAS):
+        self.alfa = alfa
+        self.k_desvios = k_desvios
+        self.min_corridas = min_corridas
+        self.version = None
+        self.filas_procesadas = 0
+        self.firma = 0
+        self.estados = {}
+        self.marcas = pd.DataFrame(columns=COLUMNAS_MARCAS, index=pd.Index([], name=COLUMNA_ID_FILA, dtype='int64'))
+
+    def puede_extender(self, df):
+        return firma_prefijo(df, self.filas_procesadas, COLUMNAS_FIRMA) == self.firma
+
+    def evaluar(self, clave, valor):
+        """(media, desvío, anomalía) de la corrida contra el estado previo de su clave; luego lo actualiza."""
+        estado = self.estados.get(clave)
+        if estado is None:
+            estado = self.estados[clave] = EstadoEWMA()
+        media, desvio, anomalia = estado.media, math.sqrt(estado.varianza), None
+        if estado.n >= self.min_corridas:
+            if valor < media - self.k_desvios * desvio:
+                anomalia = ANOMALIA_BAJA
+            elif valor > media + self.k_desvios * desvio:
+                anomalia = ANOMALIA_ALTA
+        estado.actualizar(valor, self.alfa)
+        return (media, desvio, anomalia) if estado.n > 1 else (np.nan, np.nan, None)
+
+    def agregar(self, df_nuevas):
+        """Evalúa las corridas de producción de las filas nuevas, en orden de ingreso."""
+        self.filas_procesadas += len(df_nuevas)
+        prod = df_nuevas.iloc[filas_produccion(df_nuevas)]
+        horas = intervalos(prod, COLUMNA_FECHA_PROD, COLUMNA_HORA_INI_PROD, COLUMNA_HORA_FIN_PROD)['horas']
+        validas = (horas > 0).to_numpy()
+        prod, horas = prod[validas], horas[validas]
+        if prod.empty:
+            return 0
+        rendimiento = (prod[COLUMNA_CANTIDAD] / horas).to_numpy(dtype=float)
+        plantas = prod[COLUMNA_PLANTA].tolist() if COLUMNA_PLANTA in prod.columns else [''] * len(prod)
+        claves = zip(plantas, prod[COLUMNA_MAQUINA_PROD].tolist(), prod[COLUMNA_PRODUCTO].tolist())
+        evaluadas = [self.evaluar(clave, valor) for clave, valor in zip(claves, rendimiento.tolist())]
+        nuevas = pd.DataFrame(evaluadas, columns=['media_ewma', 'desvio_ewma', 'anomalia'],
+                              index=pd.Index(prod[COLUMNA_ID_FILA].to_numpy(), name=COLUMNA_ID_FILA))
+        nuevas.insert(0, 'rendimiento_hora', rendimiento)
+        self.marcas = pd.concat([self.marcas, nuevas]) if len(self.marcas) else nuevas
+        return len(nuevas)
+
+    def marcas_de(self, df_filtrado):
+        """Marcas de las filas de df_filtrado (mismo índice; NaN/None si la fila no es una corrida evaluada)."""
+        return self.marcas.reindex(df_filtrado[COLUMNA_ID_FILA].to_numpy()).set_axis(df_filtrado.index)
+
+
+def obtener_detector(df, version_datos):
+    """Detector al día con esta versión del dataset: procesa solo las filas agregadas o lo reconstruye."""
+    global _detector
+    detector = _detector
+    if detector is not None and detector.version == version_datos:
+        return detector
+    with _lock_detector:
+        detector = _detector
+        if detector is None:
+            # Tras un reinicio se parte del último estado guardado por el precálculo (de esta u otra versión)
+            detector = ultimo_artefacto('anomalias_rendimiento')[1]
+        if detector is not None and detector.version == version_datos:
+            _detector = detector
+            return detector
+        if detector is not None and detector.puede_extender(df):
+            nuevo = DetectorRendimiento(detector.alfa, detector.k_desvios, detector.min_corridas)
+            nuevo.__dict__.update({**detector.__dict__, 'estados': {k: _copiar(e) for k, e in detector.estados.items()}})
+            desde = detector.filas_procesadas
+            n_corridas = nuevo.agregar(df.iloc[desde:])
+            print(f"Anomalías de rendimiento: {n_corridas} corrida(s) nueva(s) evaluada(s) en {len(df) - desde} fila(s) agregada(s).")
+        else:
+            nuevo = DetectorRendimiento()
+            n_corridas = nuevo.agregar(df)
+            print(f"Anomalías de rendimiento: {n_corridas} corrida(s) evaluada(s) desde cero.")
+        nuevo.version = version_datos
+        nuevo.firma = firma_prefijo(df, nuevo.filas_procesadas, COLUMNAS_FIRMA)
+        _detector = nuevo
+        return nuevo
+
+
+def _copiar(estado):
+    copia = EstadoEWMA()
+    copia.n, copia.media, copia.varianza = estado.n, estado.media, estado.varianza
+    return copia
@@ -0,0 +1,126 @@
+# datos/bitmap.py
+# Índice de bitsets empaquetados (np.packbits, 1 bit por fila) sobre las columnas categóricas.
+# Las consultas tipo "producción válida del producto P en la máquina M" se resuelven con AND/OR
+# de bitsets y los conteos con popcount, sin materializar filas.
+
+import numpy as np
+import pandas as pd
+
+from datos.cache import CacheLRU, LockProceso
+from datos.columnas import (
+    COLUMNA_EVENTO, COLUMNA_HUBO_PRODUCCION, COLUMNA_REALIZO_MANTENIMIENTO,
+    COLUMNA_MAQUINA_PROD, COLUMNA_MAQUINA_MANT, COLUMNA_MAQUINA_INCID,
+    COLUMNA_PRODUCTO, COLUMNA_UNIDAD, COLUMNA_CANTIDAD, COLUMNA_PLANTA,
+    COLUMNA_TIMESTAMP, COLUMNA_FECHA_PROD, COLUMNA_FECHA_MANT, COLUMNA_FECHA_INCID,
+    VALOR_PRODUCCION, VALOR_SI,
+)
+
+# Columnas indexadas por valor (se comparan sin espacios extremos, como hacen las páginas)
+COLUMNAS_INDICE_VALOR = [
+    COLUMNA_EVENTO, COLUMNA_HUBO_PRODUCCION, COLUMNA_REALIZO_MANTENIMIENTO,
+    COLUMNA_MAQUINA_PROD, COLUMNA_MAQUINA_MANT, COLUMNA_MAQUINA_INCID,
+    COLUMNA_PRODUCTO, COLUMNA_UNIDAD, COLUMNA_PLANTA,
+]
+# Columnas con predicado de validez (notna)
+COLUMNAS_INDICE_VALIDEZ = [
+    COLUMNA_PRODUCTO, COLUMNA_CANTIDAD, COLUMNA_MAQUINA_PROD, COLUMNA_UNIDAD,
+    COLUMNA_TIMESTAMP, COLUMNA_FECHA_PROD, COLUMNA_FECHA_MANT, COLUMNA_FECHA_INCID,
+]
+
+# Tabla de popcount por byte (compatible con cualquier versión de NumPy)
+_POPCOUNT_BYTE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+class IndiceBitmap:
+    """Bitsets por valor de columna y por validez, construidos una vez por versión del dataset."""
+
+    def __init__(self, df, columnas_valor=COLUMNAS_INDICE_VALOR, columnas_validez=COLUMNAS_INDICE_VALIDEZ):
+        self.n_filas = len(df)
+        self._vacio = np.zeros((self.n_filas + 7) // 8, dtype=np.uint8)
+        self._valores = {}
+        self._validez = {}
+        for col in columnas_valor:
+            if col not in df.columns:
+                continue
+            serie = df[col]
+            texto = serie.astype(str).str.strip().where(serie.notna())
+            codigos, categorias = pd.factorize(texto)
+            self._valores[col] = {cat: np.packbits(codigos == i) for i, cat in enumerate(categorias)}
+        for col in columnas_validez:
+            if col in df.columns:
+                self._validez[col] = np.packbits(df[col].notna().to_numpy())
+
+    # --- Bitsets base ---
+    def valor(self, columna, valor):
+        """Filas donde columna == valor (vacío si la columna o el valor no existen)."""
+        return self._valores.get(columna, {}).get(valor, self._vacio)
+
+    def valores(self, columna):
+        """Valores distintos presentes en la columna."""
+        return list(self._valores.get(columna, {}).keys())
+
+    def no_nulo(self, columna):
+        return self._validez.get(columna, self._vacio)
+
+    def todos(self):
+        return self.no(self._vacio)
+
+    def desde_mascara(self, mascara):
+        return np.packbits(np.asarray(mascara, dtype=bool))
+
+    def desde_filas(self, filas):
+        mascara = np.zeros(self.n_filas, dtype=bool)
+        mascara[np.asarray(filas, dtype=np.int64)] = True
+        return np.packbits(mascara)
+
+    # --- Operaciones ---
+    @staticmethod
+    def y(*bitsets):
+        return np.bitwise_and.reduce(bitsets)
+
+    @staticmethod
+    def o(*bitsets):
+        return np.bitwise_or.reduce(bitsets)
+
+    def no(self, bitset):
+        resultado = np.invert(bitset)
+        sobrantes = len(resultado) * 8 - self.n_filas
+        if sobrantes:  # Los bits de relleno del último byte deben quedar en 0
+            resultado[-1] &= np.uint8((0xFF << sobrantes) & 0xFF)
+        return resultado
+
+    @staticmethod
+    def contar(bitset):
+        """Popcount: cantidad de filas en el bitset."""
+        return int(_POPCOUNT_BYTE[bitset].sum(dtype=np.int64))
+
+    def a_filas(self, bitset):
+        """Posiciones de fila (ordenadas) presentes en el bitset."""
+        return np.flatnonzero(np.unpackbits(bitset, count=self.n_filas))
+
+    # --- Predicados compuestos frecuentes ---
+    def produccion_valida(self, producto=None, maquina=None, unidad=None):
+        """Producción registrada con ¿HUBO PRODUCCIÓN? == 'Sí' y datos mínimos presentes."""
+        partes = [
+            self.valor(COLUMNA_EVENTO, VALOR_PRODUCCION), self.valor(COLUMNA_HUBO_PRODUCCION, VALOR_SI),
+            self.no_nulo(COLUMNA_PRODUCTO), self.no_nulo(COLUMNA_CANTIDAD), self.no_nulo(COLUMNA_FECHA_PROD),
+        ]
+        if producto is not None: partes.append(self.valor(COLUMNA_PRODUCTO, producto))
+        if maquina is not None: partes.append(self.valor(COLUMNA_MAQUINA_PROD, maquina))
+        if unidad is not None: partes.append(self.valor(COLUMNA_UNIDAD, unidad))
+        return self.y(*partes)
+
+
+# --- Índice por versión del dataset ---
+_cache_indices = CacheLRU(max_entradas=2)
+_lock_indices = LockProceso()
+
+def obtener_indice_bitmap(df, version_datos):
+    """Devuelve el índice de bitsets para esta versión del dataset (se construye una sola vez)."""
+    indice = _cache_indices.obtener(version_datos)
+    if indice is None:
+        with _lock_indices:
+            indice = _cache_indices.obtener(version_datos)
+            if indice is None:
+                indice = _cache_indices.guardar(version_datos, IndiceBitmap(df))
+    return indice
@@ -0,0 +1,210 @@
+# datos/busqueda.py
+# Búsqueda de texto completo sobre descripciones, anomalías, acciones correctivas y observaciones.
+# Índice invertido (término -> filas y frecuencia) construido en la carga, en el mismo proceso que
+# parsea cada bloque del CSV. Al recargar un archivo que solo creció, el índice anterior se extiende
+# con las filas agregadas (agregar) en lugar de re-tokenizar todo. Las consultas se resuelven sobre
+# las listas de filas (BM25), sin recorrer los textos.
+
+import re
+import math
+import bisect
+import unicodedata
+import numpy as np
+
+from datos.columnas import (
+    COLUMNA_DESC_MANT, COLUMNA_ANOMALIAS_DESC, COLUMNA_DESC_INCID, COLUMNA_ACCIONES_INCID, COLUMNA_OBSERVACIONES,
+)
+
+# Columnas indexadas
+COLUMNAS_BUSQUEDA = [COLUMNA_DESC_INCID, COLUMNA_ACCIONES_INCID, COLUMNA_DESC_MANT, COLUMNA_ANOMALIAS_DESC, COLUMNA_OBSERVACIONES]
+# Parámetros BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Un término de consulta de al menos este largo también busca las palabras que empiezan con él ("atasc" -> "atascos")
+LARGO_MIN_PREFIJO = 3
+
+# Lista básica de stopwords en español (puedes expandirla o usar NLTK para una mejor)
+# Fuente: https://github.com/stopwords-iso/stopwords-es/blob/master/stopwords-es.txt (adaptada)
+STOPWORDS_ES = frozenset([
+    'a', 'actualmente', 'acuerdo', 'adelante', 'ademas', 'además', 'afirmó', 'agregó', 'ahi', 'ahora', 'ahí', 'al', 'algo', 'alguna', 'algunas',
+    'alguno', 'algunos', 'alla', 'alli', 'allí', 'alrededor', 'ambos', 'ampleamos', 'ante', 'anterior', 'antes', 'apenas', 'aproximadamente',
+    'aquel', 'aquella', 'aquellas', 'aquello', 'aquellos', 'aqui', 'aquí', 'arriba', 'aseguró', 'asi', 'así', 'atras', 'aun', 'aunque', 'ayer',
+    'añadió', 'aún', 'bajo', 'bastante', 'bien', 'buen', 'buena', 'buenas', 'bueno', 'buenos', 'cada', 'casi', 'cerca', 'cierta', 'ciertas',
+    'cierto', 'ciertos', 'cinco', 'comentó', 'como', 'con', 'conocer', 'conseguimos', 'conseguir', 'considera', 'consideró', 'consigo',
+    'consigue', 'consiguen', 'consigues', 'contra', 'cosas', 'creo', 'cual', 'cuales', 'cualquier', 'cuando', 'cuanto', 'cuatro', 'cuenta',
+    'cómo', 'da', 'dado', 'dan', 'dar', 'de', 'debajo', 'debe', 'deben', 'debido', 'decir', 'dejó', 'del', 'delante', 'demasiado', 'demás',
+    'dentro', 'deprisa', 'desde', 'despacio', 'despues', 'después', 'detras', 'detrás', 'dia', 'dias', 'dice', 'dicen', 'dicho', 'dieron',
+    'diferente', 'diferentes', 'dijeron', 'dijo', 'dio', 'dispuso', 'disponible', 'disponibles', 'dla', 'dle', 'dlo', 'dos', 'durante', 'día',
+    'días', 'e', 'ejemplo', 'el', 'ella', 'ellas', 'ello', 'ellos', 'embargo', 'empleais', 'emplean', 'emplear', 'empleas', 'empleo', 'en',
+    'encima', 'encuentra', 'enfrente', 'enseguida', 'entonces', 'entre', 'era', 'erais', 'eramos', 'eran', 'eras', 'eres', 'es', 'esa',
+    'esas', 'ese', 'eso', 'esos', 'esta', 'estaba', 'estabais', 'estabamos', 'estaban', 'estabas', 'estad', 'estada', 'estadas', 'estado',
+    'estados', 'estais', 'estamos', 'estan', 'estando', 'estar', 'estaremos', 'estará', 'estarán', 'estarás', 'estaré', 'estaréis', 'estaría',
+    'estaríais', 'estaríamos', 'estarían', 'estarías', 'estas', 'este', 'esto', 'estos', 'estoy', 'estuvo', 'está', 'estáis', 'están', 'estás',
+    'ex', 'excepto', 'existe', 'existen', 'explicó', 'expresó', 'fin', 'fue', 'fuera', 'fuerais', 'fueramos', 'fueran', 'fueras', 'fueron',
+    'fuese', 'fueseis', 'fuesen', 'fueses', 'fui', 'fuimos', 'fuiste', 'fuisteis', 'general', 'gran', 'grandes', 'gueno', 'ha', 'haber',
+    'habia', 'habida', 'habidas', 'habido', 'habidos', 'habiendo', 'habla', 'hablan', 'habremos', 'habrá', 'habrán', 'habrás', 'habré',
+    'habréis', 'habría', 'habríais', 'habríamos', 'habrían', 'habrías', 'habéis', 'había', 'habíais', 'habíamos', 'habían', 'habías', 'hace',
+    'haceis', 'hacemos', 'hacen', 'hacer', 'hacerlo', 'haces', 'hacia', 'haciendo', 'hago', 'han', 'has', 'hasta', 'hay', 'haya', 'hayamos',
+    'hayan', 'hayas', 'hayáis', 'he', 'hecho', 'hemos', 'hicieron', 'hizo', 'horas', 'hoy', 'hube', 'hubiera', 'hubierais', 'hubieramos',
+    'hubieran', 'hubieras', 'hubieron', 'hubiese', 'hubieseis', 'hubiesen', 'hubieses', 'hubimos', 'hubiste', 'hubisteis', 'hubo', 'hubó', 'igual',
+    'incluso', 'indicó', 'informo', 'informó', 'intenta', 'intentais', 'intentamos', 'intentan', 'intentar', 'intentas', 'intento', 'ir',
+    'junto', 'la', 'lado', 'largo', 'las', 'le', 'lejos', 'les', 'llegó', 'lleva', 'llevar', 'lo', 'los', 'luego', 'lugar', 'manera',
+    'manifestó', 'mas', 'mayor', 'me', 'mediante', 'medio', 'mejor', 'mencionó', 'menos', 'menudo', 'mi', 'mia', 'mias', 'mientras', 'mio',
+    'mios', 'mis', 'misma', 'mismas', 'mismo', 'mismos', 'modo', 'momento', 'mucha', 'muchas', 'muchisima', 'muchisimas', 'muchisimo',
+    'muchisimos', 'mucho', 'muchos', 'muy', 'más', 'mí', 'mía', 'mías', 'mío', 'míos', 'nada', 'nadie', 'ni', 'ninguna', 'ningunas',
+    'ninguno', 'ningunos', 'no', 'nos', 'nosotras', 'nosotros', 'nuestra', 'nuestras', 'nuestro', 'nuestros', 'nueva', 'nuevas', 'nuevo',
+    'nuevos', 'nunca', 'o', 'ocho', 'os', 'otra', 'otras', 'otro', 'otros', 'pais', 'para', 'parece', 'parte', 'partir', 'pasada', 'pasado',
+    'paìs', 'peor', 'pero', 'pesar', 'poca', 'pocas', 'poco', 'pocos', 'podeis', 'podemos', 'poder', 'podria', 'podriais', 'podriamos',
+    'podrian', 'podrias', 'podrá', 'podrán', 'podría', 'podrían', 'poner', 'por', 'por qué', 'porque', 'posible', 'primer', 'primera',
+    'primeras', 'primero', 'primeros', 'principalmente', 'pronto', 'propia', 'propias', 'propio', 'propios', 'proximo', 'próximo', 'próximos',
+    'pudo', 'pueda', 'puede', 'pueden', 'puedo', 'pues', 'punto', 'q', 'qeu', 'que', 'quedó', 'queremos', 'quien', 'quienes', 'quiere', 'quiza',
+    'quizas', 'quizá', 'quizás', 'qué', 'quién', 'quiénes', 'realizado', 'realizar', 'realizó', 'repente', 'respecto', 'sal', 'salvo', 'se',
+    'sea', 'seamos', 'sean', 'seas', 'segun', 'segunda', 'segundo', 'según', 'seis', 'ser', 'sera', 'seremos', 'será', 'serán', 'serás',
+    'seré', 'seréis', 'sería', 'seríais', 'seríamos', 'serían', 'serías', 'seáis', 'señaló', 'si', 'sido', 'siempre', 'siendo', 'siete',
+    'sigue', 'siguiente', 'sin', 'sino', 'sobre', 'sois', 'sola', 'solamente', 'solas', 'solo', 'solos', 'somos', 'son', 'soy', 'soyos', 'su',
+    'supuesto', 'sus', 'suya', 'suyas', 'suyo', 'suyos', 'sí', 'sólo', 'tal', 'tambien', 'también', 'tampoco', 'tan', 'tanta', 'tantas',
+    'tanto', 'tantos', 'tarde', 'te', 'temprano', 'tendremos', 'tendrá', 'tendrán', 'tendrás', 'tendré', 'tendréis', 'tendría', 'tendríais',
+    'tendríamos', 'tendrían', 'tendrías', 'tened', 'teneis', 'tenemos', 'tener', 'tenga', 'tengamos', 'tengan', 'tengas', 'tengo', 'tengáis',
+    'tenida', 'tenidas', 'tenido', 'tenidos', 'teniendo', 'tenéis', 'tenía', 'teníais', 'teníamos', 'tenían', 'tenías', 'tercera', 'terceros',
+    'ti', 'tiempo', 'tiene', 'tienen', 'tienes', 'toda', 'todas', 'todavia', 'todavía', 'todo', 'todos', 'total', 'trabaja', 'trabajais',
+    'trabajamos', 'trabajan', 'trabajar', 'trabajas', 'trabajo', 'tras', 'trata', 'través', 'tres', 'tu', 'tus', 'tuya', 'tuyas', 'tuyo',
+    'tuyos', 'tú', 'ultima', 'ultimo', 'ultimas', 'ultimos', 'un', 'una', 'unas', 'uno', 'unos', 'usa', 'usais', 'usamos', 'usan', 'usar',
+    'usas', 'uso', 'usted', 'ustedes', 'va', 'vais', 'valor', 'vamos', 'van', 'varias', 'varios', 'vaya', 'veces', 'verá', 'verdad',
+    'verdadera', 'verdadero', 'vez', 'vosotras', 'vosotros', 'voy', 'vuestra', 'vuestras', 'vuestro', 'vuestros', 'y', 'ya', 'yo', 'él', 'ésa',
+    'ésas', 'ése', 'ésos', 'ésta', 'éstas', 'éste', 'éstos', 'última', 'últimas', 'último', 'últimos'
+])
+
+_PATRON_TERMINO = re.compile(r'[a-z0-9]+')
+
+
+def normalizar(texto):
+    """Minúsculas y sin acentos ('Fugá' -> 'fuga'); la ñ queda como n."""
+    descompuesto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+_STOPWORDS_NORMALIZADAS = frozenset(normalizar(p) for p in STOPWORDS_ES)
+
+
+def tokenizar(texto):
+    """Términos indexables de un texto: normalizados, sin stopwords ni términos de un carácter."""
+    return [t for t in _PATRON_TERMINO.findall(normalizar(texto)) if len(t) > 1 and t not in _STOPWORDS_NORMALIZADAS]
+
+
+def _frecuencias(df, columnas, longitudes):
+    """término -> {fila: frecuencia} de las filas de df (posiciones); suma los términos por fila en `longitudes`."""
+    frecuencias = {}
+    for col in columnas:
+        if col not in df.columns:
+            continue
+        serie = df[col]
+        for fila, texto in zip(np.flatnonzero(serie.notna().to_numpy()).tolist(), serie.dropna().tolist()):
+            terminos = tokenizar(texto)
+            longitudes[fila] += len(terminos)
+            for termino in terminos:
+                por_fila = frecuencias.setdefault(termino, {})
+                por_fila[fila] = por_fila.get(fila, 0) + 1
+    return frecuencias
+
+
+def _postings(frecuencias, desplazamiento=0):
+    """(término, (filas ordenadas, frecuencias)) con las filas desplazadas; se recorren columna por columna,
+    así que una fila puede aparecer antes que otra menor y hay que ordenarlas."""
+    for termino, por_fila in frecuencias.items():
+        filas = np.fromiter(por_fila.keys(), dtype=np.int32, count=len(por_fila)) + np.int32(desplazamiento)
+        tf = np.fromiter(por_fila.values(), dtype=np.int32, count=len(por_fila))
+        orden = np.argsort(filas, kind='stable')
+        yield termino, (filas[orden], tf[orden])
+
+
+class IndiceTexto:
+    """Índice invertido por fila: término -> (filas ordenadas, frecuencia del término en la fila)."""
+
+    def __init__(self, df=None, columnas=COLUMNAS_BUSQUEDA):
+        self.n_filas = 0 if df is None else len(df)
+        self.longitudes = np.zeros(self.n_filas, dtype=np.int32)  # Términos por fila (normalización BM25)
+        self._postings = {}
+        self._vocabulario = None
+        self.firma = None  # Firma de las filas indexadas (la fija la carga, para extender el índice al recargar)
+        if df is None:
+            return
+        self._postings = dict(_postings(_frecuencias(df, columnas, self.longitudes)))
+
+    def agregar(self, df_nuevas, columnas=COLUMNAS_BUSQUEDA):
+        """Nuevo índice con las filas de df_nuevas agregadas al final: solo se tokenizan esas filas y se
+        extienden las listas de sus términos (las demás se comparten con este índice, que no cambia)."""
+        longitudes_nuevas = np.zeros(len(df_nuevas), dtype=np.int32)
+        frecuencias = _frecuencias(df_nuevas, columnas, longitudes_nuevas)
+        extendido = IndiceTexto()
+        extendido.n_filas = self.n_filas + len(df_nuevas)
+        extendido.longitudes = np.concatenate([self.longitudes, longitudes_nuevas])
+        extendido._postings = dict(self._postings)
+        for termino, (filas, tf) in _postings(frecuencias, self.n_filas):  # Filas nuevas: siempre mayores
+            previo = self._postings.get(termino)
+            extendido._postings[termino] = (filas, tf) if previo is None else (np.concatenate([previo[0], filas]), np.concatenate([previo[1], tf]))
+        return extendido
+
+    @classmethod
+    def unir(cls, indices):
+        """Concatena índices de bloques o archivos consecutivos (las filas se desplazan)."""
+        unido = cls()
+        unido.longitudes = np.concatenate([i.longitudes for i in indices]) if indices else unido.longitudes
+        unido.n_filas = len(unido.longitudes)
+        partes, desplazamiento = {}, 0
+        for indice in indices:
+            for termino, (filas, tf) in indice._postings.items():
+                partes.setdefault(termino, []).append((filas + desplazamiento, tf))
+            desplazamiento += indice.n_filas
+        unido._postings = {
+            t: (np.concatenate([f for f, _ in p]), np.concatenate([tf for _, tf in p])) if len(p) > 1 else p[0]
+            for t, p in partes.items()
+        }
+        return unido
+
+    def terminos(self):
+        return len(self._postings)
+
+    def _filas_termino(self, termino):
+        """Filas y frecuencias del término (y de las palabras que empiezan con él, si es largo)."""
+        if len(termino) < LARGO_MIN_PREFIJO:
+            return self._postings.get(termino, (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)))
+        if self._vocabulario is None:
+            self._vocabulario = sorted(self._postings)
+        partes = []
+        for i in range(bisect.bisect_left(self._vocabulario, termino), len(self._vocabulario)):
+            if not self._vocabulario[i].startswith(termino):
+                break
+            partes.append(self._postings[self._vocabulario[i]])
+        if not partes:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+        if len(partes) == 1:
+            return partes[0]
+        filas, inversa = np.unique(np.concatenate([f for f, _ in partes]), return_inverse=True)
+        return filas, np.bincount(inversa, weights=np.concatenate([tf for _, tf in partes]))
+
+    def buscar(self, consulta, filas_permitidas=None):
+        """Filas que contienen todos los términos de la consulta, ordenadas por puntaje BM25
+        (a igual puntaje, las más recientes primero). Devuelve (filas, puntajes)."""
+        vacio = np.zeros(0, dtype=np.int64), np.zeros(0)
+        terminos = list(dict.fromkeys(tokenizar(consulta or '')))
+        if not terminos or self.n_filas == 0:
+            return vacio
+        largo_medio = max(self.longitudes.mean(), 1.0)
+        filas_resultado = puntajes = None
+        for termino in terminos:
+            filas, tf = self._filas_termino(termino)
+            if len(filas) == 0:
+                return vacio
+            idf = math.log(1 + (self.n_filas - len(filas) + 0.5) / (len(filas) + 0.5))
+            largo = self.longitudes[filas] / largo_medio
+            puntaje = idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * largo))
+            if filas_resultado is None:
+                filas_resultado, puntajes = filas.astype(np.int64), puntaje
+            else:
+                filas_resultado, i_actual, i_nuevo = np.intersect1d(filas_resultado, filas, assume_unique=True, return_indices=True)
+                puntajes = puntajes[i_actual] + puntaje[i_nuevo]
+        if filas_permitidas is not None:
+            mascara = np.asarray(filas_permitidas, dtype=bool)[filas_resultado]
+            filas_resultado, puntajes = filas_resultado[mascara], puntajes[mascara]
+        orden = np.lexsort((-filas_resultado, -puntajes))
+        return filas_resultado[orden], puntajes[orden]
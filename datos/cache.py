@@ -0,0 +1,142 @@
+# datos/cache.py
+
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+_FALTA = object()
+_locks_proceso = weakref.WeakSet()
+
+
+class LockProceso:
+    """threading.Lock que en un proceso hijo (fork de los callbacks en segundo plano) se reemplaza por uno
+    libre: si otro hilo lo tenía tomado al momento del fork, el hijo no queda esperándolo para siempre."""
+
+    __slots__ = ('_lock', '__weakref__')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        _locks_proceso.add(self)
+
+    def acquire(self, *args, **kwargs):
+        return self._lock.acquire(*args, **kwargs)
+
+    def release(self):
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    def __enter__(self):
+        self._lock.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self._lock.release()
+
+
+def _liberar_locks_en_hijo():
+    for lock in list(_locks_proceso):
+        lock._lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_liberar_locks_en_hijo)
+
+
+class CacheLRU:
+    """Caché en memoria acotada (LRU) y segura entre hilos para resultados intermedios.
+    Cuenta aciertos (lecturas que encontraron valor) y fallos (valores que hubo que calcular y guardar)
+    para la página de rendimiento; con el doble chequeo habitual un fallo se cuenta una sola vez."""
+
+    def __init__(self, max_entradas=128):
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()
+        self._lock = LockProceso()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _leer(self, clave):
+        """Valor guardado (o _FALTA) sin contar el acceso."""
+        with self._lock:
+            if clave not in self._datos:
+                return _FALTA
+            self._datos.move_to_end(clave)
+            return self._datos[clave]
+
+    def _contar_acierto(self):
+        with self._lock:
+            self.aciertos += 1
+
+    def obtener(self, clave, defecto=None):
+        valor = self._leer(clave)
+        if valor is _FALTA:
+            return defecto
+        self._contar_acierto()
+        return valor
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            self.fallos += 1
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+        return valor
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self):
+        """{'entradas', 'max_entradas', 'aciertos', 'fallos', 'tasa_aciertos'} (tasa None sin accesos)."""
+        with self._lock:
+            aciertos, fallos, entradas = self.aciertos, self.fallos, len(self._datos)
+        accesos = aciertos + fallos
+        return {'entradas': entradas, 'max_entradas': self.max_entradas, 'aciertos': aciertos,
+                'fallos': fallos, 'tasa_aciertos': aciertos / accesos if accesos else None}
+
+    def __len__(self):
+        return len(self._datos)
+
+
+class CacheTTL(CacheLRU):
+    """CacheLRU cuyas entradas vencen a los `ttl_s` segundos. obtener_o_calcular() calcula cada clave una
+    sola vez aunque varios hilos la pidan al mismo tiempo (los demás esperan y reusan el resultado)."""
+
+    def __init__(self, max_entradas=128, ttl_s=5.0):
+        super().__init__(max_entradas)
+        self.ttl_s = ttl_s
+        self._lock_calculos = LockProceso()
+        self._calculos = {}  # clave -> Lock del cálculo en curso
+
+    def _leer(self, clave):
+        entrada = super()._leer(clave)
+        if entrada is _FALTA or entrada[0] < time.monotonic():
+            return _FALTA
+        return entrada[1]
+
+    def guardar(self, clave, valor):
+        super().guardar(clave, (time.monotonic() + self.ttl_s, valor))
+        return valor
+
+    def obtener_o_calcular(self, clave, calcular):
+        valor = self.obtener(clave, _FALTA)
+        if valor is not _FALTA:
+            return valor
+        with self._lock_calculos:
+            lock = self._calculos.get(clave)
+            if lock is None:
+                lock = self._calculos[clave] = LockProceso()
+        try:
+            with lock:
+                valor = self.obtener(clave, _FALTA)  # Quien esperó el cálculo de otro hilo cuenta un acierto
+                if valor is _FALTA:
+                    valor = self.guardar(clave, calcular())
+            return valor
+        finally:
+            with self._lock_calculos:
+                if self._calculos.get(clave) is lock and not lock.locked():
+                    del self._calculos[clave]
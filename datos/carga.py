@@ -0,0 +1,297 @@
+# datos/carga.py
+
+import os
+import io
+import glob
+import hashlib
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from datos.cache import LockProceso
+from datos.columnas import COLUMNAS_FECHA, FORMATOS_FECHA, COLUMNAS_CATEGORICAS, COLUMNAS_HORA, COLUMNA_CANTIDAD, COLUMNA_ID_FILA, COLUMNA_PLANTA
+from datos.textos import AlmacenTextos
+from datos.busqueda import IndiceTexto, COLUMNAS_BUSQUEDA
+
+# --- Constantes ---
+# Archivo por defecto (una sola planta) si no se configura otra cosa
+CSV_FILE = 'RESPONSES_SIPROSA.csv'
+# Exportaciones del formulario de varias plantas: lista separada por os.pathsep (':' en Linux) de
+# archivos o directorios (se toman sus RESPONSES_*.csv). Un archivo puede forzar el id de planta:
+# 'PLANTA=ruta' (en un directorio la planta sale del nombre de cada archivo).
+VARIABLE_ARCHIVOS = 'SIPROSA_RESPUESTAS'
+# El id de planta por defecto es el nombre del archivo sin este prefijo (RESPONSES_SIPROSA.csv -> SIPROSA)
+PREFIJO_ARCHIVO = 'RESPONSES_'
+# Tamaño mínimo de cada bloque al partir un CSV para parsearlo en varios procesos (menos no compensa)
+BYTES_MIN_BLOQUE = 4 * 1024 * 1024
+# Recargas del dataset que se recuerdan (página de rendimiento)
+MAX_RECARGAS = 50
+
+# --- Estado del Dataset en Memoria ---
+# Se relee cada CSV solo cuando cambia su versión (mtime + tamaño); el resto se reutiliza
+_lock_carga = LockProceso()
+_dataset_actual = None  # Tupla (version, df, textos, indice de búsqueda)
+_archivos_cargados = {}  # ruta -> (version, df tipado, textos, indice de búsqueda) de ese archivo
+_indices_archivo = {}  # ruta -> IndiceTexto de su última carga (con su firma): se extiende si el archivo solo creció
+_recargas = deque(maxlen=MAX_RECARGAS)  # {'instante', 'version', 'segundos', 'archivos', 'parseados', 'filas'}
+
+
+def planta_desde_archivo(ruta):
+    nombre = os.path.splitext(os.path.basename(ruta))[0]
+    return nombre[len(PREFIJO_ARCHIVO):] if nombre.startswith(PREFIJO_ARCHIVO) and len(nombre) > len(PREFIJO_ARCHIVO) else nombre
+
+
+def archivos_configurados():
+    """Lista [(planta, ruta)] de exportaciones a cargar, según VARIABLE_ARCHIVOS (o CSV_FILE)."""
+    configuracion = os.environ.get(VARIABLE_ARCHIVOS, '').strip()
+    if not configuracion:
+        return [(planta_desde_archivo(CSV_FILE), CSV_FILE)]
+    archivos = []
+    for entrada in filter(None, (e.strip() for e in configuracion.split(os.pathsep))):
+        planta, _, ruta = entrada.rpartition('=')
+        if os.path.isdir(ruta):
+            if planta:
+                raise ValueError(f"{VARIABLE_ARCHIVOS}: '{entrada}' fuerza la planta de un directorio; "
+                                 f"use 'PLANTA=archivo' o nombre los archivos {PREFIJO_ARCHIVO}<PLANTA>.csv")
+            patron = os.path.join(ruta, PREFIJO_ARCHIVO + '*.csv')
+            archivos.extend((planta_desde_archivo(r), r) for r in sorted(glob.glob(patron)))
+        else:
+            archivos.append((planta or planta_desde_archivo(ruta), ruta))
+    return archivos
+
+
+def version_archivo(ruta=CSV_FILE):
+    """Identificador de versión del archivo: cambia cuando se modifica o reemplaza el CSV."""
+    st = os.stat(ruta)
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+def version_dataset(archivos=None):
+    """Versión del conjunto de archivos (con uno solo, la del archivo). Mismo formato: '<mtime>-<firma>'."""
+    archivos = archivos_configurados() if archivos is None else archivos
+    versiones = [(planta, version_archivo(ruta)) for planta, ruta in archivos]
+    if len(versiones) == 1:
+        return versiones[0][1]
+    mtime_max = max(int(v.split('-')[0], 16) for _, v in versiones)
+    firma = zlib.crc32('|'.join(f"{p}={v}" for p, v in versiones).encode('utf-8'))
+    return f"{mtime_max:x}-{firma:08x}"
+
+
+def fecha_version(version):
+    """Fecha de modificación (UTC) codificada en la versión: sirve como Last-Modified de la API."""
+    return datetime.fromtimestamp(int(version.split('-')[0], 16) / 1e9, tz=timezone.utc)
+
+
+def firma_prefijo(df, n_filas, columnas, textos=None):
+    """Hash de las primeras n_filas en `columnas` (0 si n_filas es 0 o df tiene menos filas). Los cálculos
+    incrementales lo guardan al procesar las primeras n_filas: si al recargar coincide, ninguna fila ya
+    procesada cambió (solo se agregaron filas al final) y basta con procesar lo nuevo. Las columnas de texto
+    libre (fuera del DataFrame) se leen de `textos` (AlmacenTextos del dataset), por posición de fila."""
+    if n_filas == 0 or n_filas > len(df):
+        return 0
+    prefijo = df.iloc[:n_filas][[col for col in columnas if col in df.columns]]
+    if textos is not None:
+        libres = [col for col in columnas if col not in df.columns and col in textos.columnas]
+        prefijo = prefijo.assign(**{col: textos.valores(col, np.arange(n_filas)) for col in libres})
+    if prefijo.columns.empty:
+        return n_filas  # Sin columnas de firma solo se puede comparar el largo
+    hashes = pd.util.hash_pandas_object(prefijo, index=False).to_numpy()
+    # Un hash por fila, combinados en orden: cualquier fila editada, insertada o borrada cambia la firma
+    return int.from_bytes(hashlib.blake2b(hashes.tobytes(), digest_size=8).digest(), 'little')
+
+
+def _a_fecha(serie, formato):
+    """Fechas con formato explícito (rápido); las que no coinciden se infieren solas (p.ej. con segundos)."""
+    fechas = pd.to_datetime(serie, format=formato, errors='coerce')
+    restantes = fechas.isna() & serie.notna()
+    if restantes.any():
+        fechas[restantes] = pd.to_datetime(serie[restantes], errors='coerce')
+    return fechas
+
+
+def _tipar(df):
+    """Conversiones de fecha y numéricas comunes a todas las páginas (sin avisos: corre en cada bloque)."""
+    for col, formato in FORMATOS_FECHA.items():
+        if col in df.columns:
+            df[col] = _a_fecha(df[col], formato)
+    if COLUMNA_CANTIDAD in df.columns:
+        df[COLUMNA_CANTIDAD] = pd.to_numeric(df[COLUMNA_CANTIDAD], errors='coerce').astype('float64')
+    # Quitar espacios extremos en opciones y horas (los nulos se mantienen como nulos)
+    for col in COLUMNAS_CATEGORICAS + COLUMNAS_HORA:
+        if col in df.columns:
+            df[col] = df[col].str.strip()
+    return df
+
+
+def _parsear_bloque(origen, indexar=True):
+    """Lee un CSV (ruta) o un bloque de bytes con su encabezado. Todo como texto: los tipos los fija _tipar,
+    así todos los bloques salen con el mismo esquema aunque alguno tenga columnas vacías.
+    Devuelve (df sin texto libre, AlmacenTextos, IndiceTexto o None si no indexar) del bloque: el texto se
+    comprime e indexa en el mismo proceso."""
+    df = _tipar(pd.read_csv(origen if isinstance(origen, str) else io.BytesIO(origen), dtype=str))
+    textos = AlmacenTextos(df)
+    return df.drop(columns=textos.columnas), textos, IndiceTexto(df) if indexar else None
+
+
+def _bloques_csv(ruta, max_bloques):
+    """Divide el archivo en hasta `max_bloques` trozos de líneas completas, cada uno con el encabezado.
+    Un corte solo es válido si no cae dentro de un campo entre comillas (textos con saltos de línea)."""
+    n_bloques = min(max_bloques, os.path.getsize(ruta) // BYTES_MIN_BLOQUE)
+    if n_bloques <= 1:
+        return [ruta]
+    with open(ruta, 'rb') as f:
+        datos = f.read()
+    fin_encabezado = datos.index(b'\n') + 1
+    encabezado = datos[:fin_encabezado]
+    cortes, inicio, comillas = [], fin_encabezado, 0
+    for i in range(1, n_bloques):
+        pos = max(len(datos) * i // n_bloques, inicio)
+        while True:
+            pos = datos.find(b'\n', pos)
+            if pos == -1:
+                break
+            comillas += datos.count(b'"', inicio, pos)
+            inicio = pos
+            if comillas % 2 == 0:
+                break
+            pos += 1
+        if pos == -1:
+            break
+        cortes.append(pos + 1)
+        inicio = pos + 1
+    limites = [fin_encabezado] + cortes + [len(datos)]
+    return [encabezado + datos[a:b] for a, b in zip(limites, limites[1:]) if b > a]
+
+
+def _avisar_columnas_faltantes(df, ruta):
+    for col in COLUMNAS_FECHA:
+        if col not in df.columns:
+            print(f"Advertencia: Columna de fecha '{col}' no encontrada en {ruta}")
+    if COLUMNA_CANTIDAD not in df.columns:
+        print(f"Advertencia: Columna '{COLUMNA_CANTIDAD}' no encontrada en {ruta}")
+
+
+def _leer_archivos(rutas, procesos=None, sin_indice=()):
+    """Parsea los archivos en paralelo: cada archivo grande se parte en bloques y todos los bloques
+    (de todos los archivos) van al mismo pool de procesos. Devuelve (df tipado, textos, indice) por archivo
+    (indice None para las rutas de `sin_indice`, cuyo índice se extiende aparte)."""
+    procesos = procesos or os.cpu_count() or 1
+    inicio = time.perf_counter()
+    tareas = [(i, origen) for i, ruta in enumerate(rutas) for origen in _bloques_csv(ruta, procesos)]
+    indexar = [rutas[i] not in sin_indice for i, _ in tareas]
+    if len(tareas) == 1:
+        resultados = [_parsear_bloque(tareas[0][1], indexar[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=min(len(tareas), procesos)) as pool:
+            resultados = list(pool.map(_parsear_bloque, [origen for _, origen in tareas], indexar))
+
+    archivos = []
+    for i, ruta in enumerate(rutas):
+        partes = [resultado for (j, _), resultado in zip(tareas, resultados) if j == i]
+        df = pd.concat([p[0] for p in partes], ignore_index=True) if len(partes) > 1 else partes[0][0]
+        textos = AlmacenTextos.unir([p[1] for p in partes]) if len(partes) > 1 else partes[0][1]
+        indice = IndiceTexto.unir([p[2] for p in partes]) if partes[0][2] is not None and len(partes) > 1 else partes[0][2]
+        # Id entero estable por respuesta: coincide con la posición de fila (y con el índice del DataFrame)
+        df[COLUMNA_ID_FILA] = np.arange(len(df), dtype=np.int64)
+        _avisar_columnas_faltantes(df, ruta)
+        archivos.append((df, textos, indice))
+
+    filas = sum(len(a[0]) for a in archivos)
+    duracion = max(time.perf_counter() - inicio, 1e-9)
+    print(f"CSV parseado: {filas} filas en {duracion:.2f}s ({filas / duracion:,.0f} filas/s, "
+          f"{len(tareas)} bloque(s), {min(len(tareas), procesos)} proceso(s)).")
+    return archivos
+
+
+def leer_csv_tipado(ruta=CSV_FILE, procesos=None):
+    """Lee el CSV y aplica las conversiones de fecha y numéricas comunes a todas las páginas (con el texto libre)."""
+    df, textos, _ = _leer_archivos([ruta], procesos)[0]
+    return textos.completar(df)
+
+
+def _indice_recargado(ruta, df, textos, indice):
+    """Índice de búsqueda de un archivo recién parseado: si no se indexó al parsear, extiende el de su carga
+    anterior cuando las filas ya indexadas no cambiaron (solo se tokenizan las agregadas) o lo reconstruye."""
+    if indice is None:
+        previo = _indices_archivo[ruta]
+        if previo.n_filas and previo.firma == firma_prefijo(df, previo.n_filas, COLUMNAS_BUSQUEDA, textos):
+            indice = previo.agregar(textos.completar(df.iloc[previo.n_filas:], COLUMNAS_BUSQUEDA))
+            print(f"Índice de búsqueda extendido con {len(df) - previo.n_filas} fila(s) agregada(s) de {ruta}.")
+        else:
+            indice = IndiceTexto(textos.completar(df, COLUMNAS_BUSQUEDA))
+            print(f"Índice de búsqueda reconstruido para {ruta} (cambiaron filas ya indexadas).")
+    indice.firma = firma_prefijo(df, len(df), COLUMNAS_BUSQUEDA, textos)
+    _indices_archivo[ruta] = indice
+    return indice
+
+
+def _obtener_actual(archivos=None):
+    """Tupla (version, df, textos, indice) vigente, recargando los archivos que hayan cambiado."""
+    global _dataset_actual
+    if isinstance(archivos, str):
+        archivos = [(planta_desde_archivo(archivos), archivos)]
+    archivos = archivos_configurados() if archivos is None else archivos
+    version = version_dataset(archivos)  # FileNotFoundError se propaga a los callbacks
+    actual = _dataset_actual
+    if actual is not None and actual[0] == version:
+        return actual
+    with _lock_carga:
+        actual = _dataset_actual
+        if actual is None or actual[0] != version:
+            inicio = time.perf_counter()
+            versiones = {ruta: version_archivo(ruta) for _, ruta in archivos}
+            pendientes = [ruta for ruta in versiones if _archivos_cargados.get(ruta, (None,))[0] != versiones[ruta]]
+            leidos = _leer_archivos(pendientes, sin_indice=set(_indices_archivo)) if pendientes else []
+            for ruta, (df_archivo, textos_archivo, indice_archivo) in zip(pendientes, leidos):
+                indice_archivo = _indice_recargado(ruta, df_archivo, textos_archivo, indice_archivo)
+                _archivos_cargados[ruta] = (versiones[ruta], df_archivo, textos_archivo, indice_archivo)
+            for ruta in set(_archivos_cargados) - set(versiones):
+                del _archivos_cargados[ruta]
+            for ruta in set(_indices_archivo) - set(versiones):
+                del _indices_archivo[ruta]
+
+            partes = [_archivos_cargados[ruta][1].assign(**{COLUMNA_PLANTA: planta}) for planta, ruta in archivos]
+            df = pd.concat(partes, ignore_index=True) if len(partes) > 1 else partes[0]
+            if len(archivos) > 1:
+                # Textos e índice de búsqueda: solo se concatenan (los archivos sin cambios no se re-tokenizan)
+                textos = AlmacenTextos.unir([_archivos_cargados[ruta][2] for _, ruta in archivos])
+                indice = IndiceTexto.unir([_archivos_cargados[ruta][3] for _, ruta in archivos])
+            else:
+                textos, indice = _archivos_cargados[archivos[0][1]][2:4]
+            # Ids globales: la posición en el dataset combinado (los de cada archivo se pisan)
+            df[COLUMNA_ID_FILA] = np.arange(len(df), dtype=np.int64)
+            if len(archivos) == 1:
+                _archivos_cargados.clear()  # Con un solo archivo no hay nada que reutilizar: no duplicar memoria
+            actual = (version, df, textos, indice)
+            _dataset_actual = actual
+            _recargas.append({'instante': time.time(), 'version': version, 'segundos': time.perf_counter() - inicio,
+                              'archivos': len(archivos), 'parseados': len(pendientes), 'filas': len(df)})
+            print(f"Dataset recargado desde {len(archivos)} archivo(s), {len(pendientes)} parseado(s) (versión {version}, {len(df)} filas, "
+                  f"texto libre: {textos.bytes_comprimidos() / 1024:,.0f} KiB comprimidos, {indice.terminos()} términos indexados).")
+    return actual
+
+
+def historial_recargas():
+    """Recargas del dataset en este proceso (la más reciente al final), con su duración en segundos."""
+    return list(_recargas)
+
+
+def obtener_dataset(archivos=None):
+    """Devuelve (df, version) del dataset tipado de todas las plantas configuradas (columna PLANTA).
+    Sin las columnas de texto libre (ver obtener_textos). `archivos` acepta una ruta o una lista [(planta, ruta)].
+    El DataFrame es compartido: no modificarlo in-place."""
+    version, df = _obtener_actual(archivos)[:2]
+    return df, version
+
+
+def obtener_textos(archivos=None):
+    """AlmacenTextos de la misma versión que obtener_dataset(): texto libre por id de fila."""
+    return _obtener_actual(archivos)[2]
+
+
+def obtener_indice_texto(archivos=None):
+    """IndiceTexto (búsqueda de texto completo) de la misma versión que obtener_dataset()."""
+    return _obtener_actual(archivos)[3]
@@ -0,0 +1,70 @@
+# datos/columnas.py
+# Nombres de columnas y valores clave del CSV de respuestas (deben coincidir EXACTO con el formulario)
+
+# Id de fila estable asignado en la carga (posición de la respuesta en el archivo)
+COLUMNA_ID_FILA = 'ID_FILA'
+# Planta de origen de la respuesta (asignada en la carga según el archivo de exportación)
+COLUMNA_PLANTA = 'PLANTA'
+
+COLUMNA_TIMESTAMP = 'Timestamp'
+COLUMNA_EMAIL = 'Email Address'
+COLUMNA_NOMBRE = 'NOMBRE DE QUIEN REGISTRA'
+COLUMNA_DNI = 'IDENTIFICADOR DE QUIEN REGISTRA (DNI)'
+COLUMNA_EVENTO = 'TIPO DE EVENTO A REGISTRAR'
+# Producción
+COLUMNA_FECHA_PROD = 'FECHA DE LA PRODUCCIÓN'
+COLUMNA_HUBO_PRODUCCION = '¿HUBO PRODUCCIÓN?'
+COLUMNA_MAQUINA_PROD = 'MAQUINA UTILIZADA'
+COLUMNA_PRODUCTO = 'PRODUCTO PRODUCIDO'
+COLUMNA_UNIDAD = 'UNIDAD DE MEDIDA'
+COLUMNA_CANTIDAD = 'CANTIDAD PRODUCIDA'
+COLUMNA_HORA_INI_PROD = 'HORA DE INICIO DE LA PRODUCCÓN'
+COLUMNA_HORA_FIN_PROD = 'HORA DE FIN DE LA PRODUCCÓN'
+# Mantenimiento
+COLUMNA_FECHA_MANT = 'FECHA DEL MANTENIMIENTO'
+COLUMNA_REALIZO_MANTENIMIENTO = '¿SE REALIZÓ MANTENIMIENTO?'
+COLUMNA_MAQUINA_MANT = 'MÁQUINA BAJO MANTENIMIENTO'
+COLUMNA_TIPO_MANT = 'TIPO DE MANTENIMIENTO REALIZADO'
+COLUMNA_DESC_MANT = 'DESCRIPCIÓN DEL MANTENIMIENTO REALIZADO'
+COLUMNA_HORA_INI_MANT = 'HORA DE INICIO DEL MANTENIMIENTO'
+COLUMNA_HORA_FIN_MANT = 'HORA DE FIN DEL MANTENIMIENTO'
+COLUMNA_ANOMALIAS_DETECTADAS_BOOL = '¿SE DETECTARON ANOMALÍAS O IRREGULARIDADES EN EL MANTENIMIENTO?'
+COLUMNA_ANOMALIAS_DESC = 'DESCRIBA LAS ANOMALIAS DETECTADAS'
+# Incidentes
+COLUMNA_FECHA_INCID = 'FECHA DEL INCIDENTE o PARADA'
+COLUMNA_HORA_INI_INCID = 'HORA DE INICIO DEL INCIDENTE o PARADA'
+COLUMNA_HORA_FIN_INCID = 'HORA DE FIN DEL INCIDENTE o PARADA'
+COLUMNA_DESC_INCID = 'DESCRIPCIÓN DEL INCIDENTE O PARADA'
+COLUMNA_ACCIONES_INCID = 'ACCIONES CORRECTIVAS'
+COLUMNA_MAQUINA_INCID = 'MAQUINA ASOCIADA AL INCIDENTE O PARADA'
+# Observaciones
+COLUMNA_OBSERVACIONES = 'OBSERVACIONES ADICIONALES'
+
+COLUMNAS_FECHA = [COLUMNA_TIMESTAMP, COLUMNA_FECHA_PROD, COLUMNA_FECHA_MANT, COLUMNA_FECHA_INCID]
+# Formatos de exportación de Google Forms (M/D/AAAA); lo que no coincide se infiere fila a fila
+FORMATOS_FECHA = {
+    COLUMNA_TIMESTAMP: '%m/%d/%Y %H:%M',
+    COLUMNA_FECHA_PROD: '%m/%d/%Y', COLUMNA_FECHA_MANT: '%m/%d/%Y', COLUMNA_FECHA_INCID: '%m/%d/%Y',
+}
+COLUMNAS_MAQUINA = [COLUMNA_MAQUINA_PROD, COLUMNA_MAQUINA_MANT, COLUMNA_MAQUINA_INCID]
+# Columnas de opciones cortas (categorías, Sí/No, horas): se normalizan quitando espacios extremos en la carga
+COLUMNAS_CATEGORICAS = [
+    COLUMNA_EVENTO, COLUMNA_HUBO_PRODUCCION, COLUMNA_PRODUCTO, COLUMNA_UNIDAD, COLUMNA_REALIZO_MANTENIMIENTO,
+    COLUMNA_TIPO_MANT, COLUMNA_ANOMALIAS_DETECTADAS_BOOL,
+] + COLUMNAS_MAQUINA
+COLUMNAS_HORA = [
+    COLUMNA_HORA_INI_PROD, COLUMNA_HORA_FIN_PROD, COLUMNA_HORA_INI_MANT, COLUMNA_HORA_FIN_MANT,
+    COLUMNA_HORA_INI_INCID, COLUMNA_HORA_FIN_INCID,
+]
+# Texto libre y datos de quien registra: fuera del DataFrame analítico (ver datos/textos.py)
+COLUMNAS_TEXTO_LIBRE = [
+    COLUMNA_DESC_MANT, COLUMNA_ANOMALIAS_DESC, COLUMNA_DESC_INCID, COLUMNA_ACCIONES_INCID,
+    COLUMNA_OBSERVACIONES, COLUMNA_EMAIL, COLUMNA_NOMBRE,
+]
+
+# Valores clave
+VALOR_PRODUCCION = 'Producción'
+VALOR_MANTENIMIENTO = 'Mantenimiento'
+VALOR_INCIDENTES = 'Incidentes y Paradas'
+VALOR_OBSERVACIONES = 'Observaciones Generales'
+VALOR_SI = 'Sí'
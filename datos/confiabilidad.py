@@ -0,0 +1,167 @@
+# datos/confiabilidad.py
+# Confiabilidad por máquina a partir de las filas de incidentes/paradas:
+#   MTTR = horas de reparación / cantidad de fallas
+#   MTBF = promedio de horas entre el fin de una falla y el inicio de la siguiente en la misma máquina
+# El motor guarda el estado acumulado por (planta, máquina); cuando el archivo solo creció (el formulario
+# agrega filas al final) procesa únicamente las filas nuevas. Si el prefijo ya procesado cambió, reconstruye.
+
+import numpy as np
+import pandas as pd
+
+from datos.cache import LockProceso
+from datos.columnas import (
+    COLUMNA_PLANTA, COLUMNA_TIMESTAMP, COLUMNA_ID_FILA,
+    COLUMNA_MAQUINA_INCID, COLUMNA_FECHA_INCID, COLUMNA_HORA_INI_INCID, COLUMNA_HORA_FIN_INCID,
+)
+from datos.carga import firma_prefijo
+from datos.filtros import VALORES_SIN_FILTRO
+from datos.intervalos import intervalos
+from datos.precalculo import ultimo_artefacto
+
+COLUMNAS_SUMAS = [COLUMNA_PLANTA, 'maquina', 'fallas', 'horas_reparacion', 'intervalos', 'horas_entre_fallas']
+COLUMNAS_INCIDENTES = [COLUMNA_PLANTA, 'maquina', 'inicio', 'fin', 'horas', COLUMNA_ID_FILA]
+# Columnas que lee el motor: la firma cubre todas las filas ya procesadas (una falla editada obliga a reconstruir)
+COLUMNAS_FIRMA = [COLUMNA_TIMESTAMP, COLUMNA_PLANTA, COLUMNA_MAQUINA_INCID, COLUMNA_FECHA_INCID,
+                  COLUMNA_HORA_INI_INCID, COLUMNA_HORA_FIN_INCID]
+
+_lock_motor = LockProceso()
+_motor = None
+
+
+def _incidentes(df):
+    """Intervalos de falla válidos (máquina, inicio y fin conocidos) de las filas de df, ordenados por inicio."""
+    if not {COLUMNA_MAQUINA_INCID, COLUMNA_FECHA_INCID} <= set(df.columns):
+        return pd.DataFrame(columns=COLUMNAS_INCIDENTES)
+    df_incid = df[df[COLUMNA_FECHA_INCID].notna() & df[COLUMNA_MAQUINA_INCID].notna()]
+    tramos = intervalos(df_incid, COLUMNA_FECHA_INCID, COLUMNA_HORA_INI_INCID, COLUMNA_HORA_FIN_INCID)
+    incid = pd.DataFrame({
+        COLUMNA_PLANTA: df_incid[COLUMNA_PLANTA] if COLUMNA_PLANTA in df_incid.columns else '',
+        'maquina': df_incid[COLUMNA_MAQUINA_INCID],
+        'inicio': tramos['inicio'],
+        'fin': tramos['fin'],
+        'horas': tramos['horas'],
+        COLUMNA_ID_FILA: df_incid[COLUMNA_ID_FILA],
+    })
+    return incid[incid['horas'].notna()].sort_values('inicio', kind='stable', ignore_index=True)
+
+
+def _huecos(inicios, fines, fin_previo=None):
+    """Horas entre el fin de cada falla y el inicio de la siguiente (ordenadas por inicio); 0 si se superponen.
+    Con `fin_previo` el primer hueco se mide desde la última falla ya acumulada."""
+    anteriores = np.maximum.accumulate(fines)[:-1]  # Fin más tardío visto hasta la falla anterior
+    if fin_previo is not None:
+        anteriores = np.concatenate([[fin_previo], np.maximum(anteriores, fin_previo)])
+        inicios_medidos = inicios
+    else:
+        inicios_medidos = inicios[1:]
+    return np.maximum((inicios_medidos - anteriores) / np.timedelta64(1, 'h'), 0.0)
+
+
+class MotorConfiabilidad:
+    """Estado acumulado de fallas por (planta, máquina), actualizable con filas agregadas al final del dataset."""
+
+    def __init__(self):
+        self.version = None
+        self.filas_procesadas = 0
+        self.firma = 0
+        self.incidentes = pd.DataFrame(columns=COLUMNAS_INCIDENTES)
+        # (planta, máquina) -> fallas, horas_reparacion, intervalos, horas_entre_fallas, ultimo_fin
+        self.estado = {}
+
+    def puede_extender(self, df):
+        """True si ninguna de las filas ya procesadas cambió (el archivo solo creció)."""
+        return self.filas_procesadas > 0 and firma_prefijo(df, self.filas_procesadas, COLUMNAS_FIRMA) == self.firma
+
+    def agregar(self, df_nuevas):
+        """Acumula las fallas de las filas nuevas: O(filas nuevas) salvo máquinas con fallas cargadas fuera
+        de orden (anteriores a la última acumulada), que se recalculan desde su historial."""
+        nuevas = _incidentes(df_nuevas)
+        self.filas_procesadas += len(df_nuevas)
+        if nuevas.empty:
+            return 0
+        self.incidentes = pd.concat([self.incidentes, nuevas], ignore_index=True) if len(self.incidentes) else nuevas
+        for clave, grupo in nuevas.groupby([COLUMNA_PLANTA, 'maquina'], sort=False):
+            previo = self.estado.get(clave)
+            inicios = grupo['inicio'].to_numpy()
+            fines = grupo['fin'].to_numpy()
+            if previo is not None and inicios[0] < previo['ultimo_fin']:
+                historial = self.incidentes[(self.incidentes[COLUMNA_PLANTA] == clave[0]) & (self.incidentes['maquina'] == clave[1])]
+                historial = historial.sort_values('inicio', kind='stable')
+                previo, inicios, fines = None, historial['inicio'].to_numpy(), historial['fin'].to_numpy()
+                horas = historial['horas'].to_numpy()
+            else:
+                horas = grupo['horas'].to_numpy()
+            huecos = _huecos(inicios, fines, None if previo is None else previo['ultimo_fin'])
+            base = previo or {'fallas': 0, 'horas_reparacion': 0.0, 'intervalos': 0, 'horas_entre_fallas': 0.0, 'ultimo_fin': fines[0]}
+            self.estado[clave] = {
+                'fallas': base['fallas'] + len(inicios),
+                'horas_reparacion': base['horas_reparacion'] + float(horas.sum()),
+                'intervalos': base['intervalos'] + len(huecos),
+                'horas_entre_fallas': base['horas_entre_fallas'] + float(huecos.sum()),
+                'ultimo_fin': max(base['ultimo_fin'], fines.max()),
+            }
+        return len(nuevas)
+
+    def resumen_acumulado(self, planta=None):
+        """MTBF/MTTR históricos por máquina a partir del estado acumulado (sin recorrer incidentes)."""
+        filas = [{COLUMNA_PLANTA: p, 'maquina': m, **{k: v for k, v in e.items() if k != 'ultimo_fin'}}
+                 for (p, m), e in self.estado.items() if planta in VALORES_SIN_FILTRO or p == planta]
+        return _metricas(pd.DataFrame(filas, columns=COLUMNAS_SUMAS))
+
+    def resumen_rango(self, fecha_inicio=None, fecha_fin=None, maquina=None, planta=None):
+        """MTBF/MTTR por máquina solo con las fallas que empiezan en el rango (días completos)."""
+        incid = self.incidentes
+        mascara = np.ones(len(incid), dtype=bool)
+        if fecha_inicio is not None: mascara &= (incid['inicio'] >= fecha_inicio).to_numpy()
+        if fecha_fin is not None: mascara &= (incid['inicio'] < pd.Timestamp(fecha_fin) + pd.Timedelta(days=1)).to_numpy()
+        if maquina not in VALORES_SIN_FILTRO: mascara &= (incid['maquina'] == maquina).to_numpy()
+        if planta not in VALORES_SIN_FILTRO: mascara &= (incid[COLUMNA_PLANTA] == planta).to_numpy()
+        incid = incid[mascara].sort_values([COLUMNA_PLANTA, 'maquina', 'inicio'], kind='stable')
+        if incid.empty:
+            return _metricas(pd.DataFrame(columns=COLUMNAS_SUMAS))
+        claves = [incid[COLUMNA_PLANTA], incid['maquina']]
+        fin_previo = incid.groupby(claves, sort=False)['fin'].cummax().groupby(claves, sort=False).shift()
+        huecos = ((incid['inicio'] - fin_previo).dt.total_seconds() / 3600.0).clip(lower=0.0)
+        sumas = incid.assign(hueco=huecos).groupby([COLUMNA_PLANTA, 'maquina']).agg(
+            fallas=('horas', 'size'), horas_reparacion=('horas', 'sum'),
+            intervalos=('hueco', 'count'), horas_entre_fallas=('hueco', 'sum'),
+        )
+        return _metricas(sumas.reset_index())
+
+
+def _metricas(sumas):
+    """Agrega MTTR y MTBF (horas) a las sumas por máquina; MTBF es NaN con menos de dos fallas."""
+    fallas = sumas['fallas'].astype(float).replace(0, np.nan)
+    intervalos_medidos = sumas['intervalos'].astype(float).replace(0, np.nan)
+    return sumas.assign(mttr_horas=sumas['horas_reparacion'].astype(float) / fallas,
+                        mtbf_horas=sumas['horas_entre_fallas'].astype(float) / intervalos_medidos).sort_values(['maquina', COLUMNA_PLANTA], ignore_index=True)
+
+
+def obtener_motor_confiabilidad(df, version_datos):
+    """Motor al día con esta versión del dataset: extiende el estado con las filas nuevas o lo reconstruye."""
+    global _motor
+    motor = _motor
+    if motor is not None and motor.version == version_datos:
+        return motor
+    with _lock_motor:
+        motor = _motor
+        if motor is None:
+            # Tras un reinicio se parte del último estado guardado por el precálculo (de esta u otra versión)
+            motor = ultimo_artefacto('confiabilidad')[1]
+        if motor is not None and motor.version == version_datos:
+            _motor = motor
+            return motor
+        if motor is not None and motor.puede_extender(df):
+            nuevo = MotorConfiabilidad()
+            nuevo.__dict__.update({**motor.__dict__, 'estado': dict(motor.estado)})
+            desde = motor.filas_procesadas
+            n_nuevas = nuevo.agregar(df.iloc[desde:])
+            print(f"Confiabilidad: {n_nuevas} falla(s) nueva(s) en {len(df) - desde} fila(s) agregada(s).")
+        else:
+            nuevo = MotorConfiabilidad()
+            n_nuevas = nuevo.agregar(df)
+            print(f"Confiabilidad: estado reconstruido con {n_nuevas} falla(s).")
+        nuevo.version = version_datos
+        nuevo.firma = firma_prefijo(df, nuevo.filas_procesadas, COLUMNAS_FIRMA)
+        _motor = nuevo
+        return nuevo
@@ -0,0 +1,126 @@
+# datos/corpus.py
+# Corpus tokenizado de las observaciones: cada observación se normaliza una sola vez (minúsculas, sin
+# puntuación ni dígitos, como la nube de palabras) y se guarda como ids enteros de término sobre un
+# vocabulario compartido (inicios por fila + arreglo plano de ids). El corpus se conserva entre recargas:
+# si el archivo solo creció (ninguna fila ya tokenizada cambió, texto incluido), se tokenizan únicamente
+# las filas nuevas; si no, se reconstruye. La nube de palabras (y cualquier conteo o tendencia de
+# términos) sale de un np.bincount sobre los ids de las filas pedidas, sin volver a procesar el texto.
+
+import re
+import numpy as np
+
+from datos.cache import LockProceso
+from datos.carga import firma_prefijo, obtener_textos
+from datos.columnas import COLUMNA_TIMESTAMP, COLUMNA_PLANTA, COLUMNA_EVENTO, COLUMNA_OBSERVACIONES
+from datos.precalculo import ultimo_artefacto
+
+# El texto de la observación (leído del almacén de textos) forma parte de la firma: editarla obliga a reconstruir
+COLUMNAS_FIRMA = [COLUMNA_TIMESTAMP, COLUMNA_PLANTA, COLUMNA_EVENTO, COLUMNA_OBSERVACIONES]
+
+_PATRON_PUNTUACION = re.compile(r'[^\w\s]')
+_PATRON_DIGITOS = re.compile(r'\d+')
+_PATRON_TERMINO = re.compile(r'\w+')
+
+_lock_corpus = LockProceso()
+_corpus = None
+
+
+def tokenizar_observacion(texto):
+    """Términos de una observación: minúsculas, sin puntuación ni dígitos (conserva acentos)."""
+    limpio = _PATRON_DIGITOS.sub('', _PATRON_PUNTUACION.sub('', texto.lower()))
+    return _PATRON_TERMINO.findall(limpio)
+
+
+class CorpusTokens:
+    """Ids de término por fila (formato CSR: tokens[inicios[f]:inicios[f + 1]]), extendible con filas nuevas."""
+
+    def __init__(self, columna=COLUMNA_OBSERVACIONES):
+        self.columna = columna
+        self.version = None
+        self.firma = 0
+        self.vocabulario = []  # id -> término
+        self._ids = {}  # término -> id
+        self.inicios = np.zeros(1, dtype=np.int64)
+        self.tokens = np.zeros(0, dtype=np.int32)
+
+    @property
+    def filas_procesadas(self):
+        return len(self.inicios) - 1
+
+    def puede_extender(self, df, textos):
+        """True si ninguna de las filas ya tokenizadas cambió (incluido su texto)."""
+        return self.filas_procesadas > 0 and firma_prefijo(df, self.filas_procesadas, COLUMNAS_FIRMA, textos) == self.firma
+
+    def agregar(self, textos):
+        """Tokeniza los textos de las filas nuevas (None = sin texto), en orden de fila."""
+        ids, largos = [], []
+        for texto in textos:
+            terminos = tokenizar_observacion(texto) if texto else []
+            for termino in terminos:
+                id_termino = self._ids.get(termino)
+                if id_termino is None:
+                    id_termino = self._ids[termino] = len(self.vocabulario)
+                    self.vocabulario.append(termino)
+                ids.append(id_termino)
+            largos.append(len(terminos))
+        self.tokens = np.concatenate([self.tokens, np.asarray(ids, dtype=np.int32)])
+        self.inicios = np.concatenate([self.inicios, self.inicios[-1] + np.cumsum(largos, dtype=np.int64)])
+        return sum(largos)
+
+    def tokens_de(self, filas):
+        """Ids de término de las filas pedidas, concatenados."""
+        filas = np.asarray(filas, dtype=np.int64)
+        if len(filas) == 0:
+            return np.zeros(0, dtype=np.int32)
+        inicios, fines = self.inicios[filas], self.inicios[filas + 1]
+        largos = fines - inicios
+        # Posición de cada token: inicio de su fila + desplazamiento dentro de ella
+        desplazamientos = np.arange(largos.sum()) - np.repeat(np.cumsum(largos) - largos, largos)
+        return self.tokens[np.repeat(inicios, largos) + desplazamientos]
+
+    def conteos(self, filas):
+        """Ocurrencias de cada término del vocabulario (por id) en las filas pedidas."""
+        return np.bincount(self.tokens_de(filas), minlength=len(self.vocabulario))
+
+    def frecuencias(self, filas, excluir=frozenset(), unir_plurales=True):
+        """{término: ocurrencias} en las filas pedidas, sin los términos de `excluir` (en minúsculas). Con
+        unir_plurales, 'x' + 's' suma en 'x' si ambos aparecen (como WordCloud; no los terminados en 'ss')."""
+        conteos = self.conteos(filas)
+        frecuencias = {self.vocabulario[i]: int(conteos[i]) for i in np.flatnonzero(conteos).tolist()
+                       if self.vocabulario[i] not in excluir}
+        if unir_plurales:
+            for termino in [t for t in frecuencias if t.endswith('s') and not t.endswith('ss')]:
+                if termino[:-1] in frecuencias:
+                    frecuencias[termino[:-1]] += frecuencias.pop(termino)
+        return frecuencias
+
+
+def obtener_corpus(df, version_datos):
+    """Corpus al día con esta versión del dataset: tokeniza solo las filas agregadas o lo reconstruye."""
+    global _corpus
+    corpus = _corpus
+    if corpus is not None and corpus.version == version_datos:
+        return corpus
+    with _lock_corpus:
+        corpus = _corpus
+        if corpus is None:
+            # Tras un reinicio se parte del último estado guardado por el precálculo (de esta u otra versión)
+            corpus = ultimo_artefacto('corpus_observaciones')[1]
+        if corpus is not None and corpus.version == version_datos:
+            _corpus = corpus
+            return corpus
+        textos = obtener_textos()
+        if corpus is not None and corpus.puede_extender(df, textos):
+            nuevo = CorpusTokens(corpus.columna)
+            nuevo.__dict__.update({**corpus.__dict__, 'vocabulario': list(corpus.vocabulario), '_ids': dict(corpus._ids)})
+            desde = corpus.filas_procesadas
+            n_tokens = nuevo.agregar(textos.valores(nuevo.columna, np.arange(desde, len(df))))
+            print(f"Corpus de observaciones: {n_tokens} término(s) en {len(df) - desde} fila(s) agregada(s).")
+        else:
+            nuevo = CorpusTokens()
+            n_tokens = nuevo.agregar(textos.valores(nuevo.columna, np.arange(len(df))))
+            print(f"Corpus de observaciones: {n_tokens} término(s), {len(nuevo.vocabulario)} distintos, tokenizado(s) desde cero.")
+        nuevo.version = version_datos
+        nuevo.firma = firma_prefijo(df, nuevo.filas_procesadas, COLUMNAS_FIRMA, textos)
+        _corpus = nuevo
+        return nuevo
@@ -0,0 +1,58 @@
+# datos/cortes.py
+# Cortes por columnas de los datos que muestra una página, para filtrarlos en el navegador (callbacks
+# clientside de assets/cortes.js). Solo viajan las columnas de la tabla: el instante de cada fila como
+# ordinal de día (con fracción si tiene hora), las columnas categóricas como diccionario + códigos enteros
+# y el resto como listas ya formateadas. El corte se arma una vez por (página, versión del dataset, planta):
+# mover el slider o cambiar la máquina filtra en el navegador, sin volver a llamar al servidor.
+# (El navegador no tiene un decodificador Arrow, así que el formato es JSON columnar: un Store de Dash.)
+
+import numpy as np
+import pandas as pd
+
+from datos.cache import CacheLRU, LockProceso
+
+# Días entre el ordinal de Python (0001-01-01 = 1) y la época Unix
+ORDINAL_EPOCA = 719163
+
+_cache_cortes = CacheLRU(max_entradas=16)
+_lock_cortes = LockProceso()
+
+
+def _lista(serie):
+    """Lista JSON de una Serie: None en lugar de NaN/NaT."""
+    return serie.astype(object).where(serie.notna(), None).tolist()
+
+
+def dias_ordinales(fechas):
+    """Ordinal de día (como date.toordinal()) más la fracción del día transcurrida; None si falta la fecha."""
+    dias = (fechas - pd.Timestamp('1970-01-01')) / pd.Timedelta(days=1) + ORDINAL_EPOCA
+    return _lista(dias)
+
+
+def corte_columnar(df, instantes, columnas, categoricas=None, orden=None):
+    """Corte de las filas de df, en su orden. `instantes`: Serie de Timestamps alineada con df (filtro por
+    rango). `columnas` / `categoricas`: nombre en el corte -> Serie alineada con df; las categóricas se
+    codifican con diccionario (código -1 = vacío). `orden`: columnas de la tabla, en orden."""
+    categoricas = categoricas or {}
+    corte = {'n': len(df), 'dia': dias_ordinales(instantes), 'columnas': {}, 'categoricas': {}}
+    for nombre, serie in columnas.items():
+        corte['columnas'][nombre] = _lista(serie)
+    for nombre, serie in categoricas.items():
+        codigos, valores = pd.factorize(serie)
+        corte['categoricas'][nombre] = {'valores': _lista(pd.Series(valores, dtype=object)), 'codigos': codigos.astype(np.int64).tolist()}
+    corte['orden'] = list(orden) if orden is not None else list(columnas) + list(categoricas)
+    return corte
+
+
+def obtener_corte(pagina, version_datos, planta, construir):
+    """Corte de la página para esta versión del dataset y planta: `construir()` una sola vez por clave."""
+    clave = (pagina, version_datos, planta)
+    corte = _cache_cortes.obtener(clave)
+    if corte is None:
+        with _lock_cortes:
+            corte = _cache_cortes.obtener(clave)
+            if corte is None:
+                corte = construir()
+                corte['version'] = version_datos
+                _cache_cortes.guardar(clave, corte)
+    return corte
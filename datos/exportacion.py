@@ -0,0 +1,139 @@
+# datos/exportacion.py
+# Exportación de los registros filtrados de cada página en bloques de filas (CSV, Excel, Parquet).
+# Nunca se arma el archivo completo en memoria: se recorren los ids filtrados de a CHUNK_FILAS.
+
+import pandas as pd
+
+from datos.columnas import (
+    COLUMNA_ID_FILA, COLUMNA_PLANTA, COLUMNA_TIMESTAMP, COLUMNA_EVENTO,
+    COLUMNA_FECHA_PROD, COLUMNA_MAQUINA_PROD, COLUMNA_PRODUCTO, COLUMNA_UNIDAD, COLUMNA_CANTIDAD,
+    COLUMNA_HORA_INI_PROD, COLUMNA_HORA_FIN_PROD,
+    COLUMNA_FECHA_MANT, COLUMNA_MAQUINA_MANT, COLUMNA_TIPO_MANT, COLUMNA_DESC_MANT,
+    COLUMNA_HORA_INI_MANT, COLUMNA_HORA_FIN_MANT, COLUMNA_ANOMALIAS_DETECTADAS_BOOL, COLUMNA_ANOMALIAS_DESC,
+    COLUMNA_FECHA_INCID, COLUMNA_MAQUINA_INCID, COLUMNA_HORA_INI_INCID, COLUMNA_HORA_FIN_INCID,
+    COLUMNA_DESC_INCID, COLUMNA_ACCIONES_INCID,
+    COLUMNA_OBSERVACIONES,
+)
+from datos.filtros import filas_produccion, filas_mantenimiento, filas_incidentes, filas_observaciones
+
+# Librerías opcionales: sin ellas solo se ofrece CSV
+try:
+    from openpyxl import Workbook
+    openpyxl_disponible = True
+except ImportError:
+    Workbook = None
+    openpyxl_disponible = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    pyarrow_disponible = True
+except ImportError:
+    pa = None
+    pq = None
+    pyarrow_disponible = False
+
+# Filas por bloque al recorrer la selección
+CHUNK_FILAS = 5000
+
+# Columnas exportadas por página (id, planta y timestamp primero, para poder cruzar con el formulario)
+COLUMNAS_EXPORTACION = {
+    'produccion': [
+        COLUMNA_ID_FILA, COLUMNA_PLANTA, COLUMNA_TIMESTAMP, COLUMNA_FECHA_PROD, COLUMNA_MAQUINA_PROD, COLUMNA_PRODUCTO,
+        COLUMNA_UNIDAD, COLUMNA_CANTIDAD, COLUMNA_HORA_INI_PROD, COLUMNA_HORA_FIN_PROD,
+    ],
+    'mantenimiento': [
+        COLUMNA_ID_FILA, COLUMNA_PLANTA, COLUMNA_TIMESTAMP, COLUMNA_FECHA_MANT, COLUMNA_MAQUINA_MANT, COLUMNA_TIPO_MANT,
+        COLUMNA_HORA_INI_MANT, COLUMNA_HORA_FIN_MANT, COLUMNA_DESC_MANT,
+        COLUMNA_ANOMALIAS_DETECTADAS_BOOL, COLUMNA_ANOMALIAS_DESC,
+    ],
+    'incidentes': [
+        COLUMNA_ID_FILA, COLUMNA_PLANTA, COLUMNA_TIMESTAMP, COLUMNA_EVENTO, COLUMNA_FECHA_INCID, COLUMNA_MAQUINA_INCID,
+        COLUMNA_HORA_INI_INCID, COLUMNA_HORA_FIN_INCID, COLUMNA_DESC_INCID, COLUMNA_ACCIONES_INCID,
+    ],
+    'observaciones': [COLUMNA_ID_FILA, COLUMNA_PLANTA, COLUMNA_TIMESTAMP, COLUMNA_OBSERVACIONES],
+}
+
+# Formato -> (extensión, tipo MIME)
+FORMATOS_EXPORTACION = {
+    'csv': ('csv', 'text/csv'),
+    'xlsx': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+
+
+def formato_disponible(formato):
+    if formato == 'xlsx': return openpyxl_disponible
+    if formato == 'parquet': return pyarrow_disponible
+    return formato in FORMATOS_EXPORTACION
+
+
+def filas_pagina(df, pagina, fecha_inicio=None, fecha_fin=None, producto=None, maquina=None, planta=None, textos=None):
+    """Ids de fila que muestra la página con esos filtros (mismo criterio que sus callbacks)."""
+    if pagina == 'produccion':
+        return filas_produccion(df, producto, fecha_inicio, fecha_fin, planta)
+    if pagina == 'mantenimiento':
+        return filas_mantenimiento(df, maquina, fecha_inicio, fecha_fin, planta)
+    if pagina == 'incidentes':
+        return filas_incidentes(df, maquina, fecha_inicio, fecha_fin, planta)
+    if pagina == 'observaciones':
+        return filas_observaciones(df, fecha_inicio, fecha_fin, planta, textos)
+    raise ValueError(f"Página de exportación desconocida: {pagina}")
+
+
+def columnas_pagina(df, pagina, textos=None):
+    disponibles = set(df.columns) | set(textos.columnas if textos is not None else [])
+    return [col for col in COLUMNAS_EXPORTACION[pagina] if col in disponibles]
+
+
+def iterar_bloques(df, filas, columnas, chunk=CHUNK_FILAS, textos=None):
+    """Genera DataFrames de a `chunk` filas con solo las columnas pedidas (texto libre leído del almacén)."""
+    columnas_texto = [col for col in columnas if col not in df.columns]
+    posiciones = df.columns.get_indexer([col for col in columnas if col in df.columns])
+    for inicio in range(0, len(filas), chunk):
+        bloque = df.iloc[filas[inicio:inicio + chunk], posiciones]
+        if columnas_texto:
+            ids = filas[inicio:inicio + chunk]
+            bloque = bloque.assign(**{col: pd.Series(textos.valores(col, ids), index=bloque.index, dtype='str') for col in columnas_texto})[columnas]
+        yield bloque
+
+
+# --- Escritores por formato ---
+def csv_en_bloques(df, filas, columnas, chunk=CHUNK_FILAS, textos=None):
+    """Bytes CSV (UTF-8 con BOM para Excel) bloque a bloque; el encabezado va solo en el primero."""
+    yield '\ufeff'.encode('utf-8')
+    if len(filas) == 0:
+        yield pd.DataFrame(columns=columnas).to_csv(index=False).encode('utf-8')
+        return
+    for i, bloque in enumerate(iterar_bloques(df, filas, columnas, chunk, textos)):
+        yield bloque.to_csv(index=False, header=(i == 0)).encode('utf-8')
+
+
+def escribir_xlsx(df, filas, columnas, destino, hoja='Registros', chunk=CHUNK_FILAS, textos=None):
+    """Escribe un .xlsx en modo write_only (las filas van al disco a medida que se agregan)."""
+    if not openpyxl_disponible:
+        raise RuntimeError("openpyxl no está instalado")
+    libro = Workbook(write_only=True)
+    hoja_ws = libro.create_sheet(hoja)
+    hoja_ws.append(columnas)
+    for bloque in iterar_bloques(df, filas, columnas, chunk, textos):
+        valores = bloque.astype(object).where(bloque.notna(), None)
+        for fila in valores.itertuples(index=False, name=None):
+            hoja_ws.append(list(fila))
+    libro.save(destino)
+
+
+def _tipar_bloque(bloque):
+    # Columnas de texto como 'string' para que todos los bloques compartan el mismo esquema Arrow
+    return bloque.astype({col: 'string' for col in bloque.columns if bloque[col].dtype == object})
+
+
+def escribir_parquet(df, filas, columnas, destino, chunk=CHUNK_FILAS, textos=None):
+    """Escribe un .parquet con un row group por bloque."""
+    if not pyarrow_disponible:
+        raise RuntimeError("pyarrow no está instalado")
+    vacio = df.iloc[:0].assign(**{col: pd.Series(dtype='str') for col in columnas if col not in df.columns})[columnas]
+    esquema = pa.Schema.from_pandas(_tipar_bloque(vacio), preserve_index=False)
+    with pq.ParquetWriter(destino, esquema) as escritor:
+        for bloque in iterar_bloques(df, filas, columnas, chunk, textos):
+            escritor.write_table(pa.Table.from_pandas(_tipar_bloque(bloque), schema=esquema, preserve_index=False))
@@ -0,0 +1,107 @@
+# datos/filtros.py
+# Filtros de cada página sobre el dataset tipado. Devuelven ids de fila (posiciones) para que las
+# páginas y la exportación trabajen exactamente con el mismo conjunto de registros.
+
+import numpy as np
+import pandas as pd
+
+from datos.columnas import (
+    COLUMNA_ID_FILA, COLUMNA_EVENTO, COLUMNA_TIMESTAMP,
+    COLUMNA_FECHA_PROD, COLUMNA_HUBO_PRODUCCION, COLUMNA_MAQUINA_PROD, COLUMNA_PRODUCTO, COLUMNA_UNIDAD,
+    COLUMNA_CANTIDAD, COLUMNA_HORA_INI_PROD, COLUMNA_HORA_FIN_PROD,
+    COLUMNA_FECHA_MANT, COLUMNA_REALIZO_MANTENIMIENTO, COLUMNA_MAQUINA_MANT,
+    COLUMNA_FECHA_INCID, COLUMNA_MAQUINA_INCID,
+    COLUMNA_OBSERVACIONES, COLUMNA_PLANTA,
+    VALOR_PRODUCCION, VALOR_MANTENIMIENTO, VALOR_OBSERVACIONES, VALOR_SI,
+)
+
+# Valores "sin filtro" de los dropdowns de las páginas
+VALORES_SIN_FILTRO = (None, '', 'Todas', 'Todos')
+
+
+def rango_desde_slider(rango_fechas_slider):
+    """Convierte el valor [ordinal_inicio, ordinal_fin] de un RangeSlider en Timestamps."""
+    return pd.Timestamp.fromordinal(int(rango_fechas_slider[0])), pd.Timestamp.fromordinal(int(rango_fechas_slider[1]))
+
+
+# --- Máscaras auxiliares (False si la columna no existe) ---
+def _igual(df, columna, valor):
+    if columna not in df.columns: return np.zeros(len(df), dtype=bool)
+    return (df[columna] == valor).to_numpy(dtype=bool, na_value=False)
+
+def _no_vacio(df, columna, textos=None):
+    if columna not in df.columns:
+        # Texto libre: la máscara la guarda el almacén (sin descomprimir); filas = ID_FILA de df
+        if textos is not None and columna in textos.columnas:
+            return textos.no_vacio(columna)[df[COLUMNA_ID_FILA].to_numpy()]
+        return np.zeros(len(df), dtype=bool)
+    serie = df[columna]
+    return (serie.notna() & (serie.astype(str).str.strip() != '')).to_numpy(dtype=bool, na_value=False)
+
+def _es_hora(df, columna):
+    if columna not in df.columns: return np.zeros(len(df), dtype=bool)
+    return df[columna].astype('string').str.contains(':', regex=False).to_numpy(dtype=bool, na_value=False)
+
+def _en_rango(df, columna, fecha_inicio, fecha_fin):
+    if columna not in df.columns: return np.zeros(len(df), dtype=bool)
+    serie = df[columna]
+    mascara = serie.notna()
+    if fecha_inicio is not None: mascara &= serie >= fecha_inicio
+    if fecha_fin is not None: mascara &= serie <= fecha_fin
+    return mascara.to_numpy(dtype=bool, na_value=False)
+
+
+def _en_planta(df, planta):
+    if planta in VALORES_SIN_FILTRO: return np.ones(len(df), dtype=bool)
+    return _igual(df, COLUMNA_PLANTA, planta)
+
+
+def filtrar_planta(df, planta):
+    """Subconjunto de filas de la planta (el mismo df si no hay filtro de planta)."""
+    if planta in VALORES_SIN_FILTRO:
+        return df
+    return df.iloc[np.flatnonzero(_en_planta(df, planta))]
+
+
+# --- Filtros por página ---
+def filas_produccion(df, producto=None, fecha_inicio=None, fecha_fin=None, planta=None):
+    """Producción válida (cantidad > 0, máquina, unidad y horas presentes) por producto y rango de fecha."""
+    mascara = (
+        _igual(df, COLUMNA_EVENTO, VALOR_PRODUCCION) & _igual(df, COLUMNA_HUBO_PRODUCCION, VALOR_SI) &
+        _no_vacio(df, COLUMNA_PRODUCTO) & _no_vacio(df, COLUMNA_MAQUINA_PROD) & _no_vacio(df, COLUMNA_UNIDAD) &
+        _es_hora(df, COLUMNA_HORA_INI_PROD) & _es_hora(df, COLUMNA_HORA_FIN_PROD) &
+        _en_rango(df, COLUMNA_FECHA_PROD, fecha_inicio, fecha_fin) & _en_planta(df, planta)
+    )
+    if COLUMNA_CANTIDAD in df.columns:
+        mascara &= (df[COLUMNA_CANTIDAD] > 0).to_numpy(dtype=bool, na_value=False)
+    else:
+        mascara[:] = False
+    if producto not in VALORES_SIN_FILTRO:
+        mascara &= _igual(df, COLUMNA_PRODUCTO, producto)
+    return np.flatnonzero(mascara)
+
+def filas_mantenimiento(df, maquina=None, fecha_inicio=None, fecha_fin=None, planta=None):
+    """Mantenimientos realizados ('Sí') por máquina y rango de fecha."""
+    mascara = (
+        _igual(df, COLUMNA_EVENTO, VALOR_MANTENIMIENTO) & _igual(df, COLUMNA_REALIZO_MANTENIMIENTO, VALOR_SI) &
+        _en_rango(df, COLUMNA_FECHA_MANT, fecha_inicio, fecha_fin) & _en_planta(df, planta)
+    )
+    if maquina not in VALORES_SIN_FILTRO:
+        mascara &= _igual(df, COLUMNA_MAQUINA_MANT, maquina)
+    return np.flatnonzero(mascara)
+
+def filas_incidentes(df, maquina=None, fecha_inicio=None, fecha_fin=None, planta=None):
+    """Filas con fecha de incidente/parada (cualquier tipo de evento) por máquina asociada y rango."""
+    mascara = _en_rango(df, COLUMNA_FECHA_INCID, fecha_inicio, fecha_fin) & _en_planta(df, planta)
+    if maquina not in VALORES_SIN_FILTRO:
+        mascara &= _igual(df, COLUMNA_MAQUINA_INCID, maquina)
+    return np.flatnonzero(mascara)
+
+def filas_observaciones(df, fecha_inicio=None, fecha_fin=None, planta=None, textos=None):
+    """Observaciones Generales con texto no vacío en el rango (por Timestamp).
+    `textos` es el AlmacenTextos del dataset (obtener_textos) si la columna no está en df."""
+    mascara = (
+        _igual(df, COLUMNA_EVENTO, VALOR_OBSERVACIONES) & _no_vacio(df, COLUMNA_OBSERVACIONES, textos) &
+        _en_rango(df, COLUMNA_TIMESTAMP, fecha_inicio, fecha_fin) & _en_planta(df, planta)
+    )
+    return np.flatnonzero(mascara)
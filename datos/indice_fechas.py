@@ -0,0 +1,73 @@
+# datos/indice_fechas.py
+# Índice unificado de fechas de evento: un único arreglo ordenado de (fecha, id de fila) con la fecha
+# que corresponde a cada tipo de registro. Un filtro por rango es una búsqueda binaria + unión de ids,
+# sin concatenar ni deduplicar DataFrames.
+
+import numpy as np
+import pandas as pd
+
+from datos.cache import CacheLRU, LockProceso
+from datos.columnas import (
+    COLUMNA_EVENTO, COLUMNA_TIMESTAMP, COLUMNA_FECHA_PROD, COLUMNA_FECHA_MANT, COLUMNA_FECHA_INCID,
+    VALOR_PRODUCCION, VALOR_MANTENIMIENTO, VALOR_OBSERVACIONES,
+)
+
+# (columna de fecha, tipo de evento requerido). None = cualquier evento con esa fecha.
+# Las filas con fecha de incidente cuentan siempre, sin importar el evento principal.
+FECHAS_POR_EVENTO = [
+    (COLUMNA_FECHA_PROD, VALOR_PRODUCCION),
+    (COLUMNA_FECHA_MANT, VALOR_MANTENIMIENTO),
+    (COLUMNA_FECHA_INCID, None),
+    (COLUMNA_TIMESTAMP, VALOR_OBSERVACIONES),
+]
+
+
+class IndiceFechas:
+    """Fechas de evento ordenadas con el id de fila al que pertenece cada una."""
+
+    def __init__(self, df, fechas_por_evento=FECHAS_POR_EVENTO):
+        self.n_filas = len(df)
+        fechas, ids = [], []
+        for col_fecha, evento in fechas_por_evento:
+            if col_fecha not in df.columns:
+                continue
+            valores = pd.to_datetime(df[col_fecha]).to_numpy(dtype='datetime64[ns]')
+            mascara = ~np.isnat(valores)
+            if evento is not None:
+                mascara &= (df[COLUMNA_EVENTO] == evento).to_numpy(dtype=bool, na_value=False)
+            fechas.append(valores[mascara])
+            ids.append(np.flatnonzero(mascara))
+        fechas = np.concatenate(fechas) if fechas else np.array([], dtype='datetime64[ns]')
+        ids = np.concatenate(ids) if ids else np.array([], dtype=np.int64)
+        orden = np.argsort(fechas, kind='stable')
+        self.fechas = fechas[orden]
+        self.ids = ids[orden]
+
+    def ids_en_rango(self, fecha_inicio, fecha_fin):
+        """Ids de fila con alguna fecha de evento en [fecha_inicio, fecha_fin] (puede repetir ids)."""
+        inicio = np.datetime64(pd.Timestamp(fecha_inicio), 'ns')
+        fin = np.datetime64(pd.Timestamp(fecha_fin), 'ns')
+        desde = np.searchsorted(self.fechas, inicio, side='left')
+        hasta = np.searchsorted(self.fechas, fin, side='right')
+        return self.ids[desde:hasta]
+
+    def fecha_minima(self):
+        return pd.Timestamp(self.fechas[0]) if len(self.fechas) else None
+
+    def fecha_maxima(self):
+        return pd.Timestamp(self.fechas[-1]) if len(self.fechas) else None
+
+
+# --- Índice por versión del dataset ---
+_cache_indices = CacheLRU(max_entradas=2)
+_lock_indices = LockProceso()
+
+def obtener_indice_fechas(df, version_datos):
+    """Devuelve el índice de fechas para esta versión del dataset (se construye una sola vez)."""
+    indice = _cache_indices.obtener(version_datos)
+    if indice is None:
+        with _lock_indices:
+            indice = _cache_indices.obtener(version_datos)
+            if indice is None:
+                indice = _cache_indices.guardar(version_datos, IndiceFechas(df))
+    return indice
@@ -0,0 +1,171 @@
+# datos/instrumentacion.py
+# Registro de cada invocación de callback (pedidos a /_dash-update-component) en un buffer circular en
+# memoria: callback, instante, duración, estado HTTP y, con el perfilado de memoria activo, el pico de
+# memoria asignada durante la invocación y la que quedó retenida al terminar (tracemalloc). Además, cada
+# pocos segundos (al terminar un callback) se anota la memoria residente del worker. La página de
+# rendimiento (pages/rendimiento.py) y /api/memoria leen de aquí.
+# El perfilado se activa y desactiva en caliente (POST /api/memoria/perfilado, o SIPROSA_PERFILADO_MEMORIA=1
+# al arrancar) porque tracemalloc hace más lentas todas las asignaciones mientras está activo. tracemalloc
+# mide el proceso entero, así que mientras perfila los callbacks de un worker corren de a uno (un lock
+# tomado desde before_request hasta el teardown del pedido): si no, uno reiniciaría el pico de otro y cada
+# uno contaría lo que asignan los demás. Los callbacks en segundo plano corren en otro proceso: aquí se ven
+# el pedido que los inicia y los sondeos.
+
+import os
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from flask import g, request
+
+from datos.cache import LockProceso
+from datos.memoria import memoria_proceso
+
+VARIABLE_PERFILADO = 'SIPROSA_PERFILADO_MEMORIA'
+# Invocaciones que se conservan (las más viejas se descartan)
+MAX_INVOCACIONES = 5000
+# Muestras de memoria residente: cada cuántos segundos como mínimo y cuántas se conservan (~2 h a 10 s)
+INTERVALO_MUESTRA_MEMORIA_S = 10
+MAX_MUESTRAS_MEMORIA = 720
+# Marcos de pila que guarda tracemalloc por asignación (1 alcanza para el pico; más sirve para snapshots)
+MARCOS_TRACEMALLOC = 1
+
+_invocaciones = deque(maxlen=MAX_INVOCACIONES)
+_muestras_memoria = deque(maxlen=MAX_MUESTRAS_MEMORIA)  # {'instante', 'rss_bytes'}
+_lock_perfilado = LockProceso()
+_lock_medicion = LockProceso()  # Un callback medido a la vez por worker mientras el perfilado está activo
+
+
+def nombre_callback(output):
+    """Nombre corto de un callback a partir de su clave 'output': la primera salida (+ cuántas más tiene)."""
+    salidas = output[2:-2].split('...') if output.startswith('..') else [output]
+    return salidas[0] if len(salidas) == 1 else f"{salidas[0]} (+{len(salidas) - 1})"
+
+
+# --- Perfilado de memoria ---
+def perfilado_activo():
+    return tracemalloc.is_tracing()
+
+
+def activar_perfilado(activo):
+    """Inicia o detiene tracemalloc en este proceso; devuelve el estado resultante."""
+    with _lock_perfilado:
+        if activo and not tracemalloc.is_tracing():
+            tracemalloc.start(MARCOS_TRACEMALLOC)
+        elif not activo and tracemalloc.is_tracing():
+            tracemalloc.stop()
+    return perfilado_activo()
+
+
+# --- Registro por invocación ---
+def _es_callback():
+    return request.path.endswith('/_dash-update-component')
+
+
+def _al_iniciar():
+    if not _es_callback():
+        return
+    memoria = None
+    if tracemalloc.is_tracing():
+        _lock_medicion.acquire()  # Se libera en _al_cerrar, aunque el callback falle
+        g.medicion_exclusiva = True
+        memoria = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    g.invocacion = (time.time(), time.perf_counter(), memoria)
+
+
+def _al_terminar(respuesta):
+    inicio = g.pop('invocacion', None)
+    if inicio is None:
+        return respuesta
+    instante, t0, memoria_inicial = inicio
+    datos = request.get_json(silent=True) or {}
+    invocacion = {
+        'instante': instante,
+        'callback': nombre_callback(datos.get('output', '?')),
+        'segundos': time.perf_counter() - t0,
+        'estado': respuesta.status_code,
+        'sondeo': 'cacheKey' in request.args,  # Sondeo de un callback en segundo plano
+        'pico_bytes': None,
+        'retenido_bytes': None,
+    }
+    if memoria_inicial is not None and tracemalloc.is_tracing():
+        actual, pico = tracemalloc.get_traced_memory()
+        invocacion['pico_bytes'] = max(pico - memoria_inicial, 0)
+        invocacion['retenido_bytes'] = actual - memoria_inicial
+    _invocaciones.append(invocacion)
+    if not _muestras_memoria or instante - _muestras_memoria[-1]['instante'] >= INTERVALO_MUESTRA_MEMORIA_S:
+        _muestras_memoria.append({'instante': instante, 'rss_bytes': memoria_proceso()})
+    return respuesta
+
+
+def _al_cerrar(_error=None):
+    if g.pop('medicion_exclusiva', False):
+        _lock_medicion.release()
+
+
+def instrumentar(server):
+    """Registra los hooks de Flask que anotan cada invocación de callback del servidor de la app."""
+    server.before_request(_al_iniciar)
+    server.after_request(_al_terminar)
+    server.teardown_request(_al_cerrar)
+    if os.environ.get(VARIABLE_PERFILADO, '0') == '1':
+        activar_perfilado(True)
+
+
+def invocaciones(desde=None):
+    """Copia de las invocaciones registradas (desde un instante time.time(), si se indica)."""
+    registro = list(_invocaciones)
+    return registro if desde is None else [i for i in registro if i['instante'] >= desde]
+
+
+def muestras_memoria():
+    """Memoria residente del worker a lo largo del tiempo (rss_bytes None sin psutil)."""
+    return list(_muestras_memoria)
+
+
+def resumen_callbacks(registro=None):
+    """Por callback: invocaciones, latencia p50/p95/p99/máxima (s), errores y, si hubo perfilado, pico máximo y p95 y
+    retenido promedio (bytes). Ordenado por pico máximo y luego por latencia p95."""
+    registro = invocaciones() if registro is None else registro
+    por_callback = {}
+    for invocacion in registro:
+        if not invocacion['sondeo']:
+            por_callback.setdefault(invocacion['callback'], []).append(invocacion)
+    resumen = []
+    for nombre, lista in por_callback.items():
+        segundos = [i['segundos'] for i in lista]
+        picos = [i['pico_bytes'] for i in lista if i['pico_bytes'] is not None]
+        retenidos = [i['retenido_bytes'] for i in lista if i['retenido_bytes'] is not None]
+        resumen.append({
+            'callback': nombre,
+            'invocaciones': len(lista),
+            'errores': sum(i['estado'] >= 500 for i in lista),
+            'p50_s': float(np.percentile(segundos, 50)),
+            'p95_s': float(np.percentile(segundos, 95)),
+            'p99_s': float(np.percentile(segundos, 99)),
+            'max_s': max(segundos),
+            'pico_max_bytes': max(picos) if picos else None,
+            'pico_p95_bytes': float(np.percentile(picos, 95)) if picos else None,
+            'retenido_promedio_bytes': float(np.mean(retenidos)) if retenidos else None,
+        })
+    resumen.sort(key=lambda r: (r['pico_max_bytes'] or 0, r['p95_s']), reverse=True)
+    return resumen
+
+
+def serie_latencias(registro=None, frecuencia='1min', percentil=95):
+    """DataFrame (instante, callback, segundos, invocaciones): percentil de latencia de cada callback por
+    intervalo de `frecuencia` (sin sondeos de callbacks en segundo plano)."""
+    registro = invocaciones() if registro is None else registro
+    filas = [i for i in registro if not i['sondeo']]
+    if not filas:
+        return pd.DataFrame(columns=['instante', 'callback', 'segundos', 'invocaciones'])
+    df = pd.DataFrame(filas, columns=['instante', 'callback', 'segundos'])
+    df['instante'] = pd.to_datetime(df['instante'].map(datetime.fromtimestamp)).dt.floor(frecuencia)  # Hora local
+    agrupado = df.groupby(['instante', 'callback'])['segundos']
+    serie = agrupado.quantile(percentil / 100).to_frame('segundos')
+    serie['invocaciones'] = agrupado.size()
+    return serie.reset_index()
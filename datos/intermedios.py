@@ -0,0 +1,44 @@
+# datos/intermedios.py
+# Resultados intermedios compartidos entre callbacks hermanos: un mismo cambio de slider, producto o planta
+# dispara varios callbacks de la página que filtran el dataset igual (p. ej. "producción válida del producto
+# en el rango" en Producción o "incidentes en el rango" en Incidentes). Cada filtro se calcula una sola vez
+# por (versión del dataset, argumentos) y se reusa durante unos segundos (TTL_S): alcanza para los callbacks
+# del mismo pedido sin acumular rangos viejos en memoria. Los resultados son posiciones de fila de solo
+# lectura sobre el dataset completo.
+# (Los callbacks en segundo plano corren en otro proceso y no ven este memo; comparten vía segundo_plano.)
+
+from datos.cache import CacheTTL
+from datos.filtros import filas_produccion, filas_mantenimiento, filas_incidentes
+
+# Vida de un resultado intermedio (segundos)
+TTL_S = 10
+
+_memo = CacheTTL(max_entradas=64, ttl_s=TTL_S)
+
+
+def intermedio(nombre, version_datos, argumentos, calcular):
+    """calcular() una sola vez por (nombre, versión del dataset, argumentos) mientras dure el TTL."""
+    return _memo.obtener_o_calcular((nombre, version_datos, argumentos), calcular)
+
+
+def _solo_lectura(filas):
+    filas.flags.writeable = False
+    return filas
+
+
+def produccion_valida(df, version_datos, producto=None, fecha_inicio=None, fecha_fin=None, planta=None):
+    """filas_produccion compartido entre callbacks (df: dataset completo de esa versión)."""
+    return intermedio('produccion_valida', version_datos, (producto, fecha_inicio, fecha_fin, planta),
+                      lambda: _solo_lectura(filas_produccion(df, producto, fecha_inicio, fecha_fin, planta)))
+
+
+def mantenimientos_realizados(df, version_datos, maquina=None, fecha_inicio=None, fecha_fin=None, planta=None):
+    """filas_mantenimiento compartido entre callbacks (df: dataset completo de esa versión)."""
+    return intermedio('mantenimientos_realizados', version_datos, (maquina, fecha_inicio, fecha_fin, planta),
+                      lambda: _solo_lectura(filas_mantenimiento(df, maquina, fecha_inicio, fecha_fin, planta)))
+
+
+def incidentes_en_rango(df, version_datos, maquina=None, fecha_inicio=None, fecha_fin=None, planta=None):
+    """filas_incidentes compartido entre callbacks (df: dataset completo de esa versión)."""
+    return intermedio('incidentes_en_rango', version_datos, (maquina, fecha_inicio, fecha_fin, planta),
+                      lambda: _solo_lectura(filas_incidentes(df, maquina, fecha_inicio, fecha_fin, planta)))
@@ -0,0 +1,31 @@
+# datos/intervalos.py
+# Intervalos (inicio, fin) de cada registro a partir de su fecha y de las horas en texto del formulario
+# ('07:15 a.m.'). Vectorizado sobre columnas completas: lo usan OEE, confiabilidad y tiempos perdidos.
+
+import pandas as pd
+
+FORMATO_HORA_AMPM = '%I:%M %p'
+FORMATO_HORA_24 = '%H:%M'
+
+
+def horas_del_dia(serie_horas):
+    """Hora del día como Timedelta desde medianoche ('07:15 a.m.' o '19:15'); NaT si no se puede leer."""
+    limpio = serie_horas.astype('string').str.replace('.', '', regex=False).str.strip()
+    horas = pd.to_datetime(limpio, format=FORMATO_HORA_AMPM, errors='coerce')
+    faltan = horas.isna() & limpio.notna()
+    if faltan.any():
+        horas[faltan] = pd.to_datetime(limpio[faltan], format=FORMATO_HORA_24, errors='coerce')
+    return horas - horas.dt.normalize()
+
+
+def intervalos(df, columna_fecha, columna_inicio, columna_fin):
+    """DataFrame con 'inicio', 'fin' (Timestamps) y 'horas' por fila de df. NaT/NaN si falta la fecha o
+    alguna hora. Si la hora de fin es menor a la de inicio, el registro terminó al día siguiente."""
+    if not {columna_fecha, columna_inicio, columna_fin} <= set(df.columns):
+        vacio = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+        return pd.DataFrame({'inicio': vacio, 'fin': vacio, 'horas': pd.Series(float('nan'), index=df.index)})
+    fecha = df[columna_fecha].dt.normalize()
+    inicio = fecha + horas_del_dia(df[columna_inicio])
+    fin = fecha + horas_del_dia(df[columna_fin])
+    fin = fin.mask(fin < inicio, fin + pd.Timedelta(days=1))
+    return pd.DataFrame({'inicio': inicio, 'fin': fin, 'horas': (fin - inicio).dt.total_seconds() / 3600.0}, index=df.index)
@@ -0,0 +1,302 @@
+# datos/kpis.py
+# Motor de agregación de KPIs: lo usan las páginas (Resumen, Producción) y la API JSON (api/kpis.py),
+# así los números que ve el tablero y los que consultan otros sistemas salen del mismo cálculo.
+
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from datos.cache import CacheLRU
+from datos.bitmap import obtener_indice_bitmap
+from datos.indice_fechas import obtener_indice_fechas
+from datos.filtros import VALORES_SIN_FILTRO, filas_produccion
+from datos.precalculo import leer_artefacto
+from datos.columnas import (
+    COLUMNA_EVENTO, COLUMNA_HUBO_PRODUCCION, COLUMNA_REALIZO_MANTENIMIENTO,
+    COLUMNA_MAQUINA_PROD, COLUMNA_MAQUINA_MANT, COLUMNA_MAQUINA_INCID,
+    COLUMNA_PRODUCTO, COLUMNA_UNIDAD, COLUMNA_CANTIDAD,
+    COLUMNA_FECHA_PROD, COLUMNA_FECHA_MANT, COLUMNA_FECHA_INCID,
+    COLUMNA_HORA_INI_PROD, COLUMNA_HORA_FIN_PROD, COLUMNA_PLANTA,
+    VALOR_PRODUCCION, VALOR_MANTENIMIENTO, VALOR_INCIDENTES, VALOR_OBSERVACIONES, VALOR_SI,
+)
+
+VALOR_TODAS = 'Todas'
+
+# Períodos de los KPIs comparativos (período actual vs. el inmediatamente anterior)
+PERIODOS_COMPARACION = {'Semana': timedelta(weeks=1), '2 Semanas': timedelta(weeks=2), 'Mes': timedelta(days=30), '3 Meses': timedelta(days=90)}
+
+
+# --- Funciones Auxiliares ---
+def calcular_variacion(actual, anterior):
+    if anterior is None or actual is None or pd.isna(anterior) or pd.isna(actual): return None
+    try: anterior = float(anterior); actual = float(actual)
+    except (ValueError, TypeError): return None
+    if anterior == 0: return 0.0 if actual == 0 else np.inf
+    if actual == 0 and anterior != 0: return -100.0
+    return ((actual - anterior) / anterior) * 100
+
+def calcular_duracion_horas(fecha_str, hora_ini_str, hora_fin_str):
+    try:
+        fecha_base = pd.to_datetime(fecha_str).date()
+        hora_ini_str_clean = hora_ini_str.replace('.', '')
+        hora_fin_str_clean = hora_fin_str.replace('.', '')
+        t_ini = pd.to_datetime(hora_ini_str_clean, format='%I:%M %p', errors='coerce').time()
+        t_fin = pd.to_datetime(hora_fin_str_clean, format='%I:%M %p', errors='coerce').time()
+
+        if pd.isna(t_ini) or pd.isna(t_fin): return None
+
+        dt_ini = pd.Timestamp.combine(fecha_base, t_ini)
+        dt_fin = pd.Timestamp.combine(fecha_base, t_fin)
+
+        if dt_fin < dt_ini: dt_fin += timedelta(days=1)
+
+        duracion = dt_fin - dt_ini
+        return duracion.total_seconds() / 3600.0
+
+    except Exception: return None
+
+def fecha_referencia_kpi(df):
+    """Última fecha de evento (producción, mantenimiento o incidente), normalizada al día."""
+    fechas = pd.concat([df.get(c, pd.Series(dtype='datetime64[ns]')) for c in [COLUMNA_FECHA_PROD, COLUMNA_FECHA_MANT, COLUMNA_FECHA_INCID]], ignore_index=True).dropna()
+    return fechas.max().normalize() if not fechas.empty else pd.Timestamp('now').normalize()
+
+
+# --- Filtro Fecha + Máquina del Resumen (sobre el índice de bitsets) ---
+def aplicar_filtro_maquina(indice, bits_fecha, maquina_seleccionada):
+    if maquina_seleccionada in (None, VALOR_TODAS):
+        return bits_fecha
+
+    # Una fila pasa si SU tipo de evento corresponde a la máquina seleccionada (máquina PRIMARIA del evento).
+    # Para el *conteo* de incidentes se usa la máquina asociada al incidente solo en filas de tipo Incidente;
+    # el modal de incidentes muestra además todos los asociados a esa máquina (ver mostrar_tabla_detalle).
+    bits_prod = indice.y(indice.valor(COLUMNA_EVENTO, VALOR_PRODUCCION), indice.valor(COLUMNA_MAQUINA_PROD, maquina_seleccionada))
+    bits_mant = indice.y(indice.valor(COLUMNA_EVENTO, VALOR_MANTENIMIENTO), indice.valor(COLUMNA_MAQUINA_MANT, maquina_seleccionada))
+    bits_incid = indice.y(indice.valor(COLUMNA_EVENTO, VALOR_INCIDENTES), indice.valor(COLUMNA_MAQUINA_INCID, maquina_seleccionada))
+
+    # Incluir observaciones si se seleccionó una máquina? Generalmente no.
+    # Si se quisiera, se añadiría: indice.valor(COLUMNA_EVENTO, VALOR_OBSERVACIONES)
+    return indice.y(bits_fecha, indice.o(bits_prod, bits_mant, bits_incid))
+
+def bits_planta(indice, planta):
+    """Filas de la planta (todas si no hay filtro de planta)."""
+    return indice.todos() if planta in VALORES_SIN_FILTRO else indice.valor(COLUMNA_PLANTA, planta)
+
+def filtrar_registros(indice, indice_fechas, fecha_inicio_dt, fecha_fin_dt, maquina_seleccionada, planta=None):
+    """Devuelve los bitsets de filas filtradas por fecha ('fecha') y por fecha + máquina ('final'), dentro de la planta."""
+    # 1. Fecha: unión de ids de fila cuya fecha de evento (producción, mantenimiento, incidente u
+    #    observación, según el tipo de registro) cae en el rango. Una fila que coincide dos veces
+    #    (p.ej. producción con incidente) queda una sola vez en el bitset.
+    bits_fecha = indice.desde_filas(indice_fechas.ids_en_rango(fecha_inicio_dt, fecha_fin_dt))
+    if planta not in VALORES_SIN_FILTRO:
+        bits_fecha = indice.y(bits_fecha, bits_planta(indice, planta))
+    # 2. Máquina
+    return {'fecha': bits_fecha, 'final': aplicar_filtro_maquina(indice, bits_fecha, maquina_seleccionada)}
+
+def fin_del_dia(fecha):
+    """Último instante del día de `fecha` (para rangos que incluyen el día final completo)."""
+    return pd.Timestamp(fecha).normalize() + pd.Timedelta(days=1) - pd.Timedelta(1, 'ns')
+
+# Clave: (versión del dataset, rango en ordinales, máquina, planta, día final completo). Valor: bitsets de filas (ver datos/bitmap.py).
+cache_filtros = CacheLRU(max_entradas=64)
+
+def obtener_filtro_registros(df, version_datos, rango_ordinales, maquina_seleccionada, planta=None, incluir_dia_final=False):
+    """Busca en caché los bitsets filtrados para este estado de filtros; si no están, los calcula y guarda.
+    Con incluir_dia_final el rango llega hasta el final del último día (eventos con hora, como el Timestamp
+    de las observaciones); si no, hasta su medianoche, como el slider de las páginas."""
+    clave = (version_datos, int(rango_ordinales[0]), int(rango_ordinales[1]), maquina_seleccionada, planta, incluir_dia_final)
+    filtro_ids = cache_filtros.obtener(clave)
+    if filtro_ids is None:
+        fecha_inicio_dt = pd.Timestamp.fromordinal(int(rango_ordinales[0])); fecha_fin_dt = pd.Timestamp.fromordinal(int(rango_ordinales[1]))
+        if incluir_dia_final:
+            fecha_fin_dt = fin_del_dia(fecha_fin_dt)
+        indice = obtener_indice_bitmap(df, version_datos); indice_fechas = obtener_indice_fechas(df, version_datos)
+        filtro_ids = cache_filtros.guardar(clave, filtrar_registros(indice, indice_fechas, fecha_inicio_dt, fecha_fin_dt, maquina_seleccionada, planta))
+    return filtro_ids
+
+
+# --- Motor declarativo de KPIs ---
+class DefinicionKPI:
+    """KPI declarado como (filtro, medida, apertura): `filtro(indice)` da el bitset de filas que cuenta,
+    `medida` es la columna que se suma (None = cantidad de filas) y `agrupar_por` abre el valor por los
+    valores de una columna. Con `titulo` es una tarjeta del Resumen ('{}' = valor de la apertura);
+    `valores_fijos` son aperturas que se muestran siempre (en 0 si no hay filas)."""
+    __slots__ = ('nombre', 'filtro', 'medida', 'agrupar_por', 'titulo', 'valores_fijos')
+
+    def __init__(self, nombre, filtro, medida=None, agrupar_por=None, titulo=None, valores_fijos=()):
+        self.nombre = nombre
+        self.filtro = filtro
+        self.medida = medida
+        self.agrupar_por = agrupar_por
+        self.titulo = titulo
+        self.valores_fijos = tuple(valores_fijos)
+
+
+def _bits_en_filas(bitset, filas):
+    """Bit de cada fila de `filas` en un bitset empaquetado: O(len(filas)), sin desempaquetar el bitset entero."""
+    return (bitset[filas >> 3] >> (7 - (filas & 7))) & 1
+
+
+def evaluar_kpis(df, indice, bits_filtrados, definiciones):
+    """Todas las definiciones en una sola agregación agrupada sobre las filas filtradas: cada fila lleva un
+    código con un bit por KPI al que pertenece y se agrupa una vez por (código, aperturas) sumando las medidas.
+    Devuelve {nombre: valor} ({nombre: {apertura: valor}} si tiene agrupar_por), con todas las aperturas presentes."""
+    filas = indice.a_filas(bits_filtrados).astype(np.int64)
+    codigo = np.zeros(len(filas), dtype=np.int64)
+    for k, definicion in enumerate(definiciones):
+        codigo |= _bits_en_filas(definicion.filtro(indice), filas).astype(np.int64) << k
+
+    aperturas = list(dict.fromkeys(d.agrupar_por for d in definiciones if d.agrupar_por))
+    medidas = list(dict.fromkeys(d.medida for d in definiciones if d.medida))
+    datos = {'codigo': codigo}
+    for columna in aperturas:  # Mismos valores (sin espacios extremos) que el índice de bitsets
+        serie = df[columna].iloc[filas] if columna in df.columns else pd.Series(np.nan, index=range(len(filas)))
+        datos[columna] = serie.astype(str).str.strip().where(serie.notna()).to_numpy()
+    for columna in medidas:
+        datos[columna] = df[columna].to_numpy(dtype=float, na_value=np.nan)[filas] if columna in df.columns else np.zeros(len(filas))
+    grupos = pd.DataFrame(datos).groupby(['codigo'] + aperturas, dropna=False, sort=False).agg(
+        filas=('codigo', 'size'), **{columna: (columna, 'sum') for columna in medidas}).reset_index()
+
+    codigos = grupos['codigo'].to_numpy()
+    resultados = {}
+    for k, definicion in enumerate(definiciones):
+        propios = grupos[((codigos >> k) & 1).astype(bool)]
+        medida = definicion.medida or 'filas'
+        convertir = float if definicion.medida else int
+        if definicion.agrupar_por:
+            por_apertura = propios[propios[definicion.agrupar_por].notna()].groupby(definicion.agrupar_por, sort=True)[medida].sum()
+            resultados[definicion.nombre] = {apertura: convertir(valor) for apertura, valor in por_apertura.items()}
+        else:
+            resultados[definicion.nombre] = convertir(propios[medida].sum())
+    return resultados
+
+
+def tarjetas_kpi(resultados, definiciones):
+    """[(título, valor)] de las definiciones con título, en orden de declaración; las aperturas fijas primero."""
+    tarjetas = []
+    for definicion in definiciones:
+        if definicion.titulo is None:
+            continue
+        valor = resultados[definicion.nombre]
+        if not definicion.agrupar_por:
+            tarjetas.append((definicion.titulo, valor))
+            continue
+        cero = 0.0 if definicion.medida else 0
+        aperturas = list(definicion.valores_fijos) + [a for a in valor if a not in definicion.valores_fijos]
+        tarjetas.extend((definicion.titulo.format(apertura), valor.get(apertura, cero)) for apertura in aperturas)
+    return tarjetas
+
+
+# Unidades que el Resumen muestra aunque no haya producción en el filtro
+UNIDADES_PRINCIPALES = ('Comprimidos', 'Blisters', 'Litros')
+
+# KPIs del Resumen: las tarjetas (con título) y los conteos del gráfico por tipo de evento
+KPIS_RESUMEN = [
+    DefinicionKPI('produccion_por_unidad', lambda i: i.y(i.valor(COLUMNA_EVENTO, VALOR_PRODUCCION), i.valor(COLUMNA_HUBO_PRODUCCION, VALOR_SI), i.no_nulo(COLUMNA_CANTIDAD), i.no_nulo(COLUMNA_UNIDAD)),
+                  medida=COLUMNA_CANTIDAD, agrupar_por=COLUMNA_UNIDAD, titulo='Prod. {}', valores_fijos=UNIDADES_PRINCIPALES),
+    DefinicionKPI('mantenimientos_realizados', lambda i: i.y(i.valor(COLUMNA_EVENTO, VALOR_MANTENIMIENTO), i.valor(COLUMNA_REALIZO_MANTENIMIENTO, VALOR_SI)),
+                  titulo='Mantenimiento efectivo'),
+    # Incidentes CON FECHA en el conjunto ya filtrado por fecha y máquina (cualquier tipo de evento)
+    DefinicionKPI('incidentes', lambda i: i.no_nulo(COLUMNA_FECHA_INCID), titulo='Incidentes/Paradas Reg.'),
+    DefinicionKPI('registros_produccion', lambda i: i.valor(COLUMNA_EVENTO, VALOR_PRODUCCION)),
+    DefinicionKPI('registros_observaciones', lambda i: i.valor(COLUMNA_EVENTO, VALOR_OBSERVACIONES)),
+]
+
+
+# --- KPIs del Resumen ---
+def kpis_resumen(df, version_datos, rango_ordinales, maquina_seleccionada, planta=None, definiciones=KPIS_RESUMEN, incluir_dia_final=False):
+    """Conteos y producción por unidad de los registros filtrados por fecha, máquina y planta (una sola pasada)."""
+    indice = obtener_indice_bitmap(df, version_datos)
+    bits_final = obtener_filtro_registros(df, version_datos, rango_ordinales, maquina_seleccionada, planta, incluir_dia_final)['final']
+    resultados = evaluar_kpis(df, indice, bits_final, definiciones)
+
+    return {
+        'registros': indice.contar(bits_final),
+        'produccion_por_unidad': resultados['produccion_por_unidad'],
+        'mantenimientos_realizados': resultados['mantenimientos_realizados'],
+        'incidentes': resultados['incidentes'],
+        # Conteos por tipo para el gráfico (Mantenimiento solo si se realizó; Incidentes = filas con fecha de incidente)
+        'conteos_por_evento': {
+            VALOR_PRODUCCION: resultados['registros_produccion'],
+            VALOR_MANTENIMIENTO: resultados['mantenimientos_realizados'],
+            VALOR_INCIDENTES: resultados['incidentes'],
+            VALOR_OBSERVACIONES: resultados['registros_observaciones'],
+        },
+        'tarjetas': [{'titulo': titulo, 'valor': valor} for titulo, valor in tarjetas_kpi(resultados, definiciones)],
+    }
+
+
+def _comparar_periodos(fechas_ref, valores, fecha_referencia, periodos):
+    resultado = []
+    for nombre_periodo, delta in periodos.items():
+        fin_actual = fecha_referencia; inicio_actual = fin_actual - delta + timedelta(days=1)
+        fin_anterior = inicio_actual - timedelta(days=1); inicio_anterior = fin_anterior - delta + timedelta(days=1)
+        actual_val = valores[(fechas_ref >= inicio_actual) & (fechas_ref <= fin_actual)].sum()
+        anterior_val = valores[(fechas_ref >= inicio_anterior) & (fechas_ref <= fin_anterior)].sum()
+        resultado.append({'periodo': nombre_periodo, 'actual': actual_val, 'anterior': anterior_val, 'variacion': calcular_variacion(actual_val, anterior_val)})
+    return resultado
+
+def kpis_comparativos(df, version_datos, producto=None, fecha_referencia=None, periodos=PERIODOS_COMPARACION, planta=None):
+    """Variación de producción (del producto) e incidentes: período actual vs. anterior hasta la fecha de referencia.
+    'produccion' / 'incidentes' son None si no hay registros para comparar."""
+    if fecha_referencia is None and periodos is PERIODOS_COMPARACION:
+        tabla = leer_artefacto('kpis_comparativos', version_datos)
+        clave = (producto, None if planta in VALORES_SIN_FILTRO else planta)
+        if tabla is not None and clave in tabla:
+            return tabla[clave]
+    indice = obtener_indice_bitmap(df, version_datos)
+    if fecha_referencia is None:
+        fecha_referencia = fecha_referencia_kpi(df)
+
+    resultado = {'fecha_referencia': fecha_referencia, 'producto': producto, 'unidad_produccion': None, 'produccion': None, 'incidentes': None}
+    if producto is not None:
+        filas_prod = indice.a_filas(indice.y(indice.produccion_valida(producto=producto), indice.no_nulo(COLUMNA_MAQUINA_PROD), indice.no_nulo(COLUMNA_UNIDAD), bits_planta(indice, planta)))
+        if len(filas_prod):
+            resultado['unidad_produccion'] = df[COLUMNA_UNIDAD].iloc[filas_prod[0]]
+            fechas_ref = df[COLUMNA_FECHA_PROD].iloc[filas_prod].dt.normalize().to_numpy()
+            resultado['produccion'] = _comparar_periodos(fechas_ref, df[COLUMNA_CANTIDAD].iloc[filas_prod].to_numpy(), fecha_referencia, periodos)
+
+    filas_incid = indice.a_filas(indice.y(indice.no_nulo(COLUMNA_FECHA_INCID), bits_planta(indice, planta)))
+    if len(filas_incid):
+        fechas_ref = df[COLUMNA_FECHA_INCID].iloc[filas_incid].dt.normalize().to_numpy()
+        resultado['incidentes'] = _comparar_periodos(fechas_ref, np.ones(len(filas_incid), dtype=np.int64), fecha_referencia, periodos)
+    return resultado
+
+
+def construir_tabla_comparativos(df, version_datos):
+    """kpis_comparativos de cada (producto, planta) del dataset, más sin producto y sin planta: lo que piden
+    la página Resumen y la API con los períodos por defecto."""
+    productos = [None] + sorted(df[COLUMNA_PRODUCTO].iloc[filas_produccion(df)].dropna().unique().tolist())
+    plantas = [None] + (sorted(df[COLUMNA_PLANTA].dropna().unique().tolist()) if COLUMNA_PLANTA in df.columns else [])
+    return {(producto, planta): kpis_comparativos(df, version_datos, producto=producto, planta=planta)
+            for producto in productos for planta in plantas}
+
+
+# --- Agregados de Producción ---
+def agregar_produccion_por_maquina(df_filtrado):
+    """Cantidad total, horas y eficiencia (cantidad/hora) por máquina y unidad. Solo filas con duración > 0."""
+    columnas = [COLUMNA_MAQUINA_PROD, COLUMNA_UNIDAD, 'cantidad_total', 'duracion_total_horas', 'eficiencia_prom_hora']
+    if df_filtrado.empty:
+        return pd.DataFrame(columns=columnas)
+    duracion = df_filtrado.apply(
+        lambda row: calcular_duracion_horas(row[COLUMNA_FECHA_PROD], row[COLUMNA_HORA_INI_PROD], row[COLUMNA_HORA_FIN_PROD]),
+        axis=1
+    )
+    df_calculos = df_filtrado.assign(duracion_horas=duracion).dropna(subset=['duracion_horas'])
+    df_calculos = df_calculos[df_calculos['duracion_horas'] > 0]
+    if df_calculos.empty:
+        return pd.DataFrame(columns=columnas)
+    produccion_agregada = df_calculos.groupby([COLUMNA_MAQUINA_PROD, COLUMNA_UNIDAD]).agg(
+        cantidad_total=(COLUMNA_CANTIDAD, 'sum'),
+        duracion_total_horas=('duracion_horas', 'sum')
+    ).reset_index()
+    produccion_agregada['eficiencia_prom_hora'] = (produccion_agregada['cantidad_total'] / produccion_agregada['duracion_total_horas']).fillna(0)
+    return produccion_agregada
+
+def produccion_diaria_por_maquina(df_filtrado):
+    """Cantidad producida por máquina y día ('Fecha'), ordenada por máquina y fecha."""
+    if df_filtrado.empty:
+        return pd.DataFrame(columns=[COLUMNA_MAQUINA_PROD, 'Fecha', COLUMNA_CANTIDAD])
+    produccion_diaria = df_filtrado.groupby([df_filtrado[COLUMNA_MAQUINA_PROD], df_filtrado[COLUMNA_FECHA_PROD].dt.date])[COLUMNA_CANTIDAD].sum().reset_index()
+    produccion_diaria.rename(columns={COLUMNA_FECHA_PROD: 'Fecha'}, inplace=True)
+    return produccion_diaria.sort_values([COLUMNA_MAQUINA_PROD, 'Fecha'])
@@ -0,0 +1,98 @@
+# datos/maquinas.py
+# Tabla de etiquetas de máquina por versión del dataset. Para cada máquina (nombre completo del formulario,
+# p. ej. 'Compresor a Tornillo – COD EQ-401') guarda su nombre corto (sin el código y con las abreviaturas
+# de MAPEO_ABREVIATURAS), la etiqueta de eje partida en líneas (<br>) y el código. Se arma una sola vez por
+# versión con las máquinas de las tres columnas de máquina; las páginas traducen una columna entera por
+# posición en la tabla (get_indexer + take) en lugar de aplicar regex y textwrap fila a fila.
+
+import re
+import textwrap
+import numpy as np
+import pandas as pd
+
+from datos.cache import CacheLRU, LockProceso
+from datos.columnas import COLUMNAS_MAQUINA
+
+# Abreviaturas específicas. Clave: nombre sin el código. Valor: abreviatura deseada.
+MAPEO_ABREVIATURAS = {
+    "Equipo de Ósmosis Inversa de Doble Paso": "EQ. OSM. INV.",
+    "Equipo Auxiliar de Refrigeración de la Emblistadora": "EQ. AUX. REFRIG.",
+    "Comprimidora / Tableteadora (Nueva)": "COMP./TAB. (Nueva)",
+    "Comprimidora / Tableteadora (Anterior)": "COMP./TAB. (Ant.)",
+    "Mezcladora en “V”": "MEZCLADORA (V)",
+}
+# Separador entre nombre y código en las opciones del formulario ('– COD' o '- COD')
+PATRON_CODIGO = re.compile(r'\s*[–-]\s*COD\s*')
+# Caracteres por línea de las etiquetas de eje
+ANCHO_EJE = 25
+
+_cache_tablas = CacheLRU(max_entradas=2)
+_lock_tablas = LockProceso()
+
+
+def separar_codigo(nombre):
+    """(nombre sin código, código o '') de una opción de máquina del formulario."""
+    partes = PATRON_CODIGO.split(str(nombre).strip(), maxsplit=1)
+    return partes[0].strip(), (partes[1].strip() if len(partes) > 1 else '')
+
+
+def envolver_etiqueta(texto, ancho=ANCHO_EJE):
+    return '<br>'.join(textwrap.wrap(str(texto), width=ancho, break_long_words=True))
+
+
+class TablaMaquinas:
+    """Etiquetas por máquina: nombre corto, etiqueta de eje y código, en arreglos alineados con `nombres`."""
+
+    def __init__(self, maquinas):
+        self.nombres = pd.Index(sorted({str(m).strip() for m in maquinas if pd.notna(m) and str(m).strip()}))
+        separados = [separar_codigo(m) for m in self.nombres]
+        cortas = [MAPEO_ABREVIATURAS.get(sin_codigo, sin_codigo) for sin_codigo, _ in separados]
+        # Dos máquinas distintas con el mismo nombre corto se distinguen por su código
+        repetidas = pd.Series(cortas).duplicated(keep=False).to_numpy()
+        cortas = [f"{corta} ({codigo})" if repetida and codigo else corta
+                  for corta, (_, codigo), repetida in zip(cortas, separados, repetidas)]
+        self._campos = {
+            'corta': np.array(cortas + [None], dtype=object),
+            'eje': np.array([envolver_etiqueta(c) for c in cortas] + [None], dtype=object),
+            'codigo': np.array([codigo for _, codigo in separados] + [None], dtype=object),
+        }  # El último elemento (posición -1) es el de los valores que no son máquinas conocidas
+
+    @classmethod
+    def desde_dataset(cls, df, columnas=COLUMNAS_MAQUINA):
+        series = [df[col].dropna() for col in columnas if col in df.columns]
+        return cls(pd.concat(series, ignore_index=True).unique() if series else [])
+
+    def posiciones(self, valores):
+        """Posición de cada valor en la tabla (-1 si no es una máquina conocida)."""
+        return self.nombres.get_indexer(pd.Index(valores, dtype=object))
+
+    def etiquetas(self, valores, campo='corta'):
+        """Etiqueta `campo` de cada valor (Series con el mismo índice si `valores` es Series). Los valores que
+        no son máquinas conocidas (nulos, vacíos) se devuelven tal cual."""
+        posiciones = self.posiciones(valores)
+        resultado = self._campos[campo].take(posiciones)
+        desconocidos = posiciones < 0
+        if desconocidos.any():
+            resultado[desconocidos] = np.asarray(valores, dtype=object)[desconocidos]
+        if isinstance(valores, pd.Series):
+            return pd.Series(resultado, index=valores.index, name=valores.name)
+        return resultado
+
+    def etiqueta(self, maquina, campo='corta'):
+        return self.etiquetas([maquina], campo)[0]
+
+    def opciones(self, maquinas=None):
+        """Opciones de Dropdown (etiqueta corta, valor = nombre completo), ordenadas por nombre completo."""
+        maquinas = self.nombres if maquinas is None else maquinas
+        return [{'label': etiqueta, 'value': maquina} for maquina, etiqueta in zip(maquinas, self.etiquetas(maquinas))]
+
+
+def obtener_tabla_maquinas(df, version_datos):
+    """Devuelve la tabla de etiquetas de máquina para esta versión del dataset (se construye una sola vez)."""
+    tabla = _cache_tablas.obtener(version_datos)
+    if tabla is None:
+        with _lock_tablas:
+            tabla = _cache_tablas.obtener(version_datos)
+            if tabla is None:
+                tabla = _cache_tablas.guardar(version_datos, TablaMaquinas.desde_dataset(df))
+    return tabla
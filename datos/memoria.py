@@ -0,0 +1,136 @@
+# datos/memoria.py
+# Huella en memoria de las estructuras que viven en el proceso, por componente: DataFrame principal (con el
+# detalle de las columnas más pesadas), textos libres, índice de búsqueda, particiones por archivo, cada
+# caché de módulo (CacheLRU/CacheTTL) de datos/, api/ y pages/, artefactos del precálculo y modelos en
+# memoria. Cada objeto se cuenta una sola vez (en el primer componente que lo alcanza), así que un
+# resultado compartido entre un caché y el dataset no se suma dos veces. Los tamaños son aproximados:
+# pandas/numpy se miden por sus buffers (memory_usage profundo / nbytes) y el resto con sys.getsizeof.
+
+import sys
+import types
+import numpy as np
+import pandas as pd
+
+from datos import carga, precalculo
+from datos.cache import CacheLRU
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Módulos cuyos cachés de nivel de módulo se reportan
+PREFIJOS_MODULOS = ('datos.', 'api.', 'pages.')
+# Columnas del DataFrame principal que se detallan (las más pesadas)
+COLUMNAS_DETALLE = 10
+
+_NO_DATOS = (type, types.FunctionType, types.BuiltinFunctionType, types.MethodType, types.ModuleType)
+
+
+def tamano_bytes(obj, vistos=None):
+    """Bytes aproximados de obj y todo lo que alcanza (sin contar dos veces los ids de 'vistos')."""
+    vistos = set() if vistos is None else vistos
+    total = 0
+    pendientes = [obj]
+    while pendientes:
+        actual = pendientes.pop()
+        if actual is None or id(actual) in vistos:
+            continue
+        vistos.add(id(actual))
+        if isinstance(actual, pd.DataFrame):
+            total += int(actual.memory_usage(index=True, deep=True).sum())
+        elif isinstance(actual, (pd.Series, pd.Index)):
+            total += int(actual.memory_usage(deep=True))
+        elif isinstance(actual, np.ndarray):
+            if actual.base is None:
+                total += actual.nbytes if actual.dtype != object else sys.getsizeof(actual)
+                if actual.dtype == object:
+                    pendientes.extend(actual.ravel().tolist())
+            else:  # Vista: se cuenta el buffer base una sola vez
+                total += sys.getsizeof(actual)
+                pendientes.append(actual.base)
+        elif isinstance(actual, CacheLRU):
+            total += sys.getsizeof(actual)
+            pendientes.append(actual._datos)
+        elif isinstance(actual, dict):
+            total += sys.getsizeof(actual)
+            pendientes.extend(actual.keys())
+            pendientes.extend(actual.values())
+        elif isinstance(actual, (list, tuple, set, frozenset)):
+            total += sys.getsizeof(actual)
+            pendientes.extend(actual)
+        elif isinstance(actual, (str, bytes, bytearray, int, float, bool, memoryview)):
+            total += sys.getsizeof(actual)
+        elif isinstance(actual, _NO_DATOS):
+            continue  # Clases, funciones y módulos no son datos del proceso
+        else:
+            total += sys.getsizeof(actual)
+            if hasattr(actual, '__dict__'):
+                pendientes.append(actual.__dict__)
+            for slot in getattr(type(actual), '__slots__', ()):
+                pendientes.append(getattr(actual, slot, None))
+    return total
+
+
+def caches_de_modulos():
+    """(nombre 'módulo.atributo', caché) de los CacheLRU/CacheTTL de nivel de módulo ya importados."""
+    caches = []
+    for nombre_modulo, modulo in sorted(sys.modules.items()):
+        if modulo is None or not nombre_modulo.startswith(PREFIJOS_MODULOS):
+            continue
+        for atributo, valor in sorted(vars(modulo).items()):
+            if isinstance(valor, CacheLRU):
+                caches.append((f"{nombre_modulo}.{atributo}", valor))
+    return caches
+
+
+def estadisticas_caches():
+    """Por caché de módulo: nombre, entradas, aciertos, fallos y tasa de aciertos en este proceso."""
+    return [{'cache': nombre, **cache.estadisticas()} for nombre, cache in caches_de_modulos()]
+
+
+def memoria_proceso():
+    """RSS del proceso en bytes (None sin psutil)."""
+    if psutil is None:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+def huella_memoria():
+    """Lista de componentes {'componente', 'tipo', 'bytes', 'detalle'} ordenada de mayor a menor."""
+    vistos = set()
+    componentes = []
+
+    def agregar(nombre, tipo, obj, detalle=None):
+        componentes.append({'componente': nombre, 'tipo': tipo, 'bytes': tamano_bytes(obj, vistos), 'detalle': detalle})
+
+    dataset = carga._dataset_actual
+    if dataset is not None:
+        version, df, textos, indice = dataset
+        por_columna = df.memory_usage(index=False, deep=True).sort_values(ascending=False)
+        agregar('dataset.df', 'dataframe', df, {
+            'version': version, 'filas': len(df), 'columnas': len(df.columns),
+            'columnas_mas_pesadas': {str(col): int(b) for col, b in por_columna.head(COLUMNAS_DETALLE).items()},
+        })
+        agregar('dataset.textos', 'textos', textos)
+        agregar('dataset.indice_busqueda', 'indice', indice)
+
+    particiones = dict(carga._archivos_cargados)
+    if particiones:
+        agregar('dataset.particiones', 'particion', particiones,
+                {'archivos': len(particiones), 'filas': sum(len(p[1]) for p in particiones.values())})
+
+    for nombre, cache in caches_de_modulos():
+        agregar(nombre, 'cache', cache, {'entradas': len(cache), 'max_entradas': cache.max_entradas})
+
+    artefactos = dict(precalculo._completados)
+    if artefactos:
+        agregar('precalculo.artefactos', 'artefacto', artefactos, {'artefactos': sorted(artefactos)})
+
+    for nombre_modulo, atributo in (('datos.anomalias', '_detector'), ('datos.confiabilidad', '_motor'), ('datos.corpus', '_corpus')):
+        modelo = getattr(sys.modules.get(nombre_modulo), atributo, None)
+        if modelo is not None:
+            agregar(f"{nombre_modulo}.{atributo}", 'modelo', modelo)
+
+    componentes.sort(key=lambda c: c['bytes'], reverse=True)
+    return componentes
@@ -0,0 +1,181 @@
+# datos/oee.py
+# OEE (Eficiencia General de los Equipos) por máquina y día.
+#   Disponibilidad = (horas de producción - horas de parada por incidentes) / horas de producción
+#   Rendimiento    = horas ideales (cantidad / tasa nominal) / horas de operación
+#   Calidad        = 1 (el formulario no registra unidades rechazadas)
+# Se arma un cubo diario (planta, máquina, fecha) con sumas de horas, cacheado por versión del dataset;
+# cualquier rango o agrupación se resuelve sumando filas del cubo y recalculando los cocientes.
+
+import os
+import numpy as np
+import pandas as pd
+
+from datos.cache import CacheLRU, LockProceso
+from datos.carga import version_archivo
+from datos.columnas import (
+    COLUMNA_PLANTA, COLUMNA_MAQUINA_PROD, COLUMNA_PRODUCTO, COLUMNA_CANTIDAD, COLUMNA_FECHA_PROD,
+    COLUMNA_HORA_INI_PROD, COLUMNA_HORA_FIN_PROD,
+    COLUMNA_MAQUINA_INCID, COLUMNA_FECHA_INCID, COLUMNA_HORA_INI_INCID, COLUMNA_HORA_FIN_INCID,
+)
+from datos.filtros import VALORES_SIN_FILTRO, filas_produccion
+from datos.intervalos import intervalos
+from datos.precalculo import leer_artefacto
+
+# Tasas nominales (unidades por hora) por máquina y producto: CSV con columnas MAQUINA, PRODUCTO, TASA_HORA.
+# PRODUCTO vacío = tasa de la máquina para cualquier producto. Sin tasa configurada se usa la mejor tasa
+# demostrada en el dataset para esa máquina y producto.
+VARIABLE_TASAS = 'SIPROSA_TASAS_NOMINALES'
+ARCHIVO_TASAS = 'tasas_nominales.csv'
+CALIDAD_POR_DEFECTO = 1.0
+
+# Frecuencias de agrupación de la página OEE
+FRECUENCIAS_OEE = {'Día': 'D', 'Semana': 'W-MON', 'Mes': 'MS'}
+
+COLUMNAS_CUBO = [COLUMNA_PLANTA, 'maquina', 'fecha', 'horas_produccion', 'horas_parada', 'horas_ideales', 'registros']
+COLUMNAS_SUMABLES = ['horas_produccion', 'horas_parada', 'horas_ideales', 'registros']
+
+_cache_cubos = CacheLRU(max_entradas=2)
+_lock_cubos = LockProceso()
+
+
+# --- Tasas nominales ---
+def ruta_tasas():
+    return os.environ.get(VARIABLE_TASAS, ARCHIVO_TASAS)
+
+
+def cargar_tasas_nominales(ruta=None):
+    """DataFrame (maquina, producto, tasa_hora); vacío si no hay archivo de tasas."""
+    ruta = ruta or ruta_tasas()
+    if not os.path.exists(ruta):
+        return pd.DataFrame(columns=['maquina', 'producto', 'tasa_hora'])
+    tasas = pd.read_csv(ruta, dtype={'MAQUINA': str, 'PRODUCTO': str})
+    tasas = pd.DataFrame({
+        'maquina': tasas['MAQUINA'].str.strip(),
+        'producto': tasas['PRODUCTO'].fillna('').str.strip(),
+        'tasa_hora': pd.to_numeric(tasas['TASA_HORA'], errors='coerce'),
+    })
+    return tasas[tasas['tasa_hora'] > 0]
+
+
+def _tasa_por_registro(prod, tasas):
+    """Tasa nominal de cada registro: máquina+producto, si no máquina sola, si no la mejor demostrada."""
+    tasa = pd.Series(np.nan, index=prod.index)
+    if not tasas.empty:
+        por_producto = tasas[tasas['producto'] != ''].set_index(['maquina', 'producto'])['tasa_hora']
+        por_maquina = tasas[tasas['producto'] == ''].set_index('maquina')['tasa_hora']
+        claves = pd.MultiIndex.from_arrays([prod['maquina'], prod['producto']])
+        tasa = pd.Series(por_producto.reindex(claves).to_numpy(), index=prod.index)
+        tasa = tasa.fillna(prod['maquina'].map(por_maquina))
+    mejor_demostrada = (prod['cantidad'] / prod['horas']).groupby([prod['maquina'], prod['producto']]).transform('max')
+    return tasa.fillna(mejor_demostrada)
+
+
+# --- Cubo diario ---
+def construir_cubo_oee(df, tasas=None):
+    """Sumas diarias por (planta, máquina, fecha): horas de producción, de parada, ideales y registros.
+    Solo días con producción (sin tiempo planificado no hay OEE); la parada se acota a la producción del día."""
+    tasas = cargar_tasas_nominales() if tasas is None else tasas
+    planta = df[COLUMNA_PLANTA] if COLUMNA_PLANTA in df.columns else pd.Series('', index=df.index)
+
+    filas = filas_produccion(df)
+    df_prod = df.iloc[filas]
+    prod = pd.DataFrame({
+        COLUMNA_PLANTA: planta.iloc[filas],
+        'maquina': df_prod[COLUMNA_MAQUINA_PROD],
+        'producto': df_prod[COLUMNA_PRODUCTO],
+        'cantidad': df_prod[COLUMNA_CANTIDAD],
+        'fecha': df_prod[COLUMNA_FECHA_PROD].dt.normalize(),
+        'horas': intervalos(df_prod, COLUMNA_FECHA_PROD, COLUMNA_HORA_INI_PROD, COLUMNA_HORA_FIN_PROD)['horas'],
+    })
+    prod = prod[prod['horas'] > 0]
+    if prod.empty:
+        return _con_tasas(pd.DataFrame(columns=COLUMNAS_CUBO), tasas)
+    prod['horas_ideales'] = prod['cantidad'] / _tasa_por_registro(prod, tasas)
+    claves = [COLUMNA_PLANTA, 'maquina', 'fecha']
+    cubo = prod.groupby(claves).agg(
+        horas_produccion=('horas', 'sum'), horas_ideales=('horas_ideales', 'sum'), registros=('horas', 'size'),
+    )
+
+    if {COLUMNA_MAQUINA_INCID, COLUMNA_FECHA_INCID} <= set(df.columns):
+        df_incid = df[df[COLUMNA_FECHA_INCID].notna() & df[COLUMNA_MAQUINA_INCID].notna()]
+        incid = pd.DataFrame({
+            COLUMNA_PLANTA: planta.loc[df_incid.index],
+            'maquina': df_incid[COLUMNA_MAQUINA_INCID],
+            'fecha': df_incid[COLUMNA_FECHA_INCID].dt.normalize(),
+            'horas': intervalos(df_incid, COLUMNA_FECHA_INCID, COLUMNA_HORA_INI_INCID, COLUMNA_HORA_FIN_INCID)['horas'],
+        })
+        parada = incid[incid['horas'] > 0].groupby(claves)['horas'].sum()
+        cubo['horas_parada'] = parada.reindex(cubo.index).fillna(0.0)
+    else:
+        cubo['horas_parada'] = 0.0
+    cubo['horas_parada'] = np.minimum(cubo['horas_parada'], cubo['horas_produccion'])
+    return _con_tasas(cubo.reset_index()[COLUMNAS_CUBO].sort_values(['fecha', 'maquina'], ignore_index=True), tasas)
+
+
+def _con_tasas(cubo, tasas):
+    """Anota en el cubo si se armó con tasas nominales configuradas (viaja con él al caché y al precálculo)."""
+    cubo.attrs['tasas_nominales'] = not tasas.empty
+    return cubo
+
+
+def usa_tasas_nominales(cubo):
+    """True si el cubo (sin filtrar) se armó con tasas nominales configuradas; sin releer el archivo de tasas."""
+    return bool(cubo.attrs.get('tasas_nominales', False))
+
+
+def clave_cubo_oee(version_datos):
+    """El cubo depende del dataset y del archivo de tasas nominales."""
+    ruta = ruta_tasas()
+    return (version_datos, version_archivo(ruta) if os.path.exists(ruta) else None)
+
+
+def obtener_cubo_oee(df, version_datos):
+    """Cubo diario de OEE para esta versión del dataset (y del archivo de tasas): precalculado o construido una sola vez."""
+    clave = clave_cubo_oee(version_datos)
+    cubo = _cache_cubos.obtener(clave)
+    if cubo is None:
+        with _lock_cubos:
+            cubo = _cache_cubos.obtener(clave)
+            if cubo is None:
+                cubo = leer_artefacto('cubo_oee', clave)
+                cubo = _cache_cubos.guardar(clave, construir_cubo_oee(df) if cubo is None else cubo)
+    return cubo
+
+
+# --- Consultas sobre el cubo ---
+def calcular_ratios(sumas):
+    """Agrega disponibilidad, rendimiento, calidad y oee (0-1) a un DataFrame con las columnas sumables."""
+    operacion = sumas['horas_produccion'] - sumas['horas_parada']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        disponibilidad = np.where(sumas['horas_produccion'] > 0, operacion / sumas['horas_produccion'], np.nan)
+        rendimiento = np.where(operacion > 0, np.minimum(sumas['horas_ideales'] / operacion, 1.0), np.nan)
+    return sumas.assign(
+        horas_operacion=operacion, disponibilidad=disponibilidad, rendimiento=rendimiento,
+        calidad=CALIDAD_POR_DEFECTO, oee=disponibilidad * rendimiento * CALIDAD_POR_DEFECTO,
+    )
+
+
+def filtrar_cubo(cubo, fecha_inicio=None, fecha_fin=None, maquinas=None, planta=None):
+    mascara = np.ones(len(cubo), dtype=bool)
+    if fecha_inicio is not None: mascara &= (cubo['fecha'] >= fecha_inicio).to_numpy()
+    if fecha_fin is not None: mascara &= (cubo['fecha'] <= fecha_fin).to_numpy()
+    if maquinas: mascara &= cubo['maquina'].isin(maquinas).to_numpy()
+    if planta not in VALORES_SIN_FILTRO: mascara &= (cubo[COLUMNA_PLANTA] == planta).to_numpy()
+    return cubo[mascara]
+
+
+def oee_por_maquina(cubo):
+    """OEE del período por máquina (cocientes de sumas, no promedio de cocientes)."""
+    return calcular_ratios(cubo.groupby('maquina')[COLUMNAS_SUMABLES].sum()).reset_index()
+
+
+def oee_serie(cubo, frecuencia='D'):
+    """Serie de OEE por máquina y período ('D', 'W-MON', 'MS')."""
+    periodo = pd.Grouper(key='fecha', freq=frecuencia, closed='left', label='left')  # Semanas desde el lunes
+    sumas = cubo.groupby(['maquina', periodo])[COLUMNAS_SUMABLES].sum()
+    return calcular_ratios(sumas[sumas['horas_produccion'] > 0]).reset_index()
+
+
+def oee_total(cubo):
+    """OEE global del recorte (una fila)."""
+    return calcular_ratios(cubo[COLUMNAS_SUMABLES].sum().to_frame().T).iloc[0]
@@ -0,0 +1,201 @@
+# datos/precalculo.py
+# Precálculo en segundo plano de los datos derivados pesados (cubo OEE, KPIs comparativos, confiabilidad,
+# tiempo perdido, anomalías de rendimiento, series por fecha, corpus de observaciones y actividad diaria
+# por máquina). Un hilo del propio proceso revisa la versión del dataset cada pocos segundos y
+# reconstruye los artefactos vencidos (versión nueva o más antiguos que el período de reconstrucción).
+# La última versión completa de cada uno queda en memoria y en un directorio local (pickle), así un
+# reinicio arranca con ellos. Los obtener_* de cada módulo consultan primero aquí: los callbacks solo
+# hacen búsquedas y construyen en línea únicamente si el precálculo todavía no llegó.
+
+import os
+import pickle
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+
+from datos.cache import LockProceso
+from datos.carga import obtener_dataset, version_dataset
+
+# Directorio de artefactos (relativo al directorio de trabajo si no es absoluto)
+VARIABLE_DIRECTORIO = 'SIPROSA_CACHE_DIR'
+DIRECTORIO_CACHE = '.cache_siprosa'
+# Segundos entre revisiones de la versión del dataset; 0 desactiva el hilo de precálculo
+VARIABLE_INTERVALO = 'SIPROSA_PRECALCULO_SEGUNDOS'
+INTERVALO_REVISION_S = 30
+# Reconstrucción periódica aunque la versión no cambie (p.ej. archivo de tasas nominales editado)
+INTERVALO_RECONSTRUCCION_S = 6 * 3600
+
+_artefactos = {}  # nombre -> (clave(version) -> clave del artefacto, construir(df, version) -> valor)
+_completados = {}  # nombre -> {'clave', 'version', 'valor', 'duracion_s', 'construido'} (última construcción completa)
+_errores = {}  # nombre -> mensaje del último intento fallido
+_lock_precalculo = LockProceso()
+_hilo = None
+
+
+def directorio_cache():
+    return os.environ.get(VARIABLE_DIRECTORIO, DIRECTORIO_CACHE)
+
+
+def registrar_artefacto(nombre, construir, clave=None):
+    """Registra un artefacto. `clave(version)` identifica sus entradas (por defecto, la versión del dataset)."""
+    _artefactos[nombre] = (clave or (lambda version: version), construir)
+
+
+def _ruta(nombre):
+    return os.path.join(directorio_cache(), f"{nombre}.pkl")
+
+
+def _guardar_disco(nombre, registro):
+    """Escritura atómica (archivo temporal + rename): un lector nunca ve un artefacto a medio escribir."""
+    os.makedirs(directorio_cache(), exist_ok=True)
+    temporal = f"{_ruta(nombre)}.{os.getpid()}.tmp"
+    with open(temporal, 'wb') as f:
+        pickle.dump(registro, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporal, _ruta(nombre))
+
+
+def _leer_disco(nombre):
+    try:
+        with open(_ruta(nombre), 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"ADVERTENCIA: artefacto '{nombre}' ilegible en {_ruta(nombre)} ({e}); se reconstruirá.")
+        return None
+
+
+def _registro(nombre):
+    registro = _completados.get(nombre)
+    if registro is None and nombre not in _completados:
+        registro = _completados.setdefault(nombre, _leer_disco(nombre))  # Se lee de disco una sola vez
+    return registro
+
+
+def leer_artefacto(nombre, clave):
+    """Valor precalculado del artefacto para esta clave, o None si todavía no está."""
+    registro = _registro(nombre)
+    return registro['valor'] if registro is not None and registro['clave'] == clave else None
+
+
+def ultimo_artefacto(nombre):
+    """(clave, valor) de la última construcción completa, sea de la versión que sea; (None, None) si no hay."""
+    registro = _registro(nombre)
+    return (registro['clave'], registro['valor']) if registro is not None else (None, None)
+
+
+def precalcular(forzar=False):
+    """Reconstruye los artefactos vencidos con el dataset actual (lo recarga si cambió). Devuelve los nombres construidos."""
+    with _lock_precalculo:
+        df, version = obtener_dataset()
+        construidos = []
+        for nombre, (clave_de, construir) in list(_artefactos.items()):
+            clave = clave_de(version)
+            registro = _registro(nombre)
+            vencido = (forzar or registro is None or registro['clave'] != clave
+                       or time.time() - registro['construido'] > INTERVALO_RECONSTRUCCION_S)
+            if not vencido:
+                continue
+            inicio = time.perf_counter()
+            try:
+                valor = construir(df, version)
+            except Exception as e:
+                _errores[nombre] = f"{type(e).__name__}: {e}"
+                print(f"Error precalculando '{nombre}': {e}")
+                traceback.print_exc()
+                continue
+            registro = {'clave': clave, 'version': version, 'valor': valor,
+                        'duracion_s': time.perf_counter() - inicio, 'construido': time.time()}
+            _completados[nombre] = registro
+            _errores.pop(nombre, None)
+            try:
+                _guardar_disco(nombre, registro)
+            except Exception as e:
+                print(f"ADVERTENCIA: no se pudo guardar el artefacto '{nombre}' en disco ({e}).")
+            construidos.append(nombre)
+            print(f"Precálculo: '{nombre}' listo en {registro['duracion_s']:.2f}s (versión {version}).")
+        return construidos
+
+
+def estado_precalculo():
+    """Por artefacto: versión construida, duración, antigüedad y si está al día con el dataset actual."""
+    try:
+        version_actual = version_dataset()
+    except FileNotFoundError:
+        version_actual = None
+    ahora = time.time()
+    estado = []
+    for nombre, (clave_de, _) in sorted(_artefactos.items()):
+        registro = _registro(nombre)
+        estado.append({
+            'nombre': nombre,
+            'version': registro['version'] if registro else None,
+            'construido': datetime.fromtimestamp(registro['construido'], tz=timezone.utc).isoformat() if registro else None,
+            'duracion_s': round(registro['duracion_s'], 3) if registro else None,
+            'antiguedad_s': round(ahora - registro['construido'], 1) if registro else None,
+            'al_dia': bool(registro) and version_actual is not None and registro['clave'] == clave_de(version_actual),
+            'error': _errores.get(nombre),
+        })
+    return estado
+
+
+class Precalculador(threading.Thread):
+    """Hilo daemon que llama a precalcular() cada `intervalo` segundos."""
+
+    def __init__(self, intervalo=INTERVALO_REVISION_S):
+        super().__init__(name='precalculo', daemon=True)
+        self.intervalo = intervalo
+        self._detener = threading.Event()
+
+    def run(self):
+        while not self._detener.is_set():
+            try:
+                precalcular()
+            except FileNotFoundError as e:
+                print(f"Precálculo en espera: archivo de respuestas no encontrado ({e}).")
+            except Exception as e:
+                print(f"Error en el hilo de precálculo: {e}")
+                traceback.print_exc()
+            self._detener.wait(self.intervalo)
+
+    def detener(self):
+        self._detener.set()
+
+
+def registrar_artefactos_predeterminados():
+    # Importes locales: esos módulos importan leer_artefacto de aquí
+    from datos.oee import clave_cubo_oee, construir_cubo_oee
+    from datos.kpis import construir_tabla_comparativos
+    from datos.confiabilidad import obtener_motor_confiabilidad
+    from datos.solapamientos import construir_tiempo_perdido
+    from datos.anomalias import obtener_detector
+    from datos.series import construir_series
+    from datos.corpus import obtener_corpus
+    from datos.actividad import construir_actividad_diaria
+
+    registrar_artefacto('cubo_oee', lambda df, version: construir_cubo_oee(df), clave=clave_cubo_oee)
+    registrar_artefacto('kpis_comparativos', construir_tabla_comparativos)
+    registrar_artefacto('confiabilidad', obtener_motor_confiabilidad)
+    registrar_artefacto('tiempo_perdido', lambda df, version: construir_tiempo_perdido(df))
+    registrar_artefacto('anomalias_rendimiento', obtener_detector)
+    registrar_artefacto('series_fechas', lambda df, version: construir_series(df))
+    registrar_artefacto('corpus_observaciones', obtener_corpus)
+    registrar_artefacto('actividad_diaria', lambda df, version: construir_actividad_diaria(df))
+
+
+def iniciar_precalculo(intervalo=None):
+    """Registra los artefactos y arranca el hilo (una sola vez por proceso). None si está desactivado."""
+    global _hilo
+    intervalo = float(os.environ.get(VARIABLE_INTERVALO, INTERVALO_REVISION_S)) if intervalo is None else intervalo
+    if intervalo <= 0:
+        print("Precálculo en segundo plano desactivado: los datos derivados se calculan al pedirlos.")
+        return None
+    with _lock_precalculo:
+        if _hilo is not None and _hilo.is_alive():
+            return _hilo
+        registrar_artefactos_predeterminados()
+        _hilo = Precalculador(intervalo)
+        _hilo.start()
+        print(f"Precálculo en segundo plano cada {intervalo:g}s (artefactos en {directorio_cache()}).")
+        return _hilo
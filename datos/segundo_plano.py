@@ -0,0 +1,123 @@
+# datos/segundo_plano.py
+# Callbacks pesados (páginas Producción y Mantenimiento) como callbacks en segundo plano de Dash sobre un
+# DiskcacheManager local: cada ejecución corre en un proceso aparte y se cancela cuando el slider cambia
+# de nuevo, así arrastrarlo no deja trabajos viejos ocupando los workers. Además, pedidos idénticos
+# (mismos argumentos y versión del dataset) en curso al mismo tiempo comparten un solo cálculo.
+# Sin diskcache (dependencia opcional: pip install "dash[diskcache]") los callbacks siguen siendo
+# sincrónicos y la coalescencia se hace entre hilos del proceso.
+
+import os
+import time
+from concurrent.futures import Future
+
+from datos.cache import LockProceso
+from datos.carga import version_dataset
+from datos.precalculo import directorio_cache
+
+try:
+    import diskcache
+    import psutil
+    from dash import DiskcacheManager
+    diskcache_disponible = True
+except ImportError:
+    diskcache = None
+    psutil = None
+    DiskcacheManager = None
+    diskcache_disponible = False
+
+# 0 desactiva los callbacks en segundo plano aunque diskcache esté instalado
+VARIABLE_SEGUNDO_PLANO = 'SIPROSA_CALLBACKS_SEGUNDO_PLANO'
+# Resultados compartidos: cuánto se conservan y cuánto puede tardar un cálculo antes de que otro lo retome
+EXPIRA_RESULTADO_S = 300
+MAX_CALCULO_S = 120
+ESPERA_S = 0.05
+
+_manager = None
+_lock_manager = LockProceso()
+_lock_vuelos = LockProceso()
+_vuelos = {}  # clave -> Future del cálculo en curso (modo sin diskcache)
+_FALTA = object()
+
+
+def manager_callbacks():
+    """DiskcacheManager compartido (directorio de caché local), o None si no está disponible o desactivado."""
+    global _manager
+    if not diskcache_disponible or os.environ.get(VARIABLE_SEGUNDO_PLANO, '1') == '0':
+        return None
+    if _manager is None:
+        with _lock_manager:
+            if _manager is None:
+                cache = diskcache.Cache(os.path.join(directorio_cache(), 'callbacks'))
+                _manager = DiskcacheManager(cache, expire=EXPIRA_RESULTADO_S)
+    return _manager
+
+
+def opciones_segundo_plano(cancelar=()):
+    """kwargs de @callback: en segundo plano y cancelado por `cancelar` (Inputs) si hay manager; si no, {}."""
+    manager = manager_callbacks()
+    if manager is None:
+        return {}
+    return {'background': True, 'manager': manager, 'cancel': list(cancelar)}
+
+
+def _vivo(pid):
+    try:
+        return psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return False
+
+
+def _compartido_diskcache(cache, clave, calcular):
+    """Entre procesos: el primero toma el lock (add atómico con su pid) y calcula; los demás esperan su
+    resultado. Si el dueño del lock fue cancelado (proceso terminado), otro lo retoma."""
+    clave_lock = f"{clave}:calculando"
+    while True:
+        valor = cache.get(clave, default=_FALTA)
+        if valor is not _FALTA:
+            return valor
+        if cache.add(clave_lock, os.getpid(), expire=MAX_CALCULO_S):
+            try:
+                valor = calcular()
+                cache.set(clave, valor, expire=EXPIRA_RESULTADO_S)
+                return valor
+            finally:
+                cache.delete(clave_lock)
+        with cache.transact():
+            duenio = cache.get(clave_lock)
+            if duenio is not None and not _vivo(duenio):
+                cache.delete(clave_lock)
+                continue
+        time.sleep(ESPERA_S)
+
+
+def _compartido_local(clave, calcular):
+    with _lock_vuelos:
+        vuelo = _vuelos.get(clave)
+        propio = vuelo is None
+        if propio:
+            vuelo = _vuelos[clave] = Future()
+    if not propio:
+        return vuelo.result()
+    try:
+        valor = calcular()
+        vuelo.set_result(valor)
+        return valor
+    except BaseException as e:
+        vuelo.set_exception(e)
+        raise
+    finally:
+        with _lock_vuelos:
+            _vuelos.pop(clave, None)
+
+
+def resultado_compartido(nombre, argumentos, calcular):
+    """calcular() una sola vez por (nombre, argumentos, versión del dataset) entre los pedidos en curso."""
+    try:
+        version = version_dataset()
+    except FileNotFoundError:
+        version = None
+    clave = f"siprosa:{nombre}:{version}:{argumentos!r}"
+    manager = manager_callbacks()
+    if manager is not None:
+        return _compartido_diskcache(manager.handle, clave, calcular)
+    return _compartido_local(clave, calcular)
@@ -0,0 +1,187 @@
+# datos/series.py
+# Series por fecha de los gráficos de Incidentes, Mantenimiento y Producción en tres resoluciones: día,
+# semana (desde el lunes) y mes. Por versión del dataset se arma la serie diaria de cada medida por
+# (planta, máquina[, producto]) y, a partir de ella, las sumas semanales y mensuales. Cada gráfico elige la
+# resolución según el largo del rango (a lo sumo MAX_PUNTOS períodos); un clic en un período lo abre con una
+# resolución más fina. Las consultas (medida, rango, resolución, filtros) se cachean por versión.
+
+import numpy as np
+import pandas as pd
+
+from datos.cache import CacheLRU, LockProceso
+from datos.columnas import (
+    COLUMNA_PLANTA, COLUMNA_PRODUCTO, COLUMNA_CANTIDAD,
+    COLUMNA_MAQUINA_PROD, COLUMNA_FECHA_PROD,
+    COLUMNA_MAQUINA_MANT, COLUMNA_FECHA_MANT, COLUMNA_HORA_INI_MANT, COLUMNA_HORA_FIN_MANT,
+    COLUMNA_MAQUINA_INCID, COLUMNA_FECHA_INCID,
+)
+from datos.filtros import VALORES_SIN_FILTRO, filas_produccion, filas_mantenimiento, filas_incidentes
+from datos.intervalos import intervalos
+from datos.precalculo import leer_artefacto
+
+# Resoluciones de la más fina a la más gruesa (mismas frecuencias que la página OEE)
+RESOLUCIONES = ['D', 'W-MON', 'MS']
+NOMBRES_RESOLUCION = {'D': 'Día', 'W-MON': 'Semana', 'MS': 'Mes'}
+# Máximo de períodos por gráfico: se usa la resolución más fina que no lo supere
+MAX_PUNTOS = 180
+
+# Medidas disponibles: incidentes (cantidad), horas de mantenimiento y cantidad producida (también por producto)
+MEDIDAS = ('incidentes', 'mantenimiento_horas', 'produccion')
+
+_cache_series = CacheLRU(max_entradas=2)
+_cache_consultas = CacheLRU(max_entradas=256)
+_lock_series = LockProceso()
+
+
+# --- Períodos ---
+def inicio_periodo(fechas, resolucion):
+    """Inicio del período (día, lunes de la semana o primer día del mes) de cada fecha de una Serie."""
+    if resolucion == 'W-MON':
+        return fechas - pd.to_timedelta(fechas.dt.dayofweek, unit='D')
+    if resolucion == 'MS':
+        return fechas.dt.to_period('M').dt.to_timestamp()
+    return fechas
+
+
+def periodo_de(fecha, resolucion):
+    """(inicio, fin) del período que contiene a la fecha (ambos días incluidos)."""
+    fecha = pd.Timestamp(fecha).normalize()
+    if resolucion == 'W-MON':
+        inicio = fecha - pd.Timedelta(days=fecha.dayofweek)
+        return inicio, inicio + pd.Timedelta(days=6)
+    if resolucion == 'MS':
+        inicio = fecha.replace(day=1)
+        return inicio, inicio + pd.offsets.MonthEnd(0)
+    return fecha, fecha
+
+
+def resolucion_para(fecha_inicio, fecha_fin, max_puntos=MAX_PUNTOS):
+    """La resolución más fina con la que el rango entra en max_puntos períodos."""
+    dias = (pd.Timestamp(fecha_fin) - pd.Timestamp(fecha_inicio)).days + 1
+    if dias <= max_puntos:
+        return 'D'
+    if dias // 7 + 2 <= max_puntos:
+        return 'W-MON'
+    return 'MS'
+
+
+def periodo_ampliado(fecha_click, resolucion, fecha_inicio, fecha_fin):
+    """Rango (inicio, fin) del período clickeado, recortado al rango mostrado; None si ya es un día."""
+    if resolucion == 'D':
+        return None
+    inicio, fin = periodo_de(fecha_click, resolucion)
+    return max(inicio, pd.Timestamp(fecha_inicio)), min(fin, pd.Timestamp(fecha_fin))
+
+
+def meta_serie(fecha_inicio, fecha_fin, resolucion):
+    """Período y resolución mostrados, para guardar en layout.meta de la figura (lo lee el clic siguiente)."""
+    return {'inicio': pd.Timestamp(fecha_inicio).strftime('%Y-%m-%d'), 'fin': pd.Timestamp(fecha_fin).strftime('%Y-%m-%d'), 'resolucion': resolucion}
+
+
+def leer_meta_serie(figura):
+    """(inicio, fin, resolución) guardados por meta_serie en una figura (dict); None si no tiene."""
+    meta = ((figura or {}).get('layout') or {}).get('meta')
+    if not isinstance(meta, dict) or meta.get('resolucion') not in RESOLUCIONES:
+        return None
+    return pd.Timestamp(meta['inicio']), pd.Timestamp(meta['fin']), meta['resolucion']
+
+
+# --- Construcción por versión ---
+def _diaria(df, filas, columna_fecha, columna_maquina, valores, por_producto=False):
+    """Suma diaria de `valores` (Serie alineada con df.iloc[filas]) por (planta, máquina[, producto], fecha)."""
+    df_filas = df.iloc[filas]
+    datos = {
+        COLUMNA_PLANTA: df_filas[COLUMNA_PLANTA] if COLUMNA_PLANTA in df_filas.columns else '',
+        'maquina': df_filas[columna_maquina] if columna_maquina in df_filas.columns else None,
+    }
+    if por_producto:
+        datos['producto'] = df_filas[COLUMNA_PRODUCTO]
+    datos['fecha'] = df_filas[columna_fecha].dt.normalize()
+    datos['valor'] = valores
+    diaria = pd.DataFrame(datos, index=df_filas.index)
+    diaria = diaria[diaria['fecha'].notna() & diaria['valor'].notna()]
+    claves = [c for c in diaria.columns if c != 'valor']
+    return diaria.groupby(claves, dropna=False, sort=False)['valor'].sum().reset_index()
+
+
+def _resumir(diaria, resolucion):
+    claves = [c for c in diaria.columns if c != 'valor']
+    periodos = diaria.assign(fecha=inicio_periodo(diaria['fecha'], resolucion))
+    return periodos.groupby(claves, dropna=False, sort=False)['valor'].sum().reset_index()
+
+
+def construir_series(df):
+    """{medida: {resolución: DataFrame (planta, maquina[, producto], fecha, valor)}} del dataset completo."""
+    filas = filas_incidentes(df)
+    incidentes = _diaria(df, filas, COLUMNA_FECHA_INCID, COLUMNA_MAQUINA_INCID, pd.Series(1, index=df.index[filas], dtype='int64'))
+
+    filas = filas_mantenimiento(df)
+    horas = intervalos(df.iloc[filas], COLUMNA_FECHA_MANT, COLUMNA_HORA_INI_MANT, COLUMNA_HORA_FIN_MANT)['horas']
+    mantenimiento = _diaria(df, filas, COLUMNA_FECHA_MANT, COLUMNA_MAQUINA_MANT, horas.where(horas >= 0))
+
+    filas = filas_produccion(df)
+    produccion = _diaria(df, filas, COLUMNA_FECHA_PROD, COLUMNA_MAQUINA_PROD, df.iloc[filas][COLUMNA_CANTIDAD], por_producto=True)
+
+    series = {}
+    for medida, diaria in zip(MEDIDAS, (incidentes, mantenimiento, produccion)):
+        series[medida] = {'D': diaria, **{r: _resumir(diaria, r) for r in RESOLUCIONES[1:]}}
+    return series
+
+
+def obtener_series(df, version_datos):
+    """Series de esta versión del dataset: precalculadas o construidas una sola vez."""
+    series = _cache_series.obtener(version_datos)
+    if series is None:
+        with _lock_series:
+            series = _cache_series.obtener(version_datos)
+            if series is None:
+                series = leer_artefacto('series_fechas', version_datos)
+                series = _cache_series.guardar(version_datos, construir_series(df) if series is None else series)
+    return series
+
+
+# --- Consultas ---
+def _filtrar(tabla, maquinas, planta, producto):
+    mascara = np.ones(len(tabla), dtype=bool)
+    if maquinas: mascara &= tabla['maquina'].isin(maquinas).to_numpy()
+    if planta not in VALORES_SIN_FILTRO: mascara &= (tabla[COLUMNA_PLANTA] == planta).to_numpy()
+    if producto not in VALORES_SIN_FILTRO: mascara &= (tabla['producto'] == producto).to_numpy()
+    return tabla[mascara]
+
+
+def _entre(tabla, desde, hasta):
+    return tabla[((tabla['fecha'] >= desde) & (tabla['fecha'] <= hasta)).to_numpy()]
+
+
+def _consultar(series, medida, fecha_inicio, fecha_fin, resolucion, maquinas, planta, producto, por_maquina):
+    diaria = _entre(_filtrar(series[medida]['D'], maquinas, planta, producto), fecha_inicio, fecha_fin)
+    if resolucion == 'D':
+        tramos = diaria
+    else:
+        # Períodos completos dentro del rango salen del resumen; los de los bordes, de la serie diaria
+        desde, fin_primero = periodo_de(fecha_inicio, resolucion)
+        if desde < fecha_inicio:
+            desde = fin_primero + pd.Timedelta(days=1)
+        inicio_ultimo, hasta = periodo_de(fecha_fin, resolucion)
+        if hasta > fecha_fin:
+            hasta = inicio_ultimo - pd.Timedelta(days=1)
+        completos = _entre(_filtrar(series[medida][resolucion], maquinas, planta, producto), desde, hasta)
+        bordes = diaria[((diaria['fecha'] < desde) | (diaria['fecha'] > hasta)).to_numpy()]
+        tramos = pd.concat([completos, bordes.assign(fecha=inicio_periodo(bordes['fecha'], resolucion))], ignore_index=True)
+    claves = ['maquina', 'fecha'] if por_maquina else ['fecha']
+    return tramos.groupby(claves, dropna=False)['valor'].sum().reset_index()
+
+
+def serie_temporal(df, version_datos, medida, fecha_inicio, fecha_fin, resolucion=None,
+                   maquinas=None, planta=None, producto=None, por_maquina=False):
+    """(DataFrame [maquina,] fecha, valor; resolución) de la medida en el rango, con 'fecha' = inicio del
+    período. Sin `resolucion` se elige con resolucion_para. Resultado cacheado: no modificarlo."""
+    fecha_inicio, fecha_fin = pd.Timestamp(fecha_inicio).normalize(), pd.Timestamp(fecha_fin).normalize()
+    resolucion = resolucion or resolucion_para(fecha_inicio, fecha_fin)
+    clave = (version_datos, medida, fecha_inicio, fecha_fin, resolucion, tuple(maquinas or ()), planta, producto, por_maquina)
+    resultado = _cache_consultas.obtener(clave)
+    if resultado is None:
+        series = obtener_series(df, version_datos)
+        resultado = _cache_consultas.guardar(clave, _consultar(series, medida, fecha_inicio, fecha_fin, resolucion,
+                                                               maquinas, planta, producto, por_maquina))
+    return resultado, resolucion
@@ -0,0 +1,150 @@
+# datos/solapamientos.py
+# Minutos de producción perdidos: cruce por máquina entre los tramos de producción y los de incidentes
+# o mantenimiento (registrados en filas distintas del formulario y nunca vinculados entre sí).
+# Por máquina, los tramos de producción se funden en una unión ordenada y disjunta con su cobertura
+# acumulada; la superposición de cualquier tramo [a, b) con esa unión es cobertura(b) - cobertura(a),
+# resuelta con búsqueda binaria: O((n + k) log n) con n tramos de producción y k eventos.
+# El resultado (planta, máquina, día) se cachea por versión del dataset.
+
+import numpy as np
+import pandas as pd
+
+from datos.cache import CacheLRU, LockProceso
+from datos.columnas import (
+    COLUMNA_PLANTA, COLUMNA_MAQUINA_PROD, COLUMNA_FECHA_PROD, COLUMNA_HORA_INI_PROD, COLUMNA_HORA_FIN_PROD,
+    COLUMNA_MAQUINA_MANT, COLUMNA_FECHA_MANT, COLUMNA_HORA_INI_MANT, COLUMNA_HORA_FIN_MANT,
+    COLUMNA_MAQUINA_INCID, COLUMNA_FECHA_INCID, COLUMNA_HORA_INI_INCID, COLUMNA_HORA_FIN_INCID,
+)
+from datos.filtros import VALORES_SIN_FILTRO, filas_produccion, filas_mantenimiento, filas_incidentes
+from datos.intervalos import intervalos
+from datos.precalculo import leer_artefacto
+
+COLUMNAS_TIEMPO_PERDIDO = [COLUMNA_PLANTA, 'maquina', 'fecha', 'minutos_incidentes', 'minutos_mantenimiento', 'minutos_perdidos']
+
+_cache_tiempo_perdido = CacheLRU(max_entradas=2)
+_lock_tiempo_perdido = LockProceso()
+
+
+def _tramos(df, filas, columna_maquina, columna_fecha, columna_inicio, columna_fin):
+    """(planta, maquina, inicio, fin) de las filas pedidas con ambos horarios válidos."""
+    df_filas = df.iloc[filas]
+    tramos = intervalos(df_filas, columna_fecha, columna_inicio, columna_fin)
+    resultado = pd.DataFrame({
+        COLUMNA_PLANTA: df_filas[COLUMNA_PLANTA] if COLUMNA_PLANTA in df_filas.columns else '',
+        'maquina': df_filas[columna_maquina] if columna_maquina in df_filas.columns else None,
+        'inicio': tramos['inicio'],
+        'fin': tramos['fin'],
+    })
+    return resultado[resultado['maquina'].notna() & (tramos['horas'] > 0)]
+
+
+class UnionIntervalos:
+    """Unión ordenada y disjunta de intervalos con cobertura acumulada, para medir superposiciones."""
+
+    def __init__(self, inicios, fines):
+        orden = np.argsort(inicios, kind='stable')
+        inicios = np.asarray(inicios, dtype='datetime64[ns]')[orden].astype(np.int64)
+        fines = np.asarray(fines, dtype='datetime64[ns]')[orden].astype(np.int64)
+        if len(inicios) == 0:
+            self.inicios = self.fines = self.acumulado = np.zeros(0, dtype=np.int64)
+            return
+        fin_maximo = np.maximum.accumulate(fines)
+        nuevo_tramo = np.ones(len(inicios), dtype=bool)
+        nuevo_tramo[1:] = inicios[1:] > fin_maximo[:-1]  # Empieza después de todo lo anterior
+        self.inicios = inicios[nuevo_tramo]
+        self.fines = np.maximum.reduceat(fines, np.flatnonzero(nuevo_tramo))
+        # Cobertura acumulada antes de cada tramo de la unión
+        self.acumulado = np.concatenate([[0], np.cumsum(self.fines - self.inicios)[:-1]])
+
+    def cobertura_hasta(self, instantes):
+        """Nanosegundos cubiertos por la unión antes de cada instante."""
+        instantes = np.asarray(instantes, dtype='datetime64[ns]').astype(np.int64)
+        if len(self.inicios) == 0:
+            return np.zeros(len(instantes), dtype=np.int64)
+        i = np.searchsorted(self.inicios, instantes, side='right') - 1
+        dentro = i >= 0
+        i = np.maximum(i, 0)
+        parcial = np.clip(instantes - self.inicios[i], 0, self.fines[i] - self.inicios[i])
+        return np.where(dentro, self.acumulado[i] + parcial, 0)
+
+    def superposicion(self, inicios, fines):
+        """Nanosegundos de cada intervalo [inicio, fin) que caen dentro de la unión."""
+        return self.cobertura_hasta(fines) - self.cobertura_hasta(inicios)
+
+
+def _minutos_superpuestos(produccion, eventos):
+    """Minutos de cada evento superpuestos con la producción de su misma máquina (Serie con el índice de eventos)."""
+    minutos = pd.Series(0.0, index=eventos.index)
+    if eventos.empty or produccion.empty:
+        return minutos
+    por_maquina = {clave: grupo for clave, grupo in produccion.groupby([COLUMNA_PLANTA, 'maquina'], sort=False)}
+    for clave, grupo in eventos.groupby([COLUMNA_PLANTA, 'maquina'], sort=False):
+        prod = por_maquina.get(clave)
+        if prod is None:
+            continue
+        union = UnionIntervalos(prod['inicio'].to_numpy(), prod['fin'].to_numpy())
+        minutos.loc[grupo.index] = union.superposicion(grupo['inicio'].to_numpy(), grupo['fin'].to_numpy()) / 6e10
+    return minutos
+
+
+def _minutos_union_eventos(produccion, eventos):
+    """Minutos perdidos sin contar dos veces un incidente y un mantenimiento simultáneos: los eventos de cada
+    máquina se funden en una unión y se mide cada tramo de esa unión contra la producción."""
+    filas = []
+    por_maquina = {clave: grupo for clave, grupo in produccion.groupby([COLUMNA_PLANTA, 'maquina'], sort=False)}
+    for clave, grupo in eventos.groupby([COLUMNA_PLANTA, 'maquina'], sort=False):
+        prod = por_maquina.get(clave)
+        if prod is None:
+            continue
+        union_eventos = UnionIntervalos(grupo['inicio'].to_numpy(), grupo['fin'].to_numpy())
+        union_prod = UnionIntervalos(prod['inicio'].to_numpy(), prod['fin'].to_numpy())
+        minutos = union_prod.superposicion(union_eventos.inicios, union_eventos.fines) / 6e10
+        filas.append(pd.DataFrame({
+            COLUMNA_PLANTA: clave[0], 'maquina': clave[1],
+            'fecha': pd.to_datetime(union_eventos.inicios).normalize(), 'minutos_perdidos': minutos,
+        }))
+    if not filas:
+        return pd.DataFrame(columns=[COLUMNA_PLANTA, 'maquina', 'fecha', 'minutos_perdidos'])
+    return pd.concat(filas, ignore_index=True)
+
+
+def construir_tiempo_perdido(df):
+    """Minutos de producción perdidos por (planta, máquina, día del inicio del evento): por incidentes,
+    por mantenimiento y en total (sin doble conteo). Solo días con alguna superposición."""
+    produccion = _tramos(df, filas_produccion(df), COLUMNA_MAQUINA_PROD, COLUMNA_FECHA_PROD, COLUMNA_HORA_INI_PROD, COLUMNA_HORA_FIN_PROD)
+    incidentes = _tramos(df, filas_incidentes(df), COLUMNA_MAQUINA_INCID, COLUMNA_FECHA_INCID, COLUMNA_HORA_INI_INCID, COLUMNA_HORA_FIN_INCID)
+    mantenimientos = _tramos(df, filas_mantenimiento(df), COLUMNA_MAQUINA_MANT, COLUMNA_FECHA_MANT, COLUMNA_HORA_INI_MANT, COLUMNA_HORA_FIN_MANT)
+    claves = [COLUMNA_PLANTA, 'maquina', 'fecha']
+
+    por_tipo = []
+    for nombre, eventos in (('minutos_incidentes', incidentes), ('minutos_mantenimiento', mantenimientos)):
+        minutos = eventos[[COLUMNA_PLANTA, 'maquina']].assign(fecha=eventos['inicio'].dt.normalize(), **{nombre: _minutos_superpuestos(produccion, eventos)})
+        por_tipo.append(minutos.groupby(claves)[nombre].sum())
+    total = _minutos_union_eventos(produccion, pd.concat([incidentes, mantenimientos], ignore_index=True)).groupby(claves)['minutos_perdidos'].sum()
+
+    resultado = pd.concat(por_tipo + [total], axis=1).fillna(0.0)
+    resultado = resultado[resultado['minutos_perdidos'] > 0]
+    if resultado.empty:
+        return pd.DataFrame(columns=COLUMNAS_TIEMPO_PERDIDO)
+    return resultado.reset_index()[COLUMNAS_TIEMPO_PERDIDO].sort_values(['fecha', 'maquina'], ignore_index=True)
+
+
+def obtener_tiempo_perdido(df, version_datos):
+    """Minutos perdidos por máquina y día para esta versión del dataset: precalculados o calculados una sola vez."""
+    resultado = _cache_tiempo_perdido.obtener(version_datos)
+    if resultado is None:
+        with _lock_tiempo_perdido:
+            resultado = _cache_tiempo_perdido.obtener(version_datos)
+            if resultado is None:
+                resultado = leer_artefacto('tiempo_perdido', version_datos)
+                resultado = _cache_tiempo_perdido.guardar(version_datos, construir_tiempo_perdido(df) if resultado is None else resultado)
+    return resultado
+
+
+def filtrar_tiempo_perdido(tiempo_perdido, fecha_inicio=None, fecha_fin=None, maquinas=None, planta=None):
+    mascara = np.ones(len(tiempo_perdido), dtype=bool)
+    if fecha_inicio is not None: mascara &= (tiempo_perdido['fecha'] >= fecha_inicio).to_numpy()
+    if fecha_fin is not None: mascara &= (tiempo_perdido['fecha'] <= fecha_fin).to_numpy()
+    if maquinas: mascara &= tiempo_perdido['maquina'].isin(maquinas).to_numpy()
+    if planta not in VALORES_SIN_FILTRO: mascara &= (tiempo_perdido[COLUMNA_PLANTA] == planta).to_numpy()
+    return tiempo_perdido[mascara]
@@ -0,0 +1,107 @@
+# datos/textos.py
+# Almacén aparte para las columnas de texto libre (descripciones, observaciones, email y nombre).
+# El DataFrame analítico no las lleva: se guardan comprimidas (zlib) por bloques de filas y se leen
+# por id de fila solo cuando una tabla, un modal o una exportación las muestran.
+
+import zlib
+import numpy as np
+import pandas as pd
+
+from datos.cache import CacheLRU
+from datos.columnas import COLUMNA_ID_FILA, COLUMNAS_TEXTO_LIBRE
+
+# Filas por bloque comprimido: leer una fila descomprime solo su bloque
+FILAS_BLOQUE_TEXTO = 512
+
+
+def _comprimir(valores):
+    """(bytes comprimidos, offsets, nulos) de una lista de textos (None = nulo)."""
+    nulos = np.array([v is None for v in valores], dtype=bool)
+    codificados = [b'' if v is None else v.encode('utf-8') for v in valores]
+    offsets = np.zeros(len(codificados) + 1, dtype=np.int32)  # Relativos al bloque
+    np.cumsum([len(c) for c in codificados], out=offsets[1:])
+    return zlib.compress(b''.join(codificados)), offsets, nulos
+
+
+class AlmacenTextos:
+    """Arena comprimida de textos por columna, direccionada por posición de fila."""
+
+    def __init__(self, df=None, columnas=COLUMNAS_TEXTO_LIBRE, filas_bloque=FILAS_BLOQUE_TEXTO):
+        df = pd.DataFrame() if df is None else df
+        self.n_filas = len(df)
+        self.columnas = [col for col in columnas if col in df.columns]
+        self._inicios = np.arange(0, self.n_filas, filas_bloque, dtype=np.int64)  # Fila inicial de cada bloque
+        self._bloques = []  # Por bloque: {columna: (bytes comprimidos, offsets, nulos)}
+        self._no_vacio = {}
+        for col in self.columnas:
+            serie = df[col]
+            self._no_vacio[col] = (serie.notna() & (serie.astype(str).str.strip() != '')).to_numpy(dtype=bool, na_value=False)
+        valores = {col: df[col].astype(object).where(df[col].notna(), None).tolist() for col in self.columnas}
+        for inicio in self._inicios:
+            fin = inicio + filas_bloque
+            self._bloques.append({col: _comprimir(valores[col][inicio:fin]) for col in self.columnas})
+        self._descomprimidos = CacheLRU(max_entradas=64)
+
+    # El caché (con lock) no viaja entre procesos al parsear en paralelo
+    def __getstate__(self):
+        estado = self.__dict__.copy()
+        del estado['_descomprimidos']
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self._descomprimidos = CacheLRU(max_entradas=64)
+
+    @classmethod
+    def unir(cls, almacenes):
+        """Concatena almacenes (bloques de archivos o de trozos de archivo) en el orden dado."""
+        unido = cls()
+        unido.columnas = list(dict.fromkeys(col for a in almacenes for col in a.columnas))
+        inicios, desplazamiento = [], 0
+        for almacen in almacenes:
+            inicios.append(almacen._inicios + desplazamiento)
+            unido._bloques.extend(almacen._bloques)
+            desplazamiento += almacen.n_filas
+        unido.n_filas = desplazamiento
+        unido._inicios = np.concatenate(inicios) if inicios else np.zeros(0, dtype=np.int64)
+        unido._no_vacio = {
+            col: np.concatenate([a._no_vacio.get(col, np.zeros(a.n_filas, dtype=bool)) for a in almacenes])
+            for col in unido.columnas
+        }
+        return unido
+
+    def bytes_comprimidos(self):
+        return sum(len(datos) + offsets.nbytes + nulos.nbytes for b in self._bloques for datos, offsets, nulos in b.values())
+
+    def no_vacio(self, columna):
+        """Máscara de filas con texto no vacío en la columna (sin descomprimir nada)."""
+        return self._no_vacio.get(columna, np.zeros(self.n_filas, dtype=bool))
+
+    def _bloque(self, i, columna):
+        clave = (i, columna)
+        texto = self._descomprimidos.obtener(clave)
+        if texto is None:
+            datos, offsets, nulos = self._bloques[i][columna]
+            crudo = zlib.decompress(datos)
+            texto = self._descomprimidos.guardar(clave, [
+                None if nulo else crudo[offsets[j]:offsets[j + 1]].decode('utf-8') for j, nulo in enumerate(nulos)
+            ])
+        return texto
+
+    def valores(self, columna, filas):
+        """Textos (None si es nulo) de la columna para las posiciones de fila pedidas."""
+        filas = np.asarray(filas, dtype=np.int64)
+        if columna not in self.columnas or len(filas) == 0:
+            return [None] * len(filas)
+        bloques = np.searchsorted(self._inicios, filas, side='right') - 1
+        resultado = []
+        for fila, i in zip(filas.tolist(), bloques.tolist()):
+            bloque = self._bloques[i]
+            resultado.append(self._bloque(i, columna)[fila - self._inicios[i]] if columna in bloque else None)
+        return resultado
+
+    def completar(self, df, columnas=None):
+        """Copia de `df` con las columnas de texto pedidas (todas por defecto), leídas por ID_FILA."""
+        columnas = [col for col in (self.columnas if columnas is None else columnas) if col in self.columnas]
+        filas = df[COLUMNA_ID_FILA].to_numpy() if COLUMNA_ID_FILA in df.columns else np.arange(len(df))
+        return df.assign(**{col: pd.Series(self.valores(col, filas), index=df.index, dtype='str') for col in columnas})
@@ -0,0 +1,2 @@
+# herramientas/__init__.py
+# Herramientas de operación que se corren aparte de la app (python -m herramientas.<módulo>).
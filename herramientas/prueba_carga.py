@@ -0,0 +1,364 @@
+# herramientas/prueba_carga.py
+# Prueba de carga del tablero contra los endpoints reales de Dash (/_dash-update-component): N usuarios
+# concurrentes recorren un guion de sesión (abrir Resumen, arrastrar el slider, elegir máquina, abrir el
+# modal de un día, pasar a Producción) y se informa el throughput, la latencia p50/p95/p99 por callback y
+# la tasa de error. Sirve para dimensionar workers y comprobar que los cambios de caché ayudan con
+# contención.
+#
+# Cada usuario hace lo que haría el navegador: lee /_dash-dependencies y el layout, dispara los callbacks
+# cuyos Inputs cambian (en oleadas: un callback espera a los que producen sus Inputs), aplica las
+# respuestas al estado de la página, y para los callbacks en segundo plano sigue el sondeo con
+# cacheKey/job. Los callbacks clientside y los de ids con comodines (MATCH/ALL) no se disparan.
+#
+# Uso:
+#   python -m herramientas.prueba_carga --usuarios 8 --sesiones 3            (cliente de prueba de Flask)
+#   python -m herramientas.prueba_carga --url http://127.0.0.1:8000 -u 16    (servidor ya levantado, p. ej. gunicorn)
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Guion de sesión: (acción, argumentos...). 'ir' navega a una página; 'arrastrar' da N valores sucesivos a
+# un RangeSlider; 'elegir' toma otra opción de un Dropdown; 'clic' hace clic en un punto de un gráfico.
+GUION_PREDETERMINADO = [
+    ('ir', '/'),
+    ('arrastrar', 'home-slider-rango-fechas', 3),
+    ('ir', '/incidentes'),
+    ('arrastrar', 'incid-slider-fechas', 3),
+    ('elegir', 'incid-dropdown-maquina-general'),
+    ('clic', 'incid-grafico-combinado'),
+    ('ir', '/produccion'),
+    ('arrastrar', 'prod-slider-fechas', 2),
+]
+
+# Pedidos en paralelo por usuario (como los de un navegador a un mismo host)
+PEDIDOS_POR_USUARIO = 6
+# Espera entre sondeos de un callback en segundo plano si la dependencia no trae intervalo (segundos)
+INTERVALO_SONDEO_S = 0.1
+MAX_SONDEO_S = 120
+
+
+# --- Transporte ---
+class ClienteFlask:
+    """Pedidos al servidor Flask de la app en el mismo proceso (sin red)."""
+
+    def __init__(self, server):
+        self._cliente = server.test_client()
+
+    def get(self, ruta):
+        respuesta = self._cliente.get(ruta)
+        return respuesta.status_code, respuesta.get_data(as_text=True)
+
+    def post(self, ruta, cuerpo):
+        respuesta = self._cliente.post(ruta, data=json.dumps(cuerpo), content_type='application/json')
+        return respuesta.status_code, respuesta.get_data(as_text=True)
+
+
+class ClienteHTTP:
+    """Pedidos HTTP a un servidor ya levantado (gunicorn, app.run...)."""
+
+    def __init__(self, url_base):
+        self.url_base = url_base.rstrip('/')
+
+    def _pedir(self, pedido):
+        try:
+            with urllib.request.urlopen(pedido, timeout=MAX_SONDEO_S) as respuesta:
+                return respuesta.status, respuesta.read().decode('utf-8')
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode('utf-8', errors='replace')
+
+    def get(self, ruta):
+        return self._pedir(urllib.request.Request(self.url_base + ruta))
+
+    def post(self, ruta, cuerpo):
+        return self._pedir(urllib.request.Request(self.url_base + ruta, data=json.dumps(cuerpo).encode('utf-8'),
+                                                  headers={'Content-Type': 'application/json'}, method='POST'))
+
+
+# --- Dependencias y layout ---
+def _salidas(dependencia):
+    """[(id, propiedad)] de la clave 'output' ('id.prop' o '..id1.prop1...id2.prop2..')."""
+    clave = dependencia['output']
+    partes = clave[2:-2].split('...') if clave.startswith('..') else [clave]
+    return [tuple(p.rsplit('.', 1)) for p in partes]
+
+
+def nombre_callback(dependencia):
+    """Nombre corto del callback para el informe: su primera salida (+ cuántas más tiene)."""
+    salidas = _salidas(dependencia)
+    nombre = '.'.join(salidas[0])
+    return nombre if len(salidas) == 1 else f"{nombre} (+{len(salidas) - 1})"
+
+
+def _simple(id_componente):
+    return not id_componente.startswith('{')  # Los ids con comodines llegan serializados como JSON
+
+
+def dependencias_servidor(dependencias):
+    """Callbacks que corren en el servidor y con ids simples (los que esta herramienta sabe disparar)."""
+    utiles = []
+    for dependencia in dependencias:
+        if dependencia.get('clientside_function'):
+            continue
+        ids = [i for i, _ in _salidas(dependencia)] + [e['id'] for e in dependencia['inputs'] + dependencia['state']]
+        if all(_simple(i) for i in ids):
+            utiles.append(dependencia)
+    return utiles
+
+
+def _componentes(arbol, encontrados):
+    """Agrega a `encontrados` {id: props} de los componentes con id del árbol (JSON de layout)."""
+    if isinstance(arbol, list):
+        for hijo in arbol:
+            _componentes(hijo, encontrados)
+    elif isinstance(arbol, dict) and 'props' in arbol:
+        props = arbol['props']
+        if isinstance(props.get('id'), str):
+            encontrados[props['id']] = props
+        for valor in props.values():
+            if isinstance(valor, (dict, list)):
+                _componentes(valor, encontrados)
+    return encontrados
+
+
+# --- Sesión de un usuario ---
+class Sesion:
+    """Estado de la página de un usuario y disparo de callbacks como lo hace el renderer de Dash."""
+
+    def __init__(self, cliente, dependencias, layout, end_id, registrar, azar):
+        self.cliente = cliente
+        self.dependencias = dependencias
+        self.end_id = end_id
+        self.registrar = registrar
+        self.azar = azar
+        self.props = {}       # (id, propiedad) -> valor actual
+        self.contenidos = {}  # (id, 'children') -> ids de componentes dentro de ese contenido
+        self._agregar(None, layout)
+
+    # Estado
+    def _agregar(self, contenedor, arbol):
+        """Registra los componentes de un árbol nuevo; devuelve sus ids."""
+        if contenedor in self.contenidos:
+            viejos = self.contenidos.pop(contenedor)
+            self.props = {k: v for k, v in self.props.items() if k[0] not in viejos}
+        encontrados = _componentes(arbol, {})
+        for id_componente, props in encontrados.items():
+            for propiedad, valor in props.items():
+                self.props[(id_componente, propiedad)] = valor
+            self.props.setdefault((id_componente, 'id'), id_componente)
+        if contenedor is not None:
+            self.contenidos[contenedor] = set(encontrados)
+        return set(encontrados)
+
+    def _presente(self, id_componente):
+        return (id_componente, 'id') in self.props
+
+    def _activa(self, dependencia):
+        ids = [i for i, _ in _salidas(dependencia)] + [e['id'] for e in dependencia['inputs'] + dependencia['state']]
+        return all(self._presente(i) for i in ids)
+
+    def _disparadas_por(self, cambios):
+        return [d for d in self.dependencias if self._activa(d) and any((e['id'], e['property']) in cambios for e in d['inputs'])]
+
+    def _iniciales(self, ids_nuevos):
+        return [d for d in self.dependencias if not d.get('prevent_initial_call') and self._activa(d)
+                and any(i in ids_nuevos for i in [s for s, _ in _salidas(d)] + [e['id'] for e in d['inputs']])]
+
+    # Pedidos
+    def _cuerpo(self, dependencia, cambios):
+        salidas = [{'id': i, 'property': p} for i, p in _salidas(dependencia)]
+        valores = lambda lista: [{'id': e['id'], 'property': e['property'], 'value': self.props.get((e['id'], e['property']))} for e in lista]
+        return {
+            'output': dependencia['output'],
+            'outputs': salidas if dependencia['output'].startswith('..') else salidas[0],
+            'inputs': valores(dependencia['inputs']),
+            'state': valores(dependencia['state']),
+            'changedPropIds': [f"{e['id']}.{e['property']}" for e in dependencia['inputs'] if (e['id'], e['property']) in cambios],
+        }
+
+    def _llamar(self, dependencia, cambios):
+        """POST del callback (con sondeo si es en segundo plano); devuelve {(id, prop): valor} actualizados."""
+        cuerpo = self._cuerpo(dependencia, cambios)
+        ruta = f"/_dash-update-component?endId={self.end_id}" if self.end_id else '/_dash-update-component'
+        inicio = time.perf_counter()
+        estado, texto = None, ''
+        try:
+            estado, texto = self.cliente.post(ruta, cuerpo)
+            datos = json.loads(texto) if estado == 200 and texto else {}
+            if 'cacheKey' in datos and 'response' not in datos:
+                sondeo = f"{ruta}&cacheKey={datos['cacheKey']}&job={datos['job']}" if self.end_id else \
+                         f"{ruta}?cacheKey={datos['cacheKey']}&job={datos['job']}"
+                intervalo = ((dependencia.get('background') or {}).get('interval') or 0) / 1000 or INTERVALO_SONDEO_S
+                while estado == 200 and 'response' not in datos and time.perf_counter() - inicio < MAX_SONDEO_S:
+                    time.sleep(intervalo)
+                    estado, texto = self.cliente.post(sondeo, cuerpo)
+                    datos = json.loads(texto) if estado == 200 and texto else {}
+                if estado == 200 and 'response' not in datos:
+                    estado = 504
+        except Exception as e:
+            self.registrar(nombre_callback(dependencia), time.perf_counter() - inicio, f"excepción: {e}")
+            return {}
+        error = None if estado in (200, 204) else f"HTTP {estado}"
+        self.registrar(nombre_callback(dependencia), time.perf_counter() - inicio, error)
+        if estado != 200:
+            return {}
+        actualizados = {}
+        for id_componente, props in (datos.get('response') or {}).items():
+            for propiedad, valor in props.items():
+                actualizados[(id_componente, propiedad)] = valor
+        return actualizados
+
+    def propagar(self, pendientes, cambios):
+        """Dispara los callbacks pendientes en oleadas hasta que no quedan cambios por propagar."""
+        pendientes = {d['output']: d for d in pendientes}
+        with ThreadPoolExecutor(max_workers=PEDIDOS_POR_USUARIO) as pool:
+            while pendientes:
+                # Un callback espera si alguno de sus Inputs sale de otro callback pendiente
+                salidas_pendientes = {s for d in pendientes.values() for s in _salidas(d)}
+                listas = [d for d in pendientes.values() if not any((e['id'], e['property']) in salidas_pendientes
+                                                                    and (e['id'], e['property']) not in _salidas(d) for e in d['inputs'])]
+                listas = listas or list(pendientes.values())
+                for d in listas:
+                    del pendientes[d['output']]
+                resultados = list(pool.map(lambda d: self._llamar(d, cambios), listas))
+                cambios = set()
+                ids_nuevos = set()
+                for actualizados in resultados:
+                    for clave, valor in actualizados.items():
+                        self.props[clave] = valor
+                        cambios.add(clave)
+                        if clave[1] == 'children' and isinstance(valor, (dict, list)):
+                            ids_nuevos |= self._agregar(clave, valor)
+                for d in self._disparadas_por(cambios) + self._iniciales(ids_nuevos):
+                    pendientes.setdefault(d['output'], d)
+
+    def cambiar(self, id_componente, propiedad, valor):
+        self.props[(id_componente, propiedad)] = valor
+        cambio = {(id_componente, propiedad)}
+        self.propagar(self._disparadas_por(cambio), cambio)
+
+    # Acciones del guion
+    def ir(self, ruta):
+        self.cambiar('_pages_location', 'pathname', ruta)
+
+    def arrastrar(self, id_slider, pasos):
+        minimo, maximo = self.props.get((id_slider, 'min')), self.props.get((id_slider, 'max'))
+        if minimo is None or maximo is None:
+            return
+        for _ in range(pasos):
+            a, b = sorted(self.azar.randint(int(minimo), int(maximo)) for _ in range(2))
+            self.cambiar(id_slider, 'value', [a, b])
+
+    def elegir(self, id_dropdown):
+        opciones = self.props.get((id_dropdown, 'options')) or []
+        valores = [o['value'] if isinstance(o, dict) else o for o in opciones]
+        valores = [v for v in valores if v != self.props.get((id_dropdown, 'value'))]
+        if valores:
+            self.cambiar(id_dropdown, 'value', self.azar.choice(valores))
+
+    def clic(self, id_grafico):
+        figura = self.props.get((id_grafico, 'figure')) or {}
+        puntos = []
+        for traza in figura.get('data') or []:
+            xs, ys = traza.get('x'), traza.get('y')
+            if isinstance(xs, list):  # Los arreglos numéricos pueden venir codificados (dtype/bdata): y es opcional
+                puntos += [(x, ys[i] if isinstance(ys, list) and i < len(ys) else None) for i, x in enumerate(xs)]
+        if puntos:
+            x, y = self.azar.choice(puntos)
+            self.cambiar(id_grafico, 'clickData', {'points': [{'x': x, 'y': y, 'curveNumber': 0, 'pointNumber': 0}]})
+
+
+# --- Corrida ---
+def _end_id(cliente):
+    estado, html = cliente.get('/')
+    coincidencia = re.search(r'<script id="_dash-config" type="application/json">(.*?)</script>', html, re.S) if estado == 200 else None
+    return json.loads(coincidencia.group(1)).get('end_id') if coincidencia else None
+
+
+def correr(crear_cliente, usuarios=4, sesiones=2, guion=GUION_PREDETERMINADO, semilla=0):
+    """Corre `sesiones` recorridos del guion por cada uno de `usuarios` hilos concurrentes.
+    Devuelve (muestras [(callback, segundos, error|None)], duración total, sesiones completas)."""
+    cliente = crear_cliente()
+    dependencias = dependencias_servidor(json.loads(cliente.get('/_dash-dependencies')[1]))
+    layout = json.loads(cliente.get('/_dash-layout')[1])
+    muestras = []
+    lock = threading.Lock()
+    completas = [0]
+
+    def registrar(nombre, segundos, error):
+        with lock:
+            muestras.append((nombre, segundos, error))
+
+    def usuario(numero):
+        azar = random.Random(semilla * 1000 + numero)
+        cliente_usuario = crear_cliente()
+        for _ in range(sesiones):
+            sesion = Sesion(cliente_usuario, dependencias, layout, _end_id(cliente_usuario), registrar, azar)
+            sesion.propagar(sesion._iniciales(set(i for i, _ in sesion.props)), set())
+            for accion, *argumentos in guion:
+                getattr(sesion, accion)(*argumentos)
+            with lock:
+                completas[0] += 1
+
+    inicio = time.perf_counter()
+    hilos = [threading.Thread(target=usuario, args=(n,)) for n in range(usuarios)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return muestras, time.perf_counter() - inicio, completas[0]
+
+
+def resumen(muestras, duracion, sesiones_completas):
+    """Texto del informe: totales y latencias por callback (ms), los más lentos (p95) primero."""
+    por_callback = defaultdict(list)
+    errores = defaultdict(int)
+    for nombre, segundos, error in muestras:
+        por_callback[nombre].append(segundos * 1000)
+        if error:
+            errores[nombre] += 1
+    total_errores = sum(errores.values())
+    lineas = [
+        f"Pedidos: {len(muestras)} en {duracion:.1f}s ({len(muestras) / duracion:.1f} pedidos/s, "
+        f"{sesiones_completas / duracion * 60:.1f} sesiones/min). Errores: {total_errores} ({total_errores / max(len(muestras), 1):.1%})",
+        f"{'Callback':60} {'n':>5} {'p50':>8} {'p95':>8} {'p99':>8} {'máx':>8} {'err':>5}",
+    ]
+    filas = []
+    for nombre, latencias in por_callback.items():
+        p50, p95, p99 = np.percentile(latencias, [50, 95, 99])
+        filas.append((p95, f"{nombre[:60]:60} {len(latencias):5d} {p50:8.0f} {p95:8.0f} {p99:8.0f} {max(latencias):8.0f} {errores[nombre]:5d}"))
+    lineas += [linea for _, linea in sorted(filas, reverse=True)]
+    errores_distintos = sorted({error for _, _, error in muestras if error})
+    if errores_distintos:
+        lineas.append("Errores: " + "; ".join(errores_distintos[:5]))
+    return "\n".join(lineas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de los callbacks del tablero.")
+    parser.add_argument('--url', help="URL de un servidor ya levantado; sin ella se usa el cliente de prueba de Flask en este proceso")
+    parser.add_argument('-u', '--usuarios', type=int, default=4, help="usuarios concurrentes")
+    parser.add_argument('-s', '--sesiones', type=int, default=2, help="recorridos del guion por usuario")
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.url:
+        crear_cliente = lambda: ClienteHTTP(args.url)
+    else:
+        from app import server  # Carga el dataset y registra las páginas
+        crear_cliente = lambda: ClienteFlask(server)
+    muestras, duracion, completas = correr(crear_cliente, args.usuarios, args.sesiones, semilla=args.semilla)
+    print(resumen(muestras, duracion, completas))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# pages/busqueda.py
+
+import dash
+from dash import dcc, html, Input, Output, callback, State, ctx
+import dash_bootstrap_components as dbc
+import pandas as pd
+import numpy as np
+import time
+import traceback
+
+from datos import obtener_dataset, obtener_textos, obtener_indice_texto
+from datos.busqueda import COLUMNAS_BUSQUEDA
+from datos.columnas import (
+    COLUMNA_PLANTA, COLUMNA_TIMESTAMP, COLUMNA_EVENTO,
+    COLUMNA_FECHA_PROD, COLUMNA_FECHA_MANT, COLUMNA_FECHA_INCID,
+    COLUMNA_MAQUINA_PROD, COLUMNA_MAQUINA_MANT, COLUMNA_MAQUINA_INCID,
+)
+from datos.filtros import VALORES_SIN_FILTRO
+
+# --- Constantes ---
+RESULTADOS_POR_PAGINA = 20
+# Largo máximo del texto mostrado por campo en la tabla de resultados
+LARGO_MAX_TEXTO = 200
+# Nombre corto de cada columna de texto en la tabla
+ETIQUETAS_CAMPO = {
+    'DESCRIPCIÓN DEL INCIDENTE O PARADA': 'Incidente',
+    'ACCIONES CORRECTIVAS': 'Acciones',
+    'DESCRIPCIÓN DEL MANTENIMIENTO REALIZADO': 'Mantenimiento',
+    'DESCRIBA LAS ANOMALIAS DETECTADAS': 'Anomalías',
+    'OBSERVACIONES ADICIONALES': 'Observaciones',
+}
+
+# --- Registro de la Página ---
+dash.register_page(__name__, path='/busqueda', title='Búsqueda en Registros', name='Búsqueda')
+
+
+# --- Layout ---
+def layout():
+    return dbc.Container([
+        dbc.Row(dbc.Col(html.H1("Búsqueda en Registros", className="text-center display-4 my-4"))),
+        dbc.Row(dbc.Col(dbc.Card(dbc.CardBody([
+            html.Label('Buscar en descripciones, anomalías, acciones correctivas y observaciones:', className="card-title mb-2"),
+            dcc.Input(id='busq-texto', type='search', debounce=True, placeholder='Ej.: sensor, atasco, fuga...', className="form-control"),
+            html.Div(id='busq-resumen', className='text-muted small mt-2'),
+        ])), width=12, className="mb-3")),
+        dbc.Row(dbc.Col(dbc.Card([
+            dbc.CardHeader("Resultados"),
+            dbc.CardBody(dbc.Spinner(html.Div(id='busq-resultados'))),
+            dbc.CardFooter(dbc.Pagination(id='busq-paginacion', max_value=1, active_page=1, fully_expanded=False, size="sm", className="mb-0 justify-content-center")),
+        ]), width=12, className="mb-3")),
+    ], fluid=True, className="dbc mt-4")
+
+
+# --- Callbacks ---
+@callback(
+    Output('busq-resultados', 'children'),
+    Output('busq-resumen', 'children'),
+    Output('busq-paginacion', 'max_value'),
+    Output('busq-paginacion', 'active_page'),
+    Input('busq-texto', 'value'),
+    Input('busq-paginacion', 'active_page'),
+    Input('filtro-planta', 'value'),
+    State('store-main-data', 'data')
+)
+def buscar_registros(consulta, pagina, planta_seleccionada, data_json):
+    if not data_json:
+        return html.Div("Cargando..."), "", 1, 1
+    if not consulta or not consulta.strip():
+        return html.Div("Ingrese un término para buscar."), "", 1, 1
+    # Una consulta o planta nueva vuelve a la primera página
+    if ctx.triggered_id != 'busq-paginacion':
+        pagina = 1
+    pagina = pagina or 1
+
+    try:
+        inicio = time.perf_counter()
+        df, _ = obtener_dataset()
+        filas_permitidas = None
+        if planta_seleccionada not in VALORES_SIN_FILTRO and COLUMNA_PLANTA in df.columns:
+            filas_permitidas = (df[COLUMNA_PLANTA] == planta_seleccionada).to_numpy(dtype=bool, na_value=False)
+        filas, puntajes = obtener_indice_texto().buscar(consulta, filas_permitidas)
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+
+        total = len(filas)
+        paginas = max(1, -(-total // RESULTADOS_POR_PAGINA))
+        pagina = min(pagina, paginas)
+        desde = (pagina - 1) * RESULTADOS_POR_PAGINA
+        resumen = f"{total} resultado(s) para \"{consulta.strip()}\" en {duracion_ms:.1f} ms."
+        if total == 0:
+            return html.Div("Sin coincidencias."), resumen, 1, 1
+
+        # Solo se materializan (y se leen los textos de) las filas de la página actual
+        filas_pagina = filas[desde:desde + RESULTADOS_POR_PAGINA]
+        df_pagina = obtener_textos().completar(df.iloc[filas_pagina], COLUMNAS_BUSQUEDA)
+        tabla_html = dbc.Table.from_dataframe(
+            _tabla_resultados(df_pagina, puntajes[desde:desde + RESULTADOS_POR_PAGINA]),
+            striped=True, bordered=True, hover=True, responsive=True, class_name="align-middle small")
+        return tabla_html, resumen, paginas, pagina
+
+    except Exception as e:
+        print(f"Error en buscar_registros: {e}")
+        traceback.print_exc()
+        return html.Div("Error al buscar."), "Error", 1, 1
+
+
+def _primera_no_nula(df, columnas):
+    """Por fila, el primer valor no nulo entre las columnas (en el orden dado)."""
+    resultado = pd.Series(pd.NA, index=df.index, dtype=object)
+    for col in reversed(columnas):
+        if col in df.columns:
+            resultado = df[col].astype(object).where(df[col].notna(), resultado)
+    return resultado
+
+
+def _tabla_resultados(df_pagina, puntajes):
+    fechas = pd.to_datetime(_primera_no_nula(df_pagina, [COLUMNA_FECHA_INCID, COLUMNA_FECHA_MANT, COLUMNA_FECHA_PROD, COLUMNA_TIMESTAMP]))
+    textos = []
+    for _, fila in df_pagina.iterrows():
+        partes = [f"{ETIQUETAS_CAMPO.get(col, col)}: {str(fila[col])[:LARGO_MAX_TEXTO]}" for col in COLUMNAS_BUSQUEDA if col in df_pagina.columns and pd.notna(fila[col]) and str(fila[col]).strip()]
+        textos.append(" | ".join(partes))
+    tabla = pd.DataFrame({
+        'Fecha': fechas.dt.strftime('%d/%m/%Y').fillna('N/A'),
+        'Evento': df_pagina[COLUMNA_EVENTO] if COLUMNA_EVENTO in df_pagina.columns else 'N/A',
+        'Máquina': _primera_no_nula(df_pagina, [COLUMNA_MAQUINA_INCID, COLUMNA_MAQUINA_MANT, COLUMNA_MAQUINA_PROD]).fillna('N/A'),
+        'Texto': textos,
+        'Relevancia': np.round(puntajes, 2),
+    }, index=df_pagina.index)
+    if COLUMNA_PLANTA in df_pagina.columns and df_pagina[COLUMNA_PLANTA].nunique() > 1:
+        tabla.insert(1, 'Planta', df_pagina[COLUMNA_PLANTA])
+    return tabla
@@ -1,7 +1,7 @@
 # pages/incidentes.py
 
 import dash
-from dash import dcc, html, Input, Output, callback, State, no_update, ctx  # Importar ctx
+from dash import dcc, html, Input, Output, callback, clientside_callback, ClientsideFunction, State, no_update, ctx  # Importar ctx
 import dash_bootstrap_components as dbc
 import plotly.express as px
 import plotly.graph_objects as go
@@ -10,6 +10,18 @@ from datetime import datetime, timedelta, time, date  # Importar date
 import numpy as np
 import traceback  # Importar traceback para imprimir errores detallados
 
+from datos import obtener_dataset, obtener_textos
+from datos.filtros import filtrar_planta, rango_desde_slider
+from datos.columnas import COLUMNA_PLANTA
+from datos.cortes import corte_columnar, obtener_corte
+from datos.intermedios import incidentes_en_rango
+from datos.maquinas import obtener_tabla_maquinas
+from datos.actividad import obtener_actividad_diaria, filtrar_actividad, actividad_por_maquina
+from datos.confiabilidad import obtener_motor_confiabilidad
+from datos.solapamientos import obtener_tiempo_perdido, filtrar_tiempo_perdido
+from datos.series import NOMBRES_RESOLUCION, serie_temporal, resolucion_para, periodo_ampliado, meta_serie, leer_meta_serie
+from api.exportacion import opciones_formato_exportacion, url_exportacion
+
 # --- Constantes Específicas de Incidentes (Verificar nombres exactos) ---
 CSV_FILE = 'RESPONSES_SIPROSA.csv'  # Usar el archivo CSV como referencia para nombres
 COLUMNA_TIMESTAMP = 'Timestamp'
@@ -40,6 +52,10 @@ VALOR_MANTENIMIENTO = 'Mantenimiento'
 VALOR_SI_MANTENIMIENTO = 'Sí'
 # Valor Común Dropdown
 VALOR_TODAS = 'Todas'
+# Comparación de varias máquinas en el gráfico combinado: un color por máquina y separación vertical
+# entre sus marcadores de eventos (en el eje de eventos, de -0.1 a 1.5)
+COLORES_COMPARACION = px.colors.qualitative.Plotly
+PASO_EVENTOS = 0.04
 
 # --- Registro de la Página ---
 dash.register_page(__name__, path='/incidentes', title='Incidentes y Paradas', name='Incidentes')
@@ -76,6 +92,12 @@ def parse_time_robust(time_str):
         except ValueError:
             return None
 
+def _lista_maquinas(valor):
+    """Valor del dropdown de máquina específica como lista (acepta también una sola máquina)."""
+    if not valor:
+        return []
+    return [valor] if isinstance(valor, str) else list(valor)
+
 # --- Layout Helper ---
 def layout():
     return dbc.Container([
@@ -92,18 +114,38 @@ def layout():
             ])), width=12, md=6, className="mb-3"),
         ], className="align-items-stretch"),
         dbc.Row([
-            dbc.Col(dbc.Card(dbc.Spinner(dcc.Graph(id='incid-grafico-frecuencia', config={'displayModeBar': False}, clear_on_unhover=True))), width=12, md=6, className="mb-3"),
+            dbc.Col(dcc.Dropdown(id='incid-formato-exportacion', options=opciones_formato_exportacion(), value='csv', clearable=False), width=6, md=2),
+            dbc.Col(html.A("Descargar incidentes", id='incid-link-exportacion', href='#', download='', className="btn btn-outline-info btn-sm"), width="auto"),
+        ], className="justify-content-end align-items-center g-2 mb-2"),
+        dbc.Row([
+            dbc.Col(dbc.Card([
+                 dbc.Spinner(dcc.Graph(id='incid-grafico-frecuencia', config={'displayModeBar': False}, clear_on_unhover=True)),
+                 dbc.CardFooter([
+                     html.Span("Clic en una semana o mes para verlo por día; clic en un día para filtrar la tabla.", className="text-muted small"),
+                     dbc.Button("Ver rango completo", id='incid-boton-ver-rango', size="sm", color="secondary", outline=True, className="ms-2"),
+                 ], className="d-flex justify-content-between align-items-center"),
+            ]), width=12, md=6, className="mb-3"),
             dbc.Col(dbc.Card([
                  dbc.CardHeader("Detalle de Incidentes Filtrados"),
-                 dbc.CardBody(dbc.Spinner(html.Div(id='incid-tabla-detalles')), style={'maxHeight': '400px', 'overflowY': 'auto'})
+                 dbc.CardBody(dbc.Spinner(html.Div(id='incid-tabla-detalles')), style={'maxHeight': '400px', 'overflowY': 'auto'}),
+                 dcc.Store(id='incid-store-corte'),  # Incidentes de la planta por columnas: la tabla se filtra en el navegador
+                 dcc.Store(id='incid-store-seleccion'),  # Día o período clickeado en el gráfico de frecuencia
             ]), width=12, md=6, className="mb-3"),
         ], className="align-items-stretch"),
+        dbc.Row(dbc.Col(dbc.Card([
+            dbc.CardHeader("Confiabilidad por Máquina (MTBF / MTTR)"),
+            dbc.CardBody([
+                dbc.Spinner(html.Div(id='incid-tabla-confiabilidad')),
+                html.Div("MTBF: horas promedio entre el fin de una falla y el inicio de la siguiente. MTTR: horas promedio de reparación. "
+                         "Las columnas 'Histórico' usan todas las fallas registradas.", className="text-muted small mt-2"),
+            ]),
+        ]), width=12, className="mb-3")),
         html.Hr(),
         dbc.Row(dbc.Col(html.H2("Análisis por Máquina: Producción vs. Eventos", className="text-center my-4"))),
         dbc.Row([
             dbc.Col(dbc.Card(dbc.CardBody([
-                html.Label('Seleccione Máquina para Análisis Detallado:', className="card-title mb-2"),
-                dcc.Dropdown(id='incid-dropdown-maquina-especifica', clearable=False, placeholder="Cargando...")
+                html.Label('Seleccione una o más Máquinas para Análisis Detallado:', className="card-title mb-2"),
+                dcc.Dropdown(id='incid-dropdown-maquina-especifica', multi=True, clearable=False, placeholder="Cargando...")
             ])), width=12, className="mb-3"),
         ]),
         dbc.Row([
@@ -133,15 +175,9 @@ def inicializar_controles_incidentes(data_json):
     if not data_json:
         default_slider = [0, 1, [0, 1], True]
         default_maq_opts = [{'label': VALOR_TODAS, 'value': VALOR_TODAS}]
-        return default_maq_opts, VALOR_TODAS, [], None, default_slider[0], default_slider[1], default_slider[2], default_slider[3]
+        return default_maq_opts, VALOR_TODAS, [], [], default_slider[0], default_slider[1], default_slider[2], default_slider[3]
     try:
-        df = pd.read_json(data_json, orient='split')
-        date_cols = [COLUMNA_TIMESTAMP, COLUMNA_FECHA_PROD, COLUMNA_FECHA_MANT, COLUMNA_FECHA_INCID]
-        for col in date_cols:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors='coerce')
-        if COLUMNA_CANTIDAD in df.columns:
-            df[COLUMNA_CANTIDAD] = pd.to_numeric(df[COLUMNA_CANTIDAD], errors='coerce')
+        df, version_datos = obtener_dataset()
 
         maq_cols = [COLUMNA_MAQUINA_PROD, COLUMNA_MAQUINA_MANT, COLUMNA_MAQUINA_INCID]
         all_maquinas = set()
@@ -149,9 +185,9 @@ def inicializar_controles_incidentes(data_json):
             if col in df.columns:
                 all_maquinas.update(df[col].dropna().unique())
         lista_maquinas_sorted = sorted(list(all_maquinas))
-        opciones_maquina_general = [{'label': VALOR_TODAS, 'value': VALOR_TODAS}] + [{'label': maq, 'value': maq} for maq in lista_maquinas_sorted]
-        opciones_maquina_especifica = [{'label': maq, 'value': maq} for maq in lista_maquinas_sorted]
-        valor_inicial_maquina_especifica = lista_maquinas_sorted[0] if lista_maquinas_sorted else None
+        opciones_maquina_especifica = obtener_tabla_maquinas(df, version_datos).opciones(lista_maquinas_sorted)  # Etiquetas cortas
+        opciones_maquina_general = [{'label': VALOR_TODAS, 'value': VALOR_TODAS}] + opciones_maquina_especifica
+        valor_inicial_maquina_especifica = lista_maquinas_sorted[:1]
 
         fechas_incidentes = df[COLUMNA_FECHA_INCID].dropna() if COLUMNA_FECHA_INCID in df.columns else pd.Series(dtype='datetime64[ns]')
         if not fechas_incidentes.empty:
@@ -181,218 +217,284 @@ def inicializar_controles_incidentes(data_json):
         traceback.print_exc()
         default_slider = [0, 1, [0, 1], True]
         default_maq_opts = [{'label': VALOR_TODAS, 'value': VALOR_TODAS}]
-        return default_maq_opts, VALOR_TODAS, [], None, default_slider[0], default_slider[1], default_slider[2], default_slider[3]
-
-# Callback para actualizar gráficos y tabla general de incidentes
+        return default_maq_opts, VALOR_TODAS, [], [], default_slider[0], default_slider[1], default_slider[2], default_slider[3]
+
+# Columnas del detalle de incidentes (columna del dataset -> encabezado de la tabla)
+COLUMNAS_TABLA_DETALLE = {
+    COLUMNA_FECHA_INCID: 'Fecha', COLUMNA_MAQUINA_INCID: 'Máquina',
+    COLUMNA_DESC_INCID: 'Descripción', 'Duración (min)': 'Duración (min)',
+    COLUMNA_ACCIONES_INCID: 'Acciones Correctivas'
+}
+
+def _corte_incidentes(df, planta_seleccionada):
+    """Incidentes de la planta (ordenados por fecha, como la tabla de detalle) como corte por columnas."""
+    df_original = filtrar_planta(df, planta_seleccionada)
+    df_incidentes = obtener_textos().completar(df_original[df_original[COLUMNA_FECHA_INCID].notna()], [COLUMNA_DESC_INCID, COLUMNA_ACCIONES_INCID])
+    if COLUMNA_HORA_INI_INCID in df_incidentes.columns and COLUMNA_HORA_FIN_INCID in df_incidentes.columns:
+        duraciones = [calcular_duracion(ini, fin, fecha) for ini, fin, fecha in
+                      zip(df_incidentes[COLUMNA_HORA_INI_INCID], df_incidentes[COLUMNA_HORA_FIN_INCID], df_incidentes[COLUMNA_FECHA_INCID])]
+        df_incidentes['Duración (min)'] = [f"{int(x)}" if pd.notna(x) else "N/A" for x in duraciones]
+    df_incidentes['_fecha_texto'] = df_incidentes[COLUMNA_FECHA_INCID].dt.strftime('%d/%m/%Y')
+    df_incidentes = df_incidentes.sort_values(by='_fecha_texto', kind='stable')
+    columnas, categoricas = {}, {}
+    for columna, titulo in COLUMNAS_TABLA_DETALLE.items():
+        if columna == COLUMNA_FECHA_INCID:
+            columnas[titulo] = df_incidentes['_fecha_texto']
+        elif columna == COLUMNA_MAQUINA_INCID and columna in df_incidentes.columns:
+            categoricas[titulo] = df_incidentes[columna]  # Filtro por máquina en el navegador
+        elif columna in df_incidentes.columns:
+            columnas[titulo] = df_incidentes[columna]
+    orden = [titulo for titulo in COLUMNAS_TABLA_DETALLE.values() if titulo in columnas or titulo in categoricas]
+    return corte_columnar(df_incidentes, df_incidentes[COLUMNA_FECHA_INCID], columnas, categoricas, orden)
+
+# Callback para enviar al navegador los incidentes de la planta (solo cuando cambia la planta o el dataset)
 @callback(
-    Output('incid-grafico-frecuencia', 'figure'),
+    Output('incid-store-corte', 'data'),
+    Input('filtro-planta', 'value'),
+    Input('store-main-data', 'data')
+)
+def actualizar_corte_incidentes(planta_seleccionada, data_json):
+    if not data_json:
+        return None
+    try:
+        df, version_datos = obtener_dataset()  # La versión actual (el store solo dispara): el corte sigue a las recargas
+        if COLUMNA_FECHA_INCID not in df.columns:
+            print(f"Error: Falta columna '{COLUMNA_FECHA_INCID}' en actualizar_corte_incidentes")
+            return None
+        return obtener_corte('incidentes', version_datos, planta_seleccionada, lambda: _corte_incidentes(df, planta_seleccionada))
+    except Exception as e:
+        print(f"!!!!!! ERROR armando el corte de incidentes: {e}")
+        traceback.print_exc()
+        return None
+
+# Tabla de detalle y texto del rango: se filtran en el navegador sobre el corte (assets/cortes.js)
+clientside_callback(
+    ClientsideFunction(namespace='cortes', function_name='incidentes'),
     Output('incid-tabla-detalles', 'children'),
     Output('incid-output-fechas', 'children'),
     Input('incid-slider-fechas', 'value'),
     Input('incid-dropdown-maquina-general', 'value'),
+    Input('incid-store-seleccion', 'data'),
+    Input('incid-store-corte', 'data'),
+)
+
+# Callback para actualizar el gráfico de frecuencia (y la selección del clic para la tabla)
+@callback(
+    Output('incid-grafico-frecuencia', 'figure'),
+    Output('incid-store-seleccion', 'data'),
+    Input('incid-slider-fechas', 'value'),
+    Input('incid-dropdown-maquina-general', 'value'),
     Input('incid-grafico-frecuencia', 'clickData'),
-    State('store-main-data', 'data')
+    Input('filtro-planta', 'value'),
+    Input('incid-boton-ver-rango', 'n_clicks'),
+    State('store-main-data', 'data'),
+    State('incid-grafico-frecuencia', 'figure')
 )
-def update_incidentes_generales(rango_fechas_slider, maquina_seleccionada, clickData, data_json):
+def update_incidentes_generales(rango_fechas_slider, maquina_seleccionada, clickData, planta_seleccionada, n_clicks_rango, data_json, figura_actual):
     trigger_id = ctx.triggered_id if ctx.triggered else 'N/A'
     print(f"\n--- update_incidentes_generales triggered by: {trigger_id} ---")
 
     if not data_json or rango_fechas_slider is None:
-        return px.bar(title="Esperando datos..."), html.Div("Cargando..."), "..."
+        return px.bar(title="Esperando datos..."), None
     try:
-        df_original = pd.read_json(data_json, orient='split')
-        date_cols = [COLUMNA_TIMESTAMP, COLUMNA_FECHA_PROD, COLUMNA_FECHA_MANT, COLUMNA_FECHA_INCID]
-        for col in date_cols:
-            if col in df_original.columns:
-                df_original[col] = pd.to_datetime(df_original[col], errors='coerce')
-        if COLUMNA_FECHA_INCID not in df_original.columns:
-             return px.bar(title=f"Error: Falta columna '{COLUMNA_FECHA_INCID}'"), html.Div(f"Error: Falta columna '{COLUMNA_FECHA_INCID}'"), "Error"
-        df_incidentes = df_original[df_original[COLUMNA_FECHA_INCID].notna()].copy()
+        df_completo, version_datos = obtener_dataset()
+        if COLUMNA_FECHA_INCID not in df_completo.columns:
+             return px.bar(title=f"Error: Falta columna '{COLUMNA_FECHA_INCID}'"), None
     except Exception as e:
-        print(f"!!!!!! ERROR leyendo/parseando datos del store en update_incidentes_generales: {e}")
+        print(f"!!!!!! ERROR leyendo datos en update_incidentes_generales: {e}")
         traceback.print_exc()
-        return px.bar(title="Error al cargar datos"), html.Div("Error al cargar datos."), "Error"
+        return px.bar(title="Error al cargar datos"), None
 
-    df_filtrado_base = pd.DataFrame(columns=df_incidentes.columns)
-    texto_fechas_slider = "..."
     try:
         fecha_inicio_dt = pd.Timestamp.fromordinal(rango_fechas_slider[0])
         fecha_fin_dt = pd.Timestamp.fromordinal(rango_fechas_slider[1])
-        texto_fechas_slider = f"{fecha_inicio_dt.strftime('%d/%m/%y')} - {fecha_fin_dt.strftime('%d/%m/%y')}"
-        df_filtrado_base = df_incidentes[
-            (df_incidentes[COLUMNA_FECHA_INCID] >= fecha_inicio_dt) &
-            (df_incidentes[COLUMNA_FECHA_INCID] <= fecha_fin_dt)
-        ].copy()
+        # Incidentes de la planta en el rango: compartidos con el gráfico combinado (mismo slider)
+        df_filtrado_base = df_completo.iloc[incidentes_en_rango(df_completo, version_datos, None, fecha_inicio_dt, fecha_fin_dt, planta_seleccionada)]
         if maquina_seleccionada and maquina_seleccionada != VALOR_TODAS:
              if COLUMNA_MAQUINA_INCID in df_filtrado_base.columns:
-                  df_filtrado_base = df_filtrado_base[df_filtrado_base[COLUMNA_MAQUINA_INCID] == maquina_seleccionada].copy()
+                  df_filtrado_base = df_filtrado_base[df_filtrado_base[COLUMNA_MAQUINA_INCID] == maquina_seleccionada]
              else:
-                  df_filtrado_base = pd.DataFrame(columns=df_incidentes.columns)
+                  df_filtrado_base = df_filtrado_base.iloc[:0]
     except Exception as e:
         print(f"!!!!!! ERROR durante el filtrado base: {e}")
         traceback.print_exc()
-        return px.bar(title="Error en filtros"), html.Div("Error al aplicar filtros."), "Error"
+        return px.bar(title="Error en filtros"), None
 
-    fig_frecuencia = px.bar(title="No hay incidentes en el período/máquina seleccionada")
-    fig_frecuencia.update_layout(height=400, paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
-    if not df_filtrado_base.empty:
-        incidentes_por_dia = df_filtrado_base.groupby(df_filtrado_base[COLUMNA_FECHA_INCID].dt.date).size().reset_index(name='Cantidad Incidentes')
-        incidentes_por_dia.rename(columns={COLUMNA_FECHA_INCID: 'Fecha'}, inplace=True)
-        incidentes_por_dia = incidentes_por_dia.sort_values(by='Fecha')
-        fig_frecuencia = px.bar(incidentes_por_dia, x='Fecha', y='Cantidad Incidentes',
-                                title="Frecuencia de Incidentes por Día",
-                                labels={'Fecha': 'Fecha', 'Cantidad Incidentes': 'Nº Incidentes'})
-        fig_frecuencia.update_layout(height=400, title_x=0.5, paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
-        fig_frecuencia.update_traces(marker_color='#FF6347')
-
-    df_para_tabla = df_filtrado_base.copy()
-    clicked_date = None
+    # Selección para la tabla (ordinales de día, ambos incluidos): el día clickeado o el período ampliado
+    seleccion = None
 
+    # Período del gráfico: el rango del slider, o el período ampliado con un clic (se conserva en la figura)
+    periodo_grafico = (fecha_inicio_dt, fecha_fin_dt, None)
     if trigger_id == 'incid-grafico-frecuencia' and clickData:
         try:
-            clicked_date_str = clickData['points'][0]['x']
-            clicked_date = datetime.strptime(clicked_date_str, '%Y-%m-%d').date()
-            print(f"   Click detectado en gráfico. Fecha clickeada: {clicked_date}")
-            df_para_tabla = df_filtrado_base[df_filtrado_base[COLUMNA_FECHA_INCID].dt.date == clicked_date].copy()
-            print(f"   df_para_tabla (después de click) shape: {df_para_tabla.shape}")
+            periodo_grafico = leer_meta_serie(figura_actual) or periodo_grafico
+            fecha_click = pd.Timestamp(clickData['points'][0]['x']).normalize()
+            periodo_clickeado = periodo_ampliado(fecha_click, periodo_grafico[2] or resolucion_para(fecha_inicio_dt, fecha_fin_dt), periodo_grafico[0], periodo_grafico[1])
+            if periodo_clickeado:
+                print(f"   Click en el período {periodo_clickeado[0].date()} - {periodo_clickeado[1].date()}: se amplía.")
+                periodo_grafico = (periodo_clickeado[0], periodo_clickeado[1], None)
+                seleccion = {'inicio': periodo_clickeado[0].toordinal(), 'fin': periodo_clickeado[1].toordinal()}
+            else:
+                print(f"   Click detectado en gráfico. Fecha clickeada: {fecha_click.date()}")
+                seleccion = {'inicio': fecha_click.toordinal(), 'fin': fecha_click.toordinal()}
         except (KeyError, IndexError, ValueError, TypeError) as e:
             print(f"   WARN: No se pudo extraer la fecha del clickData: {e}. Mostrando tabla sin filtro de click.")
 
-    # Separar la parte condicional de la f-string
-    date_str = f" para la fecha {clicked_date.strftime('%d/%m/%Y')}" if clicked_date else ""
-    tabla_html = html.Div(f"No hay detalles de incidentes para mostrar{date_str}.")
-    if not df_para_tabla.empty:
-        if COLUMNA_HORA_INI_INCID in df_para_tabla.columns and COLUMNA_HORA_FIN_INCID in df_para_tabla.columns:
-            df_para_tabla['Duración (min)'] = df_para_tabla.apply(
-                lambda row: calcular_duracion(row.get(COLUMNA_HORA_INI_INCID), row.get(COLUMNA_HORA_FIN_INCID), row.get(COLUMNA_FECHA_INCID)),
-                axis=1
-            )
-            df_para_tabla['Duración (min)'] = df_para_tabla['Duración (min)'].apply(lambda x: f"{int(x)}" if pd.notna(x) else "N/A")
-        columnas_tabla = {
-            COLUMNA_FECHA_INCID: 'Fecha', COLUMNA_MAQUINA_INCID: 'Máquina',
-            COLUMNA_DESC_INCID: 'Descripción', 'Duración (min)': 'Duración (min)',
-            COLUMNA_ACCIONES_INCID: 'Acciones Correctivas'
-        }
-        columnas_existentes = {k: v for k, v in columnas_tabla.items() if k in df_para_tabla.columns}
-        df_display = df_para_tabla[list(columnas_existentes.keys())].copy()
-        df_display.rename(columns=columnas_existentes, inplace=True)
-        if 'Fecha' in df_display.columns:
-             df_display['Fecha'] = pd.to_datetime(df_display['Fecha']).dt.strftime('%d/%m/%Y')
-        try:
-            df_display = df_display.sort_values(by='Fecha')
-        except Exception as e_sort:
-                 print(f"WARN: Error al ordenar tabla: {e_sort}")
+    fig_frecuencia = px.bar(title="No hay incidentes en el período/máquina seleccionada")
+    fig_frecuencia.update_layout(height=400, paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
+    if not df_filtrado_base.empty:
+        # Día, semana o mes según el largo del período (series precalculadas por versión del dataset)
+        maquinas_serie = None if maquina_seleccionada in (None, VALOR_TODAS) else [maquina_seleccionada]
+        incidentes_por_periodo, resolucion = serie_temporal(df_completo, version_datos, 'incidentes', periodo_grafico[0], periodo_grafico[1],
+                                                             resolucion=periodo_grafico[2], maquinas=maquinas_serie, planta=planta_seleccionada)
+        incidentes_por_periodo = pd.DataFrame({'Fecha': incidentes_por_periodo['fecha'].dt.date, 'Cantidad Incidentes': incidentes_por_periodo['valor']})
+        fig_frecuencia = px.bar(incidentes_por_periodo, x='Fecha', y='Cantidad Incidentes',
+                                title=f"Frecuencia de Incidentes por {NOMBRES_RESOLUCION[resolucion]}",
+                                labels={'Fecha': 'Fecha', 'Cantidad Incidentes': 'Nº Incidentes'})
+        fig_frecuencia.update_layout(height=400, title_x=0.5, paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
+                                     meta=meta_serie(periodo_grafico[0], periodo_grafico[1], resolucion))
+        fig_frecuencia.update_traces(marker_color='#FF6347')
 
-        tabla_html = dbc.Table.from_dataframe(df_display, striped=True, bordered=True, hover=True, responsive=True, class_name="align-middle small")
+    return fig_frecuencia, seleccion
 
-    return fig_frecuencia, tabla_html, texto_fechas_slider
+def _formato_horas(serie):
+    return serie.map(lambda x: f"{x:.1f}" if pd.notna(x) else "N/A")
+
+# Callback para la tabla de confiabilidad (MTBF / MTTR) del rango y máquina seleccionados
+@callback(
+    Output('incid-tabla-confiabilidad', 'children'),
+    Input('incid-slider-fechas', 'value'),
+    Input('incid-dropdown-maquina-general', 'value'),
+    Input('filtro-planta', 'value'),
+    State('store-main-data', 'data')
+)
+def update_confiabilidad(rango_fechas_slider, maquina_seleccionada, planta_seleccionada, data_json):
+    if not data_json or rango_fechas_slider is None:
+        return html.Div("Cargando...")
+    try:
+        df, version_datos = obtener_dataset()
+        motor = obtener_motor_confiabilidad(df, version_datos)
+        fecha_inicio_dt, fecha_fin_dt = rango_desde_slider(rango_fechas_slider)
+        rango = motor.resumen_rango(fecha_inicio_dt, fecha_fin_dt, maquina_seleccionada, planta_seleccionada)
+        if rango.empty:
+            return html.Div("No hay fallas con horario completo en el período/máquina seleccionada.")
+        historico = motor.resumen_acumulado(planta_seleccionada)
+        rango = rango.merge(historico[[COLUMNA_PLANTA, 'maquina', 'mttr_horas', 'mtbf_horas']], on=[COLUMNA_PLANTA, 'maquina'],
+                            how='left', suffixes=('', '_historico'))
+        tabla = pd.DataFrame({
+            'Máquina': obtener_tabla_maquinas(df, version_datos).etiquetas(rango['maquina']),
+            'Fallas': rango['fallas'],
+            'Horas Reparación': _formato_horas(rango['horas_reparacion']),
+            'MTTR (h)': _formato_horas(rango['mttr_horas']),
+            'MTBF (h)': _formato_horas(rango['mtbf_horas']),
+            'MTTR Histórico (h)': _formato_horas(rango['mttr_horas_historico']),
+            'MTBF Histórico (h)': _formato_horas(rango['mtbf_horas_historico']),
+        })
+        if rango[COLUMNA_PLANTA].nunique() > 1:
+            tabla.insert(0, 'Planta', rango[COLUMNA_PLANTA])
+        return dbc.Table.from_dataframe(tabla, striped=True, bordered=True, hover=True, responsive=True, class_name="align-middle small")
+    except Exception as e:
+        print(f"!!!!!! ERROR en update_confiabilidad: {e}")
+        traceback.print_exc()
+        return html.Div("Error al calcular la confiabilidad.")
 
-# Callback para actualizar el gráfico combinado por máquina
+# Callback para actualizar el gráfico combinado por máquina (una o varias: con varias se superponen las series)
 @callback(
     Output('incid-grafico-combinado', 'figure'),
     Input('incid-slider-fechas', 'value'),
     Input('incid-dropdown-maquina-especifica', 'value'),
+    Input('filtro-planta', 'value'),
     State('store-main-data', 'data')
 )
-def update_grafico_combinado_maquina(rango_fechas_slider, maquina_seleccionada, data_json):
-    if not data_json or not maquina_seleccionada or rango_fechas_slider is None:
+def update_grafico_combinado_maquina(rango_fechas_slider, maquinas_seleccionadas, planta_seleccionada, data_json):
+    maquinas_seleccionadas = _lista_maquinas(maquinas_seleccionadas)
+    if not data_json or not maquinas_seleccionadas or rango_fechas_slider is None:
         fig = go.Figure()
         fig.update_layout(title="Seleccione una máquina y rango de fechas", title_x=0.5, paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
         return fig
     try:
-        df_original = pd.read_json(data_json, orient='split')
-        date_cols = [COLUMNA_TIMESTAMP, COLUMNA_FECHA_PROD, COLUMNA_FECHA_MANT, COLUMNA_FECHA_INCID]
-        for col in date_cols:
-            if col in df_original.columns:
-                df_original[col] = pd.to_datetime(df_original[col], errors='coerce')
-        if COLUMNA_CANTIDAD in df_original.columns:
-            df_original[COLUMNA_CANTIDAD] = pd.to_numeric(df_original[COLUMNA_CANTIDAD], errors='coerce')
+        df_completo, version_datos = obtener_dataset()
+        tabla_maquinas = obtener_tabla_maquinas(df_completo, version_datos)
 
         fecha_inicio_dt = pd.Timestamp.fromordinal(rango_fechas_slider[0])
         fecha_fin_dt = pd.Timestamp.fromordinal(rango_fechas_slider[1])
         rango_completo_fechas = pd.date_range(start=fecha_inicio_dt, end=fecha_fin_dt, freq='D')
 
-        # --- 1. Datos de Producción ---
-        df_prod = pd.DataFrame()
-        prod_cols_req = [COLUMNA_EVENTO, COLUMNA_HUBO_PRODUCCION, COLUMNA_MAQUINA_PROD, COLUMNA_FECHA_PROD, COLUMNA_CANTIDAD, COLUMNA_UNIDAD]
-        if all(col in df_original.columns for col in prod_cols_req):
-            df_prod = df_original[
-                (df_original[COLUMNA_EVENTO] == VALOR_PRODUCCION) &
-                (df_original[COLUMNA_HUBO_PRODUCCION] == VALOR_SI_PRODUCCION) &
-                (df_original[COLUMNA_MAQUINA_PROD] == maquina_seleccionada) &
-                (df_original[COLUMNA_FECHA_PROD].notna()) &
-                (df_original[COLUMNA_CANTIDAD].notna()) &
-                (df_original[COLUMNA_FECHA_PROD] >= fecha_inicio_dt) &
-                (df_original[COLUMNA_FECHA_PROD] <= fecha_fin_dt)
-            ].copy()
-
-        produccion_diaria = pd.DataFrame({'Fecha': rango_completo_fechas, 'Produccion': 0.0})
-        if not df_prod.empty:
-             df_prod[COLUMNA_CANTIDAD] = pd.to_numeric(df_prod[COLUMNA_CANTIDAD], errors='coerce')
-             df_prod.dropna(subset=[COLUMNA_CANTIDAD], inplace=True)
-             if not df_prod.empty:
-                 prod_agrupada = df_prod.groupby(df_prod[COLUMNA_FECHA_PROD].dt.normalize())[COLUMNA_CANTIDAD].sum().reset_index()
-                 prod_agrupada.rename(columns={COLUMNA_FECHA_PROD: 'Fecha', COLUMNA_CANTIDAD: 'Produccion'}, inplace=True)
-                 produccion_diaria = pd.merge(produccion_diaria[['Fecha']], prod_agrupada, on='Fecha', how='left').fillna(0.0)
-        unidad_prod = df_prod[COLUMNA_UNIDAD].iloc[0] if not df_prod.empty and not df_prod[COLUMNA_UNIDAD].dropna().empty else "Unidades"
-
-        # --- 2. Datos de Incidentes ---
-        df_incid = pd.DataFrame()
-        incid_cols_req = [COLUMNA_FECHA_INCID, COLUMNA_MAQUINA_INCID]
-        if all(col in df_original.columns for col in incid_cols_req):
-             df_incid = df_original[
-                  (df_original[COLUMNA_FECHA_INCID].notna()) &
-                  (df_original[COLUMNA_MAQUINA_INCID] == maquina_seleccionada) &
-                  (df_original[COLUMNA_FECHA_INCID] >= fecha_inicio_dt) &
-                  (df_original[COLUMNA_FECHA_INCID] <= fecha_fin_dt)
-             ].copy()
-        fechas_con_incidentes = df_incid[COLUMNA_FECHA_INCID].dt.normalize().unique() if not df_incid.empty else []
-
-        # --- 3. Datos de Mantenimiento ---
-        df_mant = pd.DataFrame()
-        mant_cols_req = [COLUMNA_EVENTO, COLUMNA_REALIZO_MANTENIMIENTO, COLUMNA_MAQUINA_MANT, COLUMNA_FECHA_MANT]
-        if all(col in df_original.columns for col in mant_cols_req):
-            df_mant = df_original[
-                (df_original[COLUMNA_EVENTO] == VALOR_MANTENIMIENTO) &
-                (df_original[COLUMNA_REALIZO_MANTENIMIENTO] == VALOR_SI_MANTENIMIENTO) &
-                (df_original[COLUMNA_MAQUINA_MANT] == maquina_seleccionada) &
-                (df_original[COLUMNA_FECHA_MANT].notna()) &
-                (df_original[COLUMNA_FECHA_MANT] >= fecha_inicio_dt) &
-                (df_original[COLUMNA_FECHA_MANT] <= fecha_fin_dt)
-            ].copy()
-        fechas_con_mantenimiento = df_mant[COLUMNA_FECHA_MANT].dt.normalize().unique() if not df_mant.empty else []
+        # --- 1-3. Producción, incidentes y mantenimientos por máquina y día (un solo recorte del cubo diario) ---
+        actividad = filtrar_actividad(obtener_actividad_diaria(df_completo, version_datos),
+                                      fecha_inicio_dt, fecha_fin_dt, maquinas_seleccionadas, planta_seleccionada)
+        por_maquina = actividad_por_maquina(actividad, rango_completo_fechas)
+
+        # --- 4. Minutos de producción perdidos (eventos superpuestos con corridas de producción) ---
+        tiempo_perdido = filtrar_tiempo_perdido(obtener_tiempo_perdido(df_completo, version_datos),
+                                                fecha_inicio_dt, fecha_fin_dt, maquinas_seleccionadas, planta_seleccionada)
+        minutos_perdidos = tiempo_perdido.groupby(['maquina', 'fecha'])['minutos_perdidos'].sum()
 
         # --- Creación del Gráfico ---
+        varias = len(maquinas_seleccionadas) > 1
+        sin_actividad = pd.DataFrame({columna: 0 for columna in ['produccion', 'incidentes', 'mantenimientos']}, index=rango_completo_fechas)
+        unidades = {por_maquina.get(maquina, (None,))[0] or "Unidades" for maquina in maquinas_seleccionadas}
+        unidad_prod = unidades.pop() if len(unidades) == 1 else None  # Eje con unidad solo si todas coinciden
         fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=produccion_diaria['Fecha'], y=produccion_diaria['Produccion'],
-            mode='lines+markers', name=f'Producción ({unidad_prod})',
-            line=dict(color='green', width=2), marker=dict(size=5), yaxis='y1'
-        ))
-        incid_y_val = 1
-        fechas_incidentes_plot = [fecha for fecha in fechas_con_incidentes if fecha in produccion_diaria['Fecha'].values]
-        if fechas_incidentes_plot:
-             fig.add_trace(go.Scatter(
-                  x=fechas_incidentes_plot, y=[incid_y_val] * len(fechas_incidentes_plot),
-                  mode='markers', name='Incidentes',
-                  marker=dict(color='red', size=10, symbol='x'), yaxis='y2'
-             ))
-        maint_y_val = 0.5
-        fechas_mantenimiento_plot = [fecha for fecha in fechas_con_mantenimiento if fecha in produccion_diaria['Fecha'].values]
-        if fechas_mantenimiento_plot:
-             fig.add_trace(go.Scatter(
-                  x=fechas_mantenimiento_plot, y=[maint_y_val] * len(fechas_mantenimiento_plot),
-                  mode='markers', name='Mantenimiento',
-                  marker=dict(color='orange', size=10, symbol='triangle-up'), yaxis='y2'
-             ))
-
+        hay_minutos_perdidos = False
+        for i, maquina in enumerate(maquinas_seleccionadas):
+            unidad, diario = por_maquina.get(maquina, (None, sin_actividad))
+            unidad = unidad or "Unidades"
+            etiqueta = tabla_maquinas.etiqueta(maquina)
+            color = COLORES_COMPARACION[i % len(COLORES_COMPARACION)] if varias else None
+            # Con varias máquinas los marcadores de eventos se escalonan para no taparse en el mismo día
+            desplazamiento = (i - (len(maquinas_seleccionadas) - 1) / 2) * PASO_EVENTOS if varias else 0
+
+            fig.add_trace(go.Scatter(
+                x=diario.index, y=diario['produccion'].astype(float),
+                mode='lines+markers', name=f'{etiqueta} – Producción ({unidad})' if varias else f'Producción ({unidad})',
+                line=dict(color=color or 'green', width=2), marker=dict(size=5), yaxis='y1',
+                legendgroup=maquina, customdata=[maquina] * len(diario)
+            ))
+            fechas_incidentes_plot = diario.index[diario['incidentes'].to_numpy() > 0]
+            if len(fechas_incidentes_plot):
+                 fig.add_trace(go.Scatter(
+                      x=list(fechas_incidentes_plot), y=[1 + desplazamiento] * len(fechas_incidentes_plot),
+                      mode='markers', name=f'{etiqueta} – Incidentes' if varias else 'Incidentes',
+                      marker=dict(color=color or 'red', size=10, symbol='x'), yaxis='y2',
+                      legendgroup=maquina, customdata=[maquina] * len(fechas_incidentes_plot)
+                 ))
+            fechas_mantenimiento_plot = diario.index[diario['mantenimientos'].to_numpy() > 0]
+            if len(fechas_mantenimiento_plot):
+                 fig.add_trace(go.Scatter(
+                      x=list(fechas_mantenimiento_plot), y=[0.5 + desplazamiento] * len(fechas_mantenimiento_plot),
+                      mode='markers', name=f'{etiqueta} – Mantenimiento' if varias else 'Mantenimiento',
+                      marker=dict(color=color or 'orange', size=10, symbol='triangle-up'), yaxis='y2',
+                      legendgroup=maquina, customdata=[maquina] * len(fechas_mantenimiento_plot)
+                 ))
+            if maquina in minutos_perdidos.index.get_level_values('maquina'):
+                 minutos_diarios = minutos_perdidos.xs(maquina, level='maquina')
+                 hay_minutos_perdidos = True
+                 fig.add_trace(go.Bar(
+                      x=minutos_diarios.index, y=minutos_diarios.values,
+                      name=f'{etiqueta} – Min. perdidos' if varias else 'Minutos de producción perdidos',
+                      marker_color=color or 'rgba(255, 99, 71, 0.35)', opacity=0.35 if varias else None, yaxis='y3',
+                      legendgroup=maquina, customdata=[maquina] * len(minutos_diarios)
+                 ))
+
+        if hay_minutos_perdidos:
+             fig.update_layout(
+                  xaxis_domain=[0, 0.92],
+                  yaxis3=dict(title=dict(text="Min. perdidos", font=dict(color="tomato")), tickfont=dict(color="tomato"),
+                              overlaying='y', side='right', anchor='free', position=1.0, rangemode='tozero', showgrid=False)
+             )
+             if varias:
+                  fig.update_layout(barmode='stack')
+
+        titulo_maquinas = (f"Máquina: {tabla_maquinas.etiqueta(maquinas_seleccionadas[0])}" if not varias
+                           else f"{len(maquinas_seleccionadas)} Máquinas")
         fig.update_layout(
-            title=f"Producción vs. Eventos - Máquina: {maquina_seleccionada}",
+            title=f"Producción vs. Eventos - {titulo_maquinas}",
             title_x=0.5,
             xaxis_title="Fecha",
             yaxis=dict(
-                title=dict(text=f"Producción ({unidad_prod})", font=dict(color="green")),
-                tickfont=dict(color="green"),
+                title=dict(text=f"Producción ({unidad_prod})" if unidad_prod else "Producción", font=dict(color="green" if not varias else None)),
+                tickfont=dict(color="green" if not varias else None),
                 side='left',
                 rangemode='tozero'
             ),
@@ -407,7 +509,7 @@ def update_grafico_combinado_maquina(rango_fechas_slider, maquina_seleccionada,
             ),
             legend_title_text='Leyenda',
             legend=dict(yanchor="top", y=0.99, xanchor="left", x=0.01),
-            height=500,
+            height=500 if not varias else 600,
             hovermode='x unified',
             paper_bgcolor='rgba(0,0,0,0)',
             plot_bgcolor='rgba(0,0,0,0)',
@@ -421,7 +523,7 @@ def update_grafico_combinado_maquina(rango_fechas_slider, maquina_seleccionada,
         print(f"!!!!!! ERROR generando gráfico combinado: {e}")
         traceback.print_exc()
         fig = go.Figure()
-        fig.update_layout(title=f"Error al generar gráfico para {maquina_seleccionada}", title_x=0.5, paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
+        fig.update_layout(title=f"Error al generar gráfico para {', '.join(maquinas_seleccionadas)}", title_x=0.5, paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
         return fig
 
 # Callback para mostrar el resumen diario en el modal
@@ -431,25 +533,25 @@ def update_grafico_combinado_maquina(rango_fechas_slider, maquina_seleccionada,
     Output('incid-modal-contenido', 'children'),
     Input('incid-grafico-combinado', 'clickData'),
     State('incid-dropdown-maquina-especifica', 'value'),
+    State('filtro-planta', 'value'),
     State('store-main-data', 'data'),
     prevent_initial_call=True
 )
-def mostrar_resumen_diario_modal(clickData, maquina_seleccionada, data_json):
-    if clickData is None or not maquina_seleccionada or not data_json:
+def mostrar_resumen_diario_modal(clickData, maquinas_seleccionadas, planta_seleccionada, data_json):
+    maquinas_seleccionadas = _lista_maquinas(maquinas_seleccionadas)
+    if clickData is None or not maquinas_seleccionadas or not data_json:
         raise dash.exceptions.PreventUpdate
+    # Máquina del punto clickeado (customdata de cada serie); si no viene, la primera seleccionada
+    maquina_seleccionada = clickData['points'][0].get('customdata') or maquinas_seleccionadas[0]
     try:
         fecha_click_str = clickData['points'][0]['x']
         fecha_click = pd.to_datetime(fecha_click_str).normalize()
-        df_original = pd.read_json(data_json, orient='split')
-        date_cols = [COLUMNA_TIMESTAMP, COLUMNA_FECHA_PROD, COLUMNA_FECHA_MANT, COLUMNA_FECHA_INCID]
-        for col in date_cols:
-            if col in df_original.columns:
-                df_original[col] = pd.to_datetime(df_original[col], errors='coerce')
-        if COLUMNA_CANTIDAD in df_original.columns:
-            df_original[COLUMNA_CANTIDAD] = pd.to_numeric(df_original[COLUMNA_CANTIDAD], errors='coerce')
+        df_completo, version_datos = obtener_dataset()
+        df_original = filtrar_planta(df_completo, planta_seleccionada)
+        textos = obtener_textos()
 
         resumen_elementos = []
-        modal_titulo = f"Resumen del {fecha_click.strftime('%d/%m/%Y')} - Máquina: {maquina_seleccionada}"
+        modal_titulo = f"Resumen del {fecha_click.strftime('%d/%m/%Y')} - Máquina: {obtener_tabla_maquinas(df_completo, version_datos).etiqueta(maquina_seleccionada)}"
 
         # 1. Producción del día
         df_prod_dia = pd.DataFrame()
@@ -473,13 +575,14 @@ def mostrar_resumen_diario_modal(clickData, maquina_seleccionada, data_json):
 
         # 2. Incidentes del día
         df_incid_dia = pd.DataFrame()
-        incid_cols_req_modal = [COLUMNA_FECHA_INCID, COLUMNA_MAQUINA_INCID, COLUMNA_HORA_INI_INCID, COLUMNA_HORA_FIN_INCID, COLUMNA_DESC_INCID, COLUMNA_ACCIONES_INCID]
+        incid_cols_req_modal = [COLUMNA_FECHA_INCID, COLUMNA_MAQUINA_INCID, COLUMNA_HORA_INI_INCID, COLUMNA_HORA_FIN_INCID]
         if all(col in df_original.columns for col in incid_cols_req_modal):
              df_incid_dia = df_original[
                 (df_original[COLUMNA_FECHA_INCID].notna()) &
                 (df_original[COLUMNA_MAQUINA_INCID] == maquina_seleccionada) &
                 (df_original[COLUMNA_FECHA_INCID].dt.normalize() == fecha_click)
              ]
+             df_incid_dia = textos.completar(df_incid_dia, [COLUMNA_DESC_INCID, COLUMNA_ACCIONES_INCID])
         if not df_incid_dia.empty:
             resumen_elementos.append(html.H5("Incidentes/Paradas", className="mt-3"))
             for idx, row in df_incid_dia.iterrows():
@@ -496,7 +599,7 @@ def mostrar_resumen_diario_modal(clickData, maquina_seleccionada, data_json):
 
         # 3. Mantenimientos del día
         df_mant_dia = pd.DataFrame()
-        mant_cols_req_modal = [COLUMNA_EVENTO, COLUMNA_REALIZO_MANTENIMIENTO, COLUMNA_MAQUINA_MANT, COLUMNA_FECHA_MANT, COLUMNA_TIPO_MANT, 'DESCRIPCIÓN DEL MANTENIMIENTO REALIZADO']
+        mant_cols_req_modal = [COLUMNA_EVENTO, COLUMNA_REALIZO_MANTENIMIENTO, COLUMNA_MAQUINA_MANT, COLUMNA_FECHA_MANT, COLUMNA_TIPO_MANT]
         if all(col in df_original.columns for col in mant_cols_req_modal):
              df_mant_dia = df_original[
                 (df_original[COLUMNA_EVENTO] == VALOR_MANTENIMIENTO) &
@@ -505,6 +608,7 @@ def mostrar_resumen_diario_modal(clickData, maquina_seleccionada, data_json):
                 (df_original[COLUMNA_FECHA_MANT].notna()) &
                 (df_original[COLUMNA_FECHA_MANT].dt.normalize() == fecha_click)
              ]
+             df_mant_dia = textos.completar(df_mant_dia, ['DESCRIPCIÓN DEL MANTENIMIENTO REALIZADO'])
         if not df_mant_dia.empty:
             resumen_elementos.append(html.H5("Mantenimiento", className="mt-3"))
             for idx, row in df_mant_dia.iterrows():
@@ -524,3 +628,15 @@ def mostrar_resumen_diario_modal(clickData, maquina_seleccionada, data_json):
         modal_titulo = "Error"
         modal_contenido = html.Div(f"No se pudo cargar el resumen para {fecha_click_str}. Error: {e}")
         return True, modal_titulo, modal_contenido
+
+
+# Enlace de descarga con los filtros generales (la descarga la sirve api/exportacion.py en streaming)
+@callback(
+    Output('incid-link-exportacion', 'href'),
+    Input('incid-formato-exportacion', 'value'),
+    Input('incid-dropdown-maquina-general', 'value'),
+    Input('incid-slider-fechas', 'value'),
+    Input('filtro-planta', 'value'),
+)
+def actualizar_link_exportacion_incidentes(formato, maquina_seleccionada, rango_fechas_slider, planta_seleccionada):
+    return url_exportacion('incidentes', formato, rango_fechas_slider, maquina=maquina_seleccionada, planta=planta_seleccionada)
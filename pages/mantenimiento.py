@@ -1,7 +1,7 @@
 # pages/mantenimiento.py
 
 import dash
-from dash import dcc, html, Input, Output, callback, State, no_update
+from dash import dcc, html, Input, Output, callback, State, no_update, ctx
 import dash_bootstrap_components as dbc
 import plotly.express as px
 import plotly.graph_objects as go
@@ -9,13 +9,16 @@ import plotly.io as pio
 import pandas as pd
 from dash.exceptions import PreventUpdate
 from datetime import timedelta
-import re
-import textwrap
 
-# --- Constantes Mantenimiento ---
-# Siempre utiliza el archivo RESPONSES_SIPROSA.csv
-CSV_FILE = 'RESPONSES_SIPROSA.csv'
+from datos import CSV_FILE, obtener_dataset, obtener_textos
+from datos.filtros import rango_desde_slider
+from datos.intermedios import mantenimientos_realizados
+from datos.maquinas import obtener_tabla_maquinas
+from datos.series import serie_temporal, periodo_ampliado, meta_serie, leer_meta_serie
+from datos.segundo_plano import opciones_segundo_plano, resultado_compartido
+from api.exportacion import opciones_formato_exportacion, url_exportacion
 
+# --- Constantes Mantenimiento ---
 COLUMNA_EVENTO = 'TIPO DE EVENTO A REGISTRAR'
 COLUMNA_FECHA_MANT = 'FECHA DEL MANTENIMIENTO'
 COLUMNA_REALIZO_MANT = '¿SE REALIZÓ MANTENIMIENTO?'
@@ -31,22 +34,10 @@ VALOR_MANTENIMIENTO = 'Mantenimiento'
 VALOR_SI = 'Sí'
 VALOR_NO = 'No'
 VALOR_TODAS = 'Todas'
+PERIODICIDAD = {'D': 'Diario', 'W-MON': 'Semanal', 'MS': 'Mensual'}
 
 pio.templates.default = "plotly_dark"
 
-# --- Mapeo para Abreviaturas Específicas ---
-# Clave: Nombre después de quitar el código. Valor: Abreviatura deseada.
-# Añade más mapeos según necesites.
-MAPEO_ABREVIATURAS = {
-    "Equipo de Ósmosis Inversa de Doble Paso": "EQ. OSM. INV.",
-    "Equipo Auxiliar de Refrigeración de la Emblistadora": "EQ. AUX. REFRIG.",
-    "Comprimidora / Tableteadora (Nueva)": "COMP./TAB. (Nueva)",
-    "Comprimidora / Tableteadora (Anterior)": "COMP./TAB. (Ant.)",
-    "Mezcladora en “V”": "MEZCLADORA (V)", # Ejemplo adicional
-    # ... añade más si es necesario
-}
-
-
 # --- Registro de la Página ---
 dash.register_page(__name__, path='/mantenimiento', title='Detalle Mantenimiento', name='Mantenimiento')
 
@@ -79,25 +70,6 @@ def format_duracion(total_horas):
     elif horas > 0: return f"{horas} hr"
     else: return f"{minutos} min"
 
-# --- Función acortar_nombre_maquina ACTUALIZADA ---
-def acortar_nombre_maquina(nombre):
-    """Acorta nombre quitando código y aplicando abreviaturas específicas."""
-    if pd.isna(nombre): return nombre
-    nombre_str = str(nombre).strip()
-    # 1. Quitar código
-    match = re.split(r'\s*–\s*COD|\s*-\s*COD', nombre_str, maxsplit=1)
-    nombre_sin_codigo = match[0].strip() if match else nombre_str
-
-    # 2. Aplicar abreviatura específica si existe
-    return MAPEO_ABREVIATURAS.get(nombre_sin_codigo, nombre_sin_codigo)
-
-# (wrap_text sin cambios)
-def wrap_text(text, width=20):
-    if pd.isna(text): return text
-    wrapped_lines = textwrap.wrap(str(text), width=width, break_long_words=True)
-    return '<br>'.join(wrapped_lines)
-
-
 # --- Layout de la Página (Sin cambios) ---
 def layout():
     return dbc.Container([
@@ -128,14 +100,19 @@ def layout():
         # --- Fila 3: Gráfico Líneas Duración ---
         dbc.Row([
              dbc.Col(dbc.Card(dbc.CardBody([
-                html.H5("Tiempo Total Invertido en Mantenimiento (Diario)", className="card-title text-center"),
-                dbc.Spinner(dcc.Graph(id='mant-grafico-linea-duracion', config={'displayModeBar': False}, style={'height': '350px'}))
+                html.H5("Tiempo Total Invertido en Mantenimiento", id='mant-titulo-linea-duracion', className="card-title text-center"),
+                dbc.Spinner(dcc.Graph(id='mant-grafico-linea-duracion', config={'displayModeBar': False}, style={'height': '350px'})),
+                html.Div("Clic en una semana o mes para verlo por día; clic en un día para volver al rango completo.", className="text-muted small text-center")
             ])), width=12, className="mb-3")
         ]),
         # --- Fila 4: Tabla Detallada ---
         dbc.Row([
             dbc.Col(html.H4("Registros Detallados de Mantenimiento", className="text-center my-4"))
         ]),
+        dbc.Row([
+            dbc.Col(dcc.Dropdown(id='mant-formato-exportacion', options=opciones_formato_exportacion(), value='csv', clearable=False), width=6, md=2),
+            dbc.Col(html.A("Descargar registros", id='mant-link-exportacion', href='#', download='', className="btn btn-outline-info btn-sm"), width="auto"),
+        ], className="justify-content-end align-items-center g-2 mb-2"),
         dbc.Row([
             dbc.Col(dbc.Card(dbc.Spinner(html.Div(id='mant-tabla-detalle'))), width=12)
         ]),
@@ -144,7 +121,7 @@ def layout():
 
 # --- Callbacks ---
 
-# Callback de Inicialización (Sin cambios, ya usa acortar_nombre_maquina para labels)
+# Callback de Inicialización (etiquetas cortas de la tabla de máquinas en el dropdown)
 @callback(
     Output('mant-dropdown-maquina', 'options'),
     Output('mant-dropdown-maquina', 'value'),
@@ -163,9 +140,7 @@ def inicializar_controles_mantenimiento(data_json_trigger):
     default_maq = ([{'label': VALOR_TODAS, 'value': VALOR_TODAS}], VALOR_TODAS)
 
     try:
-        # Siempre utiliza el archivo RESPONSES_SIPROSA.csv
-        df = pd.read_csv(CSV_FILE)
-        df[COLUMNA_FECHA_MANT] = pd.to_datetime(df.get(COLUMNA_FECHA_MANT), errors='coerce')
+        df, version_datos = obtener_dataset()
 
         df_mant = df[
             (df[COLUMNA_EVENTO] == VALOR_MANTENIMIENTO) &
@@ -179,8 +154,8 @@ def inicializar_controles_mantenimiento(data_json_trigger):
             return default_maq[0], default_maq[1], default_slider[0], default_slider[1], default_slider[2], default_slider[3]
 
         lista_maquinas = sorted(df_mant[COLUMNA_MAQUINA_MANT].astype(str).str.strip().unique())
-        # La función acortar_nombre_maquina ya se aplica aquí para las etiquetas del dropdown
-        opciones_maq = [{'label': VALOR_TODAS, 'value': VALOR_TODAS}] + [{'label': acortar_nombre_maquina(maq), 'value': maq} for maq in lista_maquinas]
+        # Etiquetas cortas (sin código, con abreviaturas) de la tabla de máquinas de esta versión
+        opciones_maq = [{'label': VALOR_TODAS, 'value': VALOR_TODAS}] + obtener_tabla_maquinas(df, version_datos).opciones(lista_maquinas)
         valor_maq = VALOR_TODAS
 
         min_fecha = df_mant[COLUMNA_FECHA_MANT].min()
@@ -203,61 +178,48 @@ def inicializar_controles_mantenimiento(data_json_trigger):
         return default_maq[0], default_maq[1], default_slider[0], default_slider[1], default_slider[2], default_slider[3]
 
 
-# Callback Principal (Aplica acortar_nombre_maquina al gráfico y tabla)
+# Callback Principal (etiquetas cortas de la tabla de máquinas en el gráfico y la tabla)
 @callback(
     Output('mant-output-fechas', 'children'),
     Output('mant-kpi-eficiencia', 'children'),
     Output('mant-kpi-eficiencia', 'className'),
     Output('mant-grafico-barras-maquina', 'figure'),
-    Output('mant-grafico-linea-duracion', 'figure'),
     Output('mant-tabla-detalle', 'children'),
     Input('mant-dropdown-maquina', 'value'),
     Input('mant-slider-fechas', 'value'),
+    Input('filtro-planta', 'value'),
+    **opciones_segundo_plano(cancelar=[Input('mant-slider-fechas', 'value')])
 )
-def update_maintenance_page(maquina_seleccionada, rango_fechas_slider):
+def update_maintenance_page(maquina_seleccionada, rango_fechas_slider, planta_seleccionada):
+    # En segundo plano (cancelado si el slider vuelve a moverse); pedidos idénticos en curso comparten el cálculo
+    return resultado_compartido('mantenimiento', (maquina_seleccionada, rango_fechas_slider, planta_seleccionada), lambda: _construir_pagina_mantenimiento(maquina_seleccionada, rango_fechas_slider, planta_seleccionada))
+
+
+def _construir_pagina_mantenimiento(maquina_seleccionada, rango_fechas_slider, planta_seleccionada):
 
     fig_barras_vacia = go.Figure()
     fig_barras_vacia.update_layout(title_text="Sin datos", xaxis=dict(visible=False), yaxis=dict(visible=False), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', height=400)
-    fig_linea_vacia = go.Figure()
-    fig_linea_vacia.update_layout(title_text="Sin datos", xaxis=dict(visible=False), yaxis=dict(visible=False), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', height=350)
     default_kpi_text = "N/A"
     default_kpi_class = "text-center text-muted" # Clase por defecto gris
 
     if not rango_fechas_slider or not maquina_seleccionada:
         print("Esperando selección de máquina y/o fechas de mantenimiento.")
-        return "Seleccione filtros", default_kpi_text, default_kpi_class, fig_barras_vacia, fig_linea_vacia, html.Div("Seleccione filtros.")
+        return "Seleccione filtros", default_kpi_text, default_kpi_class, fig_barras_vacia, html.Div("Seleccione filtros.")
 
     try:
-        # Siempre utiliza el archivo RESPONSES_SIPROSA.csv
-        df_original = pd.read_csv(CSV_FILE)
-        # (Conversiones...)
-        df_original[COLUMNA_FECHA_MANT] = pd.to_datetime(df_original.get(COLUMNA_FECHA_MANT), errors='coerce')
-        df_original[COLUMNA_HORA_INI_MANT] = df_original.get(COLUMNA_HORA_INI_MANT, pd.Series(dtype=str)).astype(str).str.strip()
-        df_original[COLUMNA_HORA_FIN_MANT] = df_original.get(COLUMNA_HORA_FIN_MANT, pd.Series(dtype=str)).astype(str).str.strip()
-        df_original[COLUMNA_MAQUINA_MANT] = df_original.get(COLUMNA_MAQUINA_MANT, pd.Series(dtype=str)).astype(str).str.strip()
-        df_original[COLUMNA_ANOMALIAS_DETECTADAS_BOOL] = df_original.get(COLUMNA_ANOMALIAS_DETECTADAS_BOOL, pd.Series(dtype=str)).astype(str).str.strip()
+        # Dataset tipado compartido (mismo filtro que usa la exportación)
+        df_original, version_datos = obtener_dataset()
 
         # (Filtrado...)
-        fecha_inicio_dt = pd.Timestamp.fromordinal(rango_fechas_slider[0])
-        fecha_fin_dt = pd.Timestamp.fromordinal(rango_fechas_slider[1])
+        fecha_inicio_dt, fecha_fin_dt = rango_desde_slider(rango_fechas_slider)
         texto_fechas_slider = f"{fecha_inicio_dt.strftime('%d/%m/%y')} - {fecha_fin_dt.strftime('%d/%m/%y')}"
 
-        df_mant_base = df_original[
-            (df_original[COLUMNA_EVENTO] == VALOR_MANTENIMIENTO) &
-            (df_original.get(COLUMNA_REALIZO_MANT) == VALOR_SI) &
-            (df_original[COLUMNA_FECHA_MANT] >= fecha_inicio_dt) &
-            (df_original[COLUMNA_FECHA_MANT] <= fecha_fin_dt)
-        ].copy()
-
-        if maquina_seleccionada != VALOR_TODAS:
-            df_filtrado = df_mant_base[df_mant_base[COLUMNA_MAQUINA_MANT] == maquina_seleccionada].copy()
-        else:
-            df_filtrado = df_mant_base.copy()
+        df_filtrado = df_original.iloc[mantenimientos_realizados(df_original, version_datos, maquina_seleccionada, fecha_inicio_dt, fecha_fin_dt, planta_seleccionada)].copy()
 
         if df_filtrado.empty:
             print("No hay datos de mantenimiento para los filtros seleccionados.")
             alert_msg = dbc.Alert("No hay datos de mantenimiento para los filtros seleccionados.", color="warning", className="text-center")
-            return texto_fechas_slider, default_kpi_text, default_kpi_class, fig_barras_vacia, fig_linea_vacia, alert_msg
+            return texto_fechas_slider, default_kpi_text, default_kpi_class, fig_barras_vacia, alert_msg
 
         # (Cálculo y formato duración...)
         df_filtrado['duracion_horas'] = df_filtrado.apply(
@@ -265,19 +227,17 @@ def update_maintenance_page(maquina_seleccionada, rango_fechas_slider):
             axis=1
         )
         df_filtrado['Duración'] = df_filtrado['duracion_horas'].apply(format_duracion)
-        df_calculos = df_filtrado.dropna(subset=['duracion_horas']).copy()
-        df_calculos = df_calculos[df_calculos['duracion_horas'] >= 0]
 
     except FileNotFoundError:
         print(f"ERROR CRÍTICO en mantenimiento: Archivo '{CSV_FILE}' no encontrado.")
         alert_msg = dbc.Alert(f"Error: Archivo '{CSV_FILE}' no encontrado.", color="danger")
-        return "Error Archivo", default_kpi_text, default_kpi_class, fig_barras_vacia, fig_linea_vacia, alert_msg
+        return "Error Archivo", default_kpi_text, default_kpi_class, fig_barras_vacia, alert_msg
     except Exception as e:
         print(f"Error cargando o filtrando datos de mantenimiento: {e}")
         import traceback
         traceback.print_exc()
         alert_msg = dbc.Alert("Error procesando los datos de mantenimiento.", color="danger")
-        return "Error", default_kpi_text, default_kpi_class, fig_barras_vacia, fig_linea_vacia, alert_msg
+        return "Error", default_kpi_text, default_kpi_class, fig_barras_vacia, alert_msg
 
     # --- Cálculos y Generación de Componentes ---
 
@@ -294,13 +254,15 @@ def update_maintenance_page(maquina_seleccionada, rango_fechas_slider):
         kpi_text = "N/A"
         kpi_class = default_kpi_class
 
+    # Etiquetas de máquina (nombre corto y de eje) armadas una vez por versión del dataset
+    tabla_maquinas = obtener_tabla_maquinas(df_original, version_datos)
+
     # Gráfico Barras por Máquina (con nombres acortados y divididos)
     if not df_filtrado.empty:
         conteo_maquina = df_filtrado[COLUMNA_MAQUINA_MANT].value_counts().reset_index()
         conteo_maquina.columns = ['Maquina Original', 'Cantidad']
-        # *** Aplicar acortar_nombre_maquina (que ahora incluye abreviaturas) ***
-        conteo_maquina['Máquina_Acortada'] = conteo_maquina['Maquina Original'].apply(acortar_nombre_maquina)
-        conteo_maquina['Máquina_EjeX'] = conteo_maquina['Máquina_Acortada'].apply(lambda x: wrap_text(x, width=25)) # Ajusta width si es necesario
+        conteo_maquina['Máquina_Acortada'] = tabla_maquinas.etiquetas(conteo_maquina['Maquina Original'])
+        conteo_maquina['Máquina_EjeX'] = tabla_maquinas.etiquetas(conteo_maquina['Maquina Original'], 'eje')
 
         fig_barras = px.bar(conteo_maquina.sort_values('Cantidad', ascending=False),
                            x='Máquina_EjeX', y='Cantidad', text='Cantidad',
@@ -316,27 +278,16 @@ def update_maintenance_page(maquina_seleccionada, rango_fechas_slider):
     else:
         fig_barras = fig_barras_vacia
 
-    # Gráfico Línea Duración Diaria (sin cambios)
-    if not df_calculos.empty:
-        duracion_diaria = df_calculos.groupby(df_calculos[COLUMNA_FECHA_MANT].dt.date)['duracion_horas'].sum().reset_index()
-        duracion_diaria.rename(columns={COLUMNA_FECHA_MANT: 'Fecha'}, inplace=True)
-        fig_linea = px.line(duracion_diaria.sort_values('Fecha'), x='Fecha', y='duracion_horas', markers=True,
-                           labels={'Fecha': 'Fecha', 'duracion_horas': 'Horas Totales Mantenimiento'})
-        fig_linea.update_traces(marker=dict(size=8))
-        fig_linea.update_layout(title=None, height=350, margin=dict(t=10, b=20, l=20, r=10), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
-    else:
-        fig_linea = fig_linea_vacia
-
-    # Tabla Detallada (aplica acortar_nombre_maquina)
+    # Tabla Detallada (máquina con su nombre corto)
     if not df_filtrado.empty:
         columnas_tabla = [COLUMNA_FECHA_MANT, COLUMNA_MAQUINA_MANT, COLUMNA_TIPO_MANT, COLUMNA_HORA_INI_MANT, COLUMNA_HORA_FIN_MANT, 'Duración', COLUMNA_ANOMALIAS_DETECTADAS_BOOL, COLUMNA_ANOMALIAS_DESC]
-        columnas_tabla_existentes = [col for col in columnas_tabla if col in df_filtrado.columns]
-        df_tabla = df_filtrado[columnas_tabla_existentes].copy()
+        df_filtrado_texto = obtener_textos().completar(df_filtrado, [COLUMNA_ANOMALIAS_DESC])  # Texto libre solo de estas filas
+        columnas_tabla_existentes = [col for col in columnas_tabla if col in df_filtrado_texto.columns]
+        df_tabla = df_filtrado_texto[columnas_tabla_existentes].copy()
         df_tabla.rename(columns={COLUMNA_ANOMALIAS_DETECTADAS_BOOL: 'Anomalías Detectadas?', COLUMNA_ANOMALIAS_DESC: 'Descripción Anomalía'}, inplace=True)
         df_tabla[COLUMNA_FECHA_MANT] = df_tabla[COLUMNA_FECHA_MANT].dt.strftime('%d/%m/%Y')
-        # *** Aplicar acortamiento/abreviatura a la columna de máquina en la tabla ***
         if COLUMNA_MAQUINA_MANT in df_tabla.columns:
-             df_tabla[COLUMNA_MAQUINA_MANT] = df_tabla[COLUMNA_MAQUINA_MANT].apply(acortar_nombre_maquina)
+             df_tabla[COLUMNA_MAQUINA_MANT] = tabla_maquinas.etiquetas(df_tabla[COLUMNA_MAQUINA_MANT])
 
         try: # Ordenar tabla
              df_tabla[COLUMNA_HORA_INI_MANT + '_time'] = pd.to_datetime(df_tabla[COLUMNA_HORA_INI_MANT].astype(str).str.replace('.', '', regex=False), format='%I:%M %p', errors='coerce').dt.time
@@ -349,4 +300,62 @@ def update_maintenance_page(maquina_seleccionada, rango_fechas_slider):
     else:
         tabla_html = dbc.Alert("No hay registros detallados para mostrar.", color="secondary", className="text-center")
 
-    return texto_fechas_slider, kpi_text, kpi_class, fig_barras, fig_linea, tabla_html
\ No newline at end of file
+    return texto_fechas_slider, kpi_text, kpi_class, fig_barras, tabla_html
+
+
+# Línea de duración: día, semana o mes según el rango (series precalculadas); un clic en un período lo amplía
+@callback(
+    Output('mant-grafico-linea-duracion', 'figure'),
+    Output('mant-titulo-linea-duracion', 'children'),
+    Input('mant-dropdown-maquina', 'value'),
+    Input('mant-slider-fechas', 'value'),
+    Input('filtro-planta', 'value'),
+    Input('mant-grafico-linea-duracion', 'clickData'),
+    State('mant-grafico-linea-duracion', 'figure'),
+)
+def update_duracion_mantenimiento(maquina_seleccionada, rango_fechas_slider, planta_seleccionada, clickData, figura_actual):
+    titulo = "Tiempo Total Invertido en Mantenimiento"
+    fig_linea_vacia = go.Figure()
+    fig_linea_vacia.update_layout(title_text="Sin datos", xaxis=dict(visible=False), yaxis=dict(visible=False), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', height=350)
+    if not rango_fechas_slider or not maquina_seleccionada:
+        return fig_linea_vacia, titulo
+
+    try:
+        df_original, version_datos = obtener_dataset()
+        fecha_inicio_dt, fecha_fin_dt = rango_desde_slider(rango_fechas_slider)
+        periodo = (fecha_inicio_dt, fecha_fin_dt)
+        # Clic en una semana/mes: ese período por día. Clic en un día: vuelve al rango del slider
+        mostrado = leer_meta_serie(figura_actual)
+        if ctx.triggered_id == 'mant-grafico-linea-duracion' and clickData and mostrado:
+            periodo = periodo_ampliado(clickData['points'][0]['x'], mostrado[2], mostrado[0], mostrado[1]) or periodo
+        maquinas = None if maquina_seleccionada == VALOR_TODAS else [maquina_seleccionada]
+        duracion, resolucion = serie_temporal(df_original, version_datos, 'mantenimiento_horas', periodo[0], periodo[1],
+                                              maquinas=maquinas, planta=planta_seleccionada)
+    except Exception as e:
+        print(f"Error calculando la duración de mantenimiento por período: {e}")
+        import traceback
+        traceback.print_exc()
+        return fig_linea_vacia, titulo
+
+    titulo = f"{titulo} ({PERIODICIDAD[resolucion]})"
+    if duracion.empty:
+        return fig_linea_vacia, titulo
+    duracion = pd.DataFrame({'Fecha': duracion['fecha'].dt.date, 'duracion_horas': duracion['valor']})
+    fig_linea = px.line(duracion, x='Fecha', y='duracion_horas', markers=True,
+                       labels={'Fecha': 'Fecha', 'duracion_horas': 'Horas Totales Mantenimiento'})
+    fig_linea.update_traces(marker=dict(size=8))
+    fig_linea.update_layout(title=None, height=350, margin=dict(t=10, b=20, l=20, r=10), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
+                            meta=meta_serie(periodo[0], periodo[1], resolucion))
+    return fig_linea, titulo
+
+
+# Enlace de descarga con los filtros actuales (la descarga la sirve api/exportacion.py en streaming)
+@callback(
+    Output('mant-link-exportacion', 'href'),
+    Input('mant-formato-exportacion', 'value'),
+    Input('mant-dropdown-maquina', 'value'),
+    Input('mant-slider-fechas', 'value'),
+    Input('filtro-planta', 'value'),
+)
+def actualizar_link_exportacion_mantenimiento(formato, maquina_seleccionada, rango_fechas_slider, planta_seleccionada):
+    return url_exportacion('mantenimiento', formato, rango_fechas_slider, maquina=maquina_seleccionada, planta=planta_seleccionada)
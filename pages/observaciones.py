@@ -1,15 +1,24 @@
 # pages/observaciones.py
 
 import dash
-from dash import dcc, html, Input, Output, callback, State, no_update
+from dash import dcc, html, Input, Output, callback, clientside_callback, ClientsideFunction, State, no_update
 import dash_bootstrap_components as dbc
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 from datetime import datetime, timedelta
-import re # Para expresiones regulares (limpieza de texto)
 import io # Para manejar bytes de imagen
 import base64 # Para codificar imagen para HTML
+import traceback
+
+from datos import obtener_dataset, obtener_textos
+from datos.columnas import COLUMNA_ID_FILA
+from datos.filtros import filtrar_planta
+from datos.corpus import obtener_corpus
+from datos.busqueda import STOPWORDS_ES as STOPWORDS_ES_BASE
+from datos.cortes import corte_columnar, obtener_corte
+
+from api.exportacion import opciones_formato_exportacion, url_exportacion
 
 # Intentar importar WordCloud y stopwords, manejar error si no está instalado
 try:
@@ -32,56 +41,9 @@ COLUMNA_EVENTO = 'TIPO DE EVENTO A REGISTRAR'
 COLUMNA_OBSERVACIONES = 'OBSERVACIONES ADICIONALES' # Asegúrate que este sea el nombre exacto
 VALOR_OBSERVACIONES = 'Observaciones Generales'
 
-# Lista básica de stopwords en español (puedes expandirla o usar NLTK para una mejor)
-# Fuente: https://github.com/stopwords-iso/stopwords-es/blob/master/stopwords-es.txt (adaptada)
-STOPWORDS_ES = set([
-    'a', 'actualmente', 'acuerdo', 'adelante', 'ademas', 'además', 'afirmó', 'agregó', 'ahi', 'ahora', 'ahí', 'al', 'algo', 'alguna', 'algunas',
-    'alguno', 'algunos', 'alla', 'alli', 'allí', 'alrededor', 'ambos', 'ampleamos', 'ante', 'anterior', 'antes', 'apenas', 'aproximadamente',
-    'aquel', 'aquella', 'aquellas', 'aquello', 'aquellos', 'aqui', 'aquí', 'arriba', 'aseguró', 'asi', 'así', 'atras', 'aun', 'aunque', 'ayer',
-    'añadió', 'aún', 'bajo', 'bastante', 'bien', 'buen', 'buena', 'buenas', 'bueno', 'buenos', 'cada', 'casi', 'cerca', 'cierta', 'ciertas',
-    'cierto', 'ciertos', 'cinco', 'comentó', 'como', 'con', 'conocer', 'conseguimos', 'conseguir', 'considera', 'consideró', 'consigo',
-    'consigue', 'consiguen', 'consigues', 'contra', 'cosas', 'creo', 'cual', 'cuales', 'cualquier', 'cuando', 'cuanto', 'cuatro', 'cuenta',
-    'cómo', 'da', 'dado', 'dan', 'dar', 'de', 'debajo', 'debe', 'deben', 'debido', 'decir', 'dejó', 'del', 'delante', 'demasiado', 'demás',
-    'dentro', 'deprisa', 'desde', 'despacio', 'despues', 'después', 'detras', 'detrás', 'dia', 'dias', 'dice', 'dicen', 'dicho', 'dieron',
-    'diferente', 'diferentes', 'dijeron', 'dijo', 'dio', 'dispuso', 'disponible', 'disponibles', 'dla', 'dle', 'dlo', 'dos', 'durante', 'día',
-    'días', 'e', 'ejemplo', 'el', 'ella', 'ellas', 'ello', 'ellos', 'embargo', 'empleais', 'emplean', 'emplear', 'empleas', 'empleo', 'en',
-    'encima', 'encuentra', 'enfrente', 'enseguida', 'entonces', 'entre', 'era', 'erais', 'eramos', 'eran', 'eras', 'eres', 'es', 'esa',
-    'esas', 'ese', 'eso', 'esos', 'esta', 'estaba', 'estabais', 'estabamos', 'estaban', 'estabas', 'estad', 'estada', 'estadas', 'estado',
-    'estados', 'estais', 'estamos', 'estan', 'estando', 'estar', 'estaremos', 'estará', 'estarán', 'estarás', 'estaré', 'estaréis', 'estaría',
-    'estaríais', 'estaríamos', 'estarían', 'estarías', 'estas', 'este', 'esto', 'estos', 'estoy', 'estuvo', 'está', 'estáis', 'están', 'estás',
-    'ex', 'excepto', 'existe', 'existen', 'explicó', 'expresó', 'fin', 'fue', 'fuera', 'fuerais', 'fueramos', 'fueran', 'fueras', 'fueron',
-    'fuese', 'fueseis', 'fuesen', 'fueses', 'fui', 'fuimos', 'fuiste', 'fuisteis', 'general', 'gran', 'grandes', 'gueno', 'ha', 'haber',
-    'habia', 'habida', 'habidas', 'habido', 'habidos', 'habiendo', 'habla', 'hablan', 'habremos', 'habrá', 'habrán', 'habrás', 'habré',
-    'habréis', 'habría', 'habríais', 'habríamos', 'habrían', 'habrías', 'habéis', 'había', 'habíais', 'habíamos', 'habían', 'habías', 'hace',
-    'haceis', 'hacemos', 'hacen', 'hacer', 'hacerlo', 'haces', 'hacia', 'haciendo', 'hago', 'han', 'has', 'hasta', 'hay', 'haya', 'hayamos',
-    'hayan', 'hayas', 'hayáis', 'he', 'hecho', 'hemos', 'hicieron', 'hizo', 'horas', 'hoy', 'hube', 'hubiera', 'hubierais', 'hubieramos',
-    'hubieran', 'hubieras', 'hubieron', 'hubiese', 'hubieseis', 'hubiesen', 'hubieses', 'hubimos', 'hubiste', 'hubisteis', 'hubo', 'hubó', 'igual',
-    'incluso', 'indicó', 'informo', 'informó', 'intenta', 'intentais', 'intentamos', 'intentan', 'intentar', 'intentas', 'intento', 'ir',
-    'junto', 'la', 'lado', 'largo', 'las', 'le', 'lejos', 'les', 'llegó', 'lleva', 'llevar', 'lo', 'los', 'luego', 'lugar', 'manera',
-    'manifestó', 'mas', 'mayor', 'me', 'mediante', 'medio', 'mejor', 'mencionó', 'menos', 'menudo', 'mi', 'mia', 'mias', 'mientras', 'mio',
-    'mios', 'mis', 'misma', 'mismas', 'mismo', 'mismos', 'modo', 'momento', 'mucha', 'muchas', 'muchisima', 'muchisimas', 'muchisimo',
-    'muchisimos', 'mucho', 'muchos', 'muy', 'más', 'mí', 'mía', 'mías', 'mío', 'míos', 'nada', 'nadie', 'ni', 'ninguna', 'ningunas',
-    'ninguno', 'ningunos', 'no', 'nos', 'nosotras', 'nosotros', 'nuestra', 'nuestras', 'nuestro', 'nuestros', 'nueva', 'nuevas', 'nuevo',
-    'nuevos', 'nunca', 'o', 'ocho', 'os', 'otra', 'otras', 'otro', 'otros', 'pais', 'para', 'parece', 'parte', 'partir', 'pasada', 'pasado',
-    'paìs', 'peor', 'pero', 'pesar', 'poca', 'pocas', 'poco', 'pocos', 'podeis', 'podemos', 'poder', 'podria', 'podriais', 'podriamos',
-    'podrian', 'podrias', 'podrá', 'podrán', 'podría', 'podrían', 'poner', 'por', 'por qué', 'porque', 'posible', 'primer', 'primera',
-    'primeras', 'primero', 'primeros', 'principalmente', 'pronto', 'propia', 'propias', 'propio', 'propios', 'proximo', 'próximo', 'próximos',
-    'pudo', 'pueda', 'puede', 'pueden', 'puedo', 'pues', 'punto', 'q', 'qeu', 'que', 'quedó', 'queremos', 'quien', 'quienes', 'quiere', 'quiza',
-    'quizas', 'quizá', 'quizás', 'qué', 'quién', 'quiénes', 'realizado', 'realizar', 'realizó', 'repente', 'respecto', 'sal', 'salvo', 'se',
-    'sea', 'seamos', 'sean', 'seas', 'segun', 'segunda', 'segundo', 'según', 'seis', 'ser', 'sera', 'seremos', 'será', 'serán', 'serás',
-    'seré', 'seréis', 'sería', 'seríais', 'seríamos', 'serían', 'serías', 'seáis', 'señaló', 'si', 'sido', 'siempre', 'siendo', 'siete',
-    'sigue', 'siguiente', 'sin', 'sino', 'sobre', 'sois', 'sola', 'solamente', 'solas', 'solo', 'solos', 'somos', 'son', 'soy', 'soyos', 'su',
-    'supuesto', 'sus', 'suya', 'suyas', 'suyo', 'suyos', 'sí', 'sólo', 'tal', 'tambien', 'también', 'tampoco', 'tan', 'tanta', 'tantas',
-    'tanto', 'tantos', 'tarde', 'te', 'temprano', 'tendremos', 'tendrá', 'tendrán', 'tendrás', 'tendré', 'tendréis', 'tendría', 'tendríais',
-    'tendríamos', 'tendrían', 'tendrías', 'tened', 'teneis', 'tenemos', 'tener', 'tenga', 'tengamos', 'tengan', 'tengas', 'tengo', 'tengáis',
-    'tenida', 'tenidas', 'tenido', 'tenidos', 'teniendo', 'tenéis', 'tenía', 'teníais', 'teníamos', 'tenían', 'tenías', 'tercera', 'terceros',
-    'ti', 'tiempo', 'tiene', 'tienen', 'tienes', 'toda', 'todas', 'todavia', 'todavía', 'todo', 'todos', 'total', 'trabaja', 'trabajais',
-    'trabajamos', 'trabajan', 'trabajar', 'trabajas', 'trabajo', 'tras', 'trata', 'través', 'tres', 'tu', 'tus', 'tuya', 'tuyas', 'tuyo',
-    'tuyos', 'tú', 'ultima', 'ultimo', 'ultimas', 'ultimos', 'un', 'una', 'unas', 'uno', 'unos', 'usa', 'usais', 'usamos', 'usan', 'usar',
-    'usas', 'uso', 'usted', 'ustedes', 'va', 'vais', 'valor', 'vamos', 'van', 'varias', 'varios', 'vaya', 'veces', 'verá', 'verdad',
-    'verdadera', 'verdadero', 'vez', 'vosotras', 'vosotros', 'voy', 'vuestra', 'vuestras', 'vuestro', 'vuestros', 'y', 'ya', 'yo', 'él', 'ésa',
-    'ésas', 'ése', 'ésos', 'ésta', 'éstas', 'éste', 'éstos', 'última', 'últimas', 'último', 'últimos'
-] + list(STOPWORDS)) # Combinar con stopwords de la librería si está disponible
+# Stopwords en español (compartidas con el buscador) más las de la librería si está disponible
+STOPWORDS_ES = set(STOPWORDS_ES_BASE) | set(STOPWORDS)
+STOPWORDS_EXCLUIDAS = frozenset(p.lower() for p in STOPWORDS_ES)  # Los términos del corpus están en minúsculas
 
 # --- Registro de la Página ---
 dash.register_page(__name__, path='/observaciones', title='Observaciones', name='Observaciones')
@@ -97,10 +59,15 @@ def layout():
                       html.Div(id='obs-output-fechas', className='text-center text-muted small mt-2')
              ])), width=12, className="mb-3")
         ]),
+        dbc.Row([
+            dbc.Col(dcc.Dropdown(id='obs-formato-exportacion', options=opciones_formato_exportacion(), value='csv', clearable=False), width=6, md=2),
+            dbc.Col(html.A("Descargar observaciones", id='obs-link-exportacion', href='#', download='', className="btn btn-outline-info btn-sm"), width="auto"),
+        ], className="justify-content-end align-items-center g-2 mb-2"),
         dbc.Row([
             dbc.Col(dbc.Card([
                 dbc.CardHeader("Listado de Observaciones"),
-                dbc.CardBody(dbc.Spinner(html.Div(id='obs-tabla-observaciones')), style={'maxHeight': '500px', 'overflowY': 'auto'})
+                dbc.CardBody(dbc.Spinner(html.Div(id='obs-tabla-observaciones')), style={'maxHeight': '500px', 'overflowY': 'auto'}),
+                dcc.Store(id='obs-store-corte')  # Observaciones de la planta por columnas: la tabla se filtra en el navegador
             ]), width=12, md=6, className="mb-3"),
             dbc.Col(dbc.Card([
                 dbc.CardHeader("Nube de Palabras Clave"),
@@ -130,13 +97,11 @@ def inicializar_controles_observaciones(data_json):
     if not data_json:
         return 0, 1, [0, 1], True
     try:
-        df = pd.read_json(data_json, orient='split')
+        df, _ = obtener_dataset()
         if COLUMNA_TIMESTAMP not in df.columns or COLUMNA_EVENTO not in df.columns:
             print("Error: Faltan columnas Timestamp o Evento en inicializar_controles_observaciones")
             return 0, 1, [0, 1], True
 
-        df[COLUMNA_TIMESTAMP] = pd.to_datetime(df[COLUMNA_TIMESTAMP], errors='coerce')
-
         # Filtrar por observaciones
         df_obs = df[df[COLUMNA_EVENTO] == VALOR_OBSERVACIONES].copy()
 
@@ -159,36 +124,80 @@ def inicializar_controles_observaciones(data_json):
         return 0, 1, [0, 1], True
 
 
-# Callback para actualizar la tabla y la nube de palabras
+def _corte_observaciones(df, planta_seleccionada):
+    """Observaciones de la planta (más recientes primero) como corte por columnas para assets/cortes.js."""
+    df_original = filtrar_planta(df, planta_seleccionada)
+    textos = obtener_textos()
+    df_obs = df_original[
+        (df_original[COLUMNA_EVENTO] == VALOR_OBSERVACIONES) &
+        textos.no_vacio(COLUMNA_OBSERVACIONES)[df_original[COLUMNA_ID_FILA].to_numpy()] &
+        df_original[COLUMNA_TIMESTAMP].notna()
+    ]
+    df_obs = textos.completar(df_obs, [COLUMNA_OBSERVACIONES])
+    fechas_texto = df_obs[COLUMNA_TIMESTAMP].dt.strftime('%d/%m/%Y %H:%M')
+    df_obs = df_obs.assign(_fecha_texto=fechas_texto).sort_values(by='_fecha_texto', ascending=False) # Mismo orden que la tabla armada en el servidor
+    return corte_columnar(df_obs, df_obs[COLUMNA_TIMESTAMP], {'Fecha': df_obs['_fecha_texto'], 'Observación': df_obs[COLUMNA_OBSERVACIONES]})
+
+
+# Callback para enviar al navegador las observaciones de la planta (solo cuando cambia la planta o el dataset)
 @callback(
+    Output('obs-store-corte', 'data'),
+    Input('filtro-planta', 'value'),
+    Input('store-main-data', 'data') # Versión del dataset cargado
+)
+def actualizar_corte_observaciones(planta_seleccionada, data_json):
+    if not data_json:
+        return None
+    try:
+        df, version_datos = obtener_dataset()  # La versión actual (el store solo dispara): el corte sigue a las recargas
+        if COLUMNA_OBSERVACIONES not in obtener_textos().columnas:
+            print("Error: Falta la columna de observaciones en actualizar_corte_observaciones")
+            return None
+        return obtener_corte('observaciones', version_datos, planta_seleccionada, lambda: _corte_observaciones(df, planta_seleccionada))
+    except Exception as e:
+        print(f"Error armando el corte de observaciones: {e}")
+        traceback.print_exc()
+        return None
+
+
+# Tabla y texto del rango: se filtran en el navegador sobre el corte (assets/cortes.js)
+clientside_callback(
+    ClientsideFunction(namespace='cortes', function_name='observaciones'),
     Output('obs-tabla-observaciones', 'children'),
-    Output('obs-wordcloud', 'figure'),
     Output('obs-output-fechas', 'children'),
     Input('obs-slider-fechas', 'value'),
-    State('store-main-data', 'data') # Leer datos del store
+    Input('obs-store-corte', 'data'),
 )
-def update_observaciones_page(rango_fechas_slider, data_json):
+
+
+# Callback para actualizar la nube de palabras
+@callback(
+    Output('obs-wordcloud', 'figure'),
+    Input('obs-slider-fechas', 'value'),
+    Input('filtro-planta', 'value'),
+    State('store-main-data', 'data') # Versión del dataset cargado
+)
+def update_observaciones_page(rango_fechas_slider, planta_seleccionada, data_json):
     if not data_json or rango_fechas_slider is None:
         empty_fig = go.Figure()
         empty_fig.update_layout(title="Esperando datos...", title_x=0.5, paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', xaxis={'showticklabels': False, 'zeroline': False}, yaxis={'showticklabels': False, 'zeroline': False})
-        return html.Div("Cargando..."), empty_fig, "..."
+        return empty_fig
 
     # --- Carga y Filtro Base ---
     try:
-        df_original = pd.read_json(data_json, orient='split')
-        if COLUMNA_TIMESTAMP not in df_original.columns or COLUMNA_EVENTO not in df_original.columns or COLUMNA_OBSERVACIONES not in df_original.columns:
+        df_completo, version_datos = obtener_dataset()
+        df_original = filtrar_planta(df_completo, planta_seleccionada)
+        textos = obtener_textos()  # Las observaciones (texto libre) viven fuera del DataFrame
+        if COLUMNA_TIMESTAMP not in df_original.columns or COLUMNA_EVENTO not in df_original.columns or COLUMNA_OBSERVACIONES not in textos.columnas:
              print("Error: Faltan columnas esenciales en update_observaciones_page")
              empty_fig = go.Figure()
              empty_fig.update_layout(title="Error: Faltan columnas", title_x=0.5, paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', xaxis={'showticklabels': False, 'zeroline': False}, yaxis={'showticklabels': False, 'zeroline': False})
-             return html.Div("Error al cargar datos (faltan columnas)."), empty_fig, "Error"
+             return empty_fig
 
-        df_original[COLUMNA_TIMESTAMP] = pd.to_datetime(df_original[COLUMNA_TIMESTAMP], errors='coerce')
-
-        # Filtrar por observaciones Y que la observación no sea nula/vacía
+        # Filtrar por observaciones Y que la observación no sea nula/vacía (máscara del almacén, sin leer el texto)
         df_obs_base = df_original[
             (df_original[COLUMNA_EVENTO] == VALOR_OBSERVACIONES) &
-            (df_original[COLUMNA_OBSERVACIONES].notna()) &
-            (df_original[COLUMNA_OBSERVACIONES].str.strip() != '')
+            textos.no_vacio(COLUMNA_OBSERVACIONES)[df_original[COLUMNA_ID_FILA].to_numpy()]
         ].copy()
 
     except Exception as e:
@@ -196,37 +205,26 @@ def update_observaciones_page(rango_fechas_slider, data_json):
         traceback.print_exc()
         empty_fig = go.Figure()
         empty_fig.update_layout(title="Error al cargar datos", title_x=0.5, paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', xaxis={'showticklabels': False, 'zeroline': False}, yaxis={'showticklabels': False, 'zeroline': False})
-        return html.Div("Error al cargar datos."), empty_fig, "Error"
+        return empty_fig
 
     # --- Filtrado por Slider ---
     df_filtrado = pd.DataFrame(columns=df_obs_base.columns)
-    texto_fechas_slider = "..."
     try:
         fecha_inicio_dt = pd.Timestamp.fromordinal(rango_fechas_slider[0])
         fecha_fin_dt = pd.Timestamp.fromordinal(rango_fechas_slider[1])
-        texto_fechas_slider = f"{fecha_inicio_dt.strftime('%d/%m/%y')} - {fecha_fin_dt.strftime('%d/%m/%y')}"
 
         # Filtrar observaciones base por fecha y que tengan timestamp válido
         df_filtrado = df_obs_base[
             (df_obs_base[COLUMNA_TIMESTAMP].notna()) &
             (df_obs_base[COLUMNA_TIMESTAMP] >= fecha_inicio_dt) &
             (df_obs_base[COLUMNA_TIMESTAMP] <= fecha_fin_dt)
-        ].copy()
+        ]
 
     except Exception as e:
         print(f"Error durante el filtrado por fecha: {e}")
         traceback.print_exc()
         # Continuar con df_filtrado vacío
 
-    # --- Generación de Tabla ---
-    tabla_html = html.Div("No hay observaciones en el período seleccionado.")
-    if not df_filtrado.empty:
-        df_display_tabla = df_filtrado[[COLUMNA_TIMESTAMP, COLUMNA_OBSERVACIONES]].copy()
-        df_display_tabla.rename(columns={COLUMNA_TIMESTAMP: 'Fecha', COLUMNA_OBSERVACIONES: 'Observación'}, inplace=True)
-        df_display_tabla['Fecha'] = df_display_tabla['Fecha'].dt.strftime('%d/%m/%Y %H:%M') # Incluir hora puede ser útil
-        df_display_tabla = df_display_tabla.sort_values(by='Fecha', ascending=False) # Más recientes primero
-        tabla_html = dbc.Table.from_dataframe(df_display_tabla, striped=True, bordered=True, hover=True, responsive=True, class_name="align-middle small")
-
     # --- Generación de Nube de Palabras ---
     wordcloud_fig = go.Figure()
     wordcloud_fig.update_layout(title="No hay datos para generar nube de palabras", title_x=0.5, paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', xaxis={'showticklabels': False, 'zeroline': False}, yaxis={'showticklabels': False, 'zeroline': False})
@@ -234,29 +232,23 @@ def update_observaciones_page(rango_fechas_slider, data_json):
     # Solo intentar generar si la librería está disponible y hay datos filtrados
     if wordcloud_available and not df_filtrado.empty:
         try:
-            # 1. Concatenar todas las observaciones en un solo texto
-            # Asegurarse que sean strings y manejar NaN
-            text = df_filtrado[COLUMNA_OBSERVACIONES].astype(str).str.cat(sep=' ')
-
-            if text.strip(): # Procesar solo si hay texto
-                # 2. Limpieza básica del texto
-                text = text.lower() # Convertir a minúsculas
-                text = re.sub(r'[^\w\s]', '', text) # Quitar puntuación
-                text = re.sub(r'\d+', '', text) # Quitar números (opcional)
+            # 1. Frecuencias de términos de las observaciones del rango (corpus ya tokenizado, sin releer el texto)
+            corpus = obtener_corpus(df_completo, version_datos)
+            frecuencias = corpus.frecuencias(df_filtrado[COLUMNA_ID_FILA].to_numpy(), excluir=STOPWORDS_EXCLUIDAS)
 
+            if frecuencias: # Procesar solo si quedan términos
                 # 3. Crear objeto WordCloud
                 wc = WordCloud(
                     background_color="rgba(0, 0, 0, 0)", # Fondo transparente
                     mode="RGBA", # Necesario para fondo transparente
                     width=800,
                     height=400,
-                    stopwords=STOPWORDS_ES, # Usar la lista de stopwords
                     max_words=100,          # Limitar el número de palabras
                     colormap='viridis',     # Paleta de colores (puedes cambiarla)
                     contour_width=1,
                     contour_color='steelblue', # Color del contorno de las palabras
                     prefer_horizontal=0.9 # Preferir palabras horizontales
-                ).generate(text)
+                ).generate_from_frequencies(frecuencias)
 
                 # 4. Convertir a imagen para Dash
                 img_bytes = io.BytesIO()
@@ -280,4 +272,15 @@ def update_observaciones_page(rango_fechas_slider, data_json):
             wordcloud_fig.update_layout(title="Error al generar nube de palabras", title_x=0.5)
 
 
-    return tabla_html, wordcloud_fig, texto_fechas_slider
\ No newline at end of file
+    return wordcloud_fig
+
+
+# Enlace de descarga con el rango actual (la descarga la sirve api/exportacion.py en streaming)
+@callback(
+    Output('obs-link-exportacion', 'href'),
+    Input('obs-formato-exportacion', 'value'),
+    Input('obs-slider-fechas', 'value'),
+    Input('filtro-planta', 'value'),
+)
+def actualizar_link_exportacion_observaciones(formato, rango_fechas_slider, planta_seleccionada):
+    return url_exportacion('observaciones', formato, rango_fechas_slider, planta=planta_seleccionada)
@@ -0,0 +1,152 @@
+# pages/oee.py
+
+import dash
+from dash import dcc, html, Input, Output, callback, State
+import dash_bootstrap_components as dbc
+import plotly.express as px
+import plotly.graph_objects as go
+import pandas as pd
+import traceback
+
+from datos import obtener_dataset
+from datos.filtros import rango_desde_slider
+from datos.maquinas import obtener_tabla_maquinas
+from datos.oee import (
+    FRECUENCIAS_OEE, obtener_cubo_oee, usa_tasas_nominales, filtrar_cubo, oee_por_maquina, oee_serie, oee_total,
+)
+
+# --- Registro de la Página ---
+dash.register_page(__name__, path='/oee', title='OEE por Máquina', name='OEE')
+
+# Componentes del OEE mostrados en las tarjetas (columna, título)
+COMPONENTES_OEE = [('oee', 'OEE'), ('disponibilidad', 'Disponibilidad'), ('rendimiento', 'Rendimiento'), ('calidad', 'Calidad')]
+
+
+# --- Layout ---
+def layout():
+    return dbc.Container([
+        dbc.Row(dbc.Col(html.H1("OEE por Máquina", className="text-center display-4 my-4"))),
+        dbc.Row([
+            dbc.Col(dbc.Card(dbc.CardBody([
+                html.Label('Máquinas:', className="card-title mb-2"),
+                dcc.Dropdown(id='oee-dropdown-maquinas', multi=True, placeholder="Todas las máquinas"),
+            ])), width=12, md=5, className="mb-3"),
+            dbc.Col(dbc.Card(dbc.CardBody([
+                html.Label('Agrupar por:', className="card-title mb-2"),
+                dbc.RadioItems(id='oee-frecuencia', options=[{'label': k, 'value': v} for k, v in FRECUENCIAS_OEE.items()], value='D', inline=True),
+            ])), width=12, md=2, className="mb-3"),
+            dbc.Col(dbc.Card(dbc.CardBody([
+                html.Label('Rango Fechas:', className="card-title mb-2"),
+                dcc.RangeSlider(id='oee-slider-fechas', marks=None, step=1, tooltip={"placement": "bottom", "always_visible": True}, className="p-0", disabled=True),
+                html.Div(id='oee-output-fechas', className='text-center text-muted small mt-2'),
+            ])), width=12, md=5, className="mb-3"),
+        ], className="align-items-stretch"),
+        dbc.Row(id='oee-kpis', className="mb-3 g-3"),
+        dbc.Row(dbc.Col(html.Div(id='oee-nota-tasas', className="text-muted small text-center mb-3"))),
+        dbc.Row(dbc.Col(dbc.Card(dbc.CardBody([
+            html.H5("Evolución del OEE por Máquina", className="card-title text-center mb-3"),
+            dbc.Spinner(dcc.Graph(id='oee-grafico-tendencia', config={'displayModeBar': False})),
+        ])), width=12, className="mb-3")),
+        dbc.Row(dbc.Col(dbc.Card([
+            dbc.CardHeader("Resumen del Período por Máquina"),
+            dbc.CardBody(dbc.Spinner(html.Div(id='oee-tabla-maquinas'))),
+        ]), width=12, className="mb-3")),
+    ], fluid=True, className="dbc mt-4")
+
+
+def _formato_porcentaje(valor):
+    return f"{valor * 100:.1f}%" if pd.notna(valor) else "N/A"
+
+
+def _kpi_card(titulo, valor):
+    return dbc.Col(dbc.Card(dbc.CardBody([
+        html.P(titulo, className="card-text text-center small text-muted mb-1"),
+        html.H4(_formato_porcentaje(valor), className="text-center fw-bold"),
+    ]), className="h-100"), width=6, md=3)
+
+
+# --- Callbacks ---
+@callback(
+    Output('oee-dropdown-maquinas', 'options'),
+    Output('oee-slider-fechas', 'min'),
+    Output('oee-slider-fechas', 'max'),
+    Output('oee-slider-fechas', 'value'),
+    Output('oee-slider-fechas', 'disabled'),
+    Input('store-main-data', 'data')
+)
+def inicializar_controles_oee(data_json):
+    if not data_json:
+        return [], 0, 1, [0, 1], True
+    try:
+        df, version_datos = obtener_dataset()
+        cubo = obtener_cubo_oee(df, version_datos)
+        if cubo.empty:
+            return [], 0, 1, [0, 1], True
+        opciones = obtener_tabla_maquinas(df, version_datos).opciones(sorted(cubo['maquina'].unique()))
+        slider_min = cubo['fecha'].min().toordinal()
+        slider_max = cubo['fecha'].max().toordinal()
+        return opciones, slider_min, slider_max, [slider_min, slider_max], False
+    except Exception as e:
+        print(f"Error en inicializar_controles_oee: {e}")
+        traceback.print_exc()
+        return [], 0, 1, [0, 1], True
+
+
+@callback(
+    Output('oee-output-fechas', 'children'),
+    Output('oee-kpis', 'children'),
+    Output('oee-nota-tasas', 'children'),
+    Output('oee-grafico-tendencia', 'figure'),
+    Output('oee-tabla-maquinas', 'children'),
+    Input('oee-dropdown-maquinas', 'value'),
+    Input('oee-frecuencia', 'value'),
+    Input('oee-slider-fechas', 'value'),
+    Input('filtro-planta', 'value'),
+    State('store-main-data', 'data')
+)
+def update_oee_page(maquinas, frecuencia, rango_fechas_slider, planta_seleccionada, data_json):
+    fig_vacia = go.Figure()
+    fig_vacia.update_layout(title_text="Sin datos", xaxis=dict(visible=False), yaxis=dict(visible=False), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', height=400)
+    if not data_json or not rango_fechas_slider:
+        return "...", [], "", fig_vacia, html.Div("Cargando...")
+    try:
+        df, version_datos = obtener_dataset()
+        fecha_inicio_dt, fecha_fin_dt = rango_desde_slider(rango_fechas_slider)
+        texto_fechas = f"{fecha_inicio_dt.strftime('%d/%m/%y')} - {fecha_fin_dt.strftime('%d/%m/%y')}"
+        cubo_completo = obtener_cubo_oee(df, version_datos)
+        cubo = filtrar_cubo(cubo_completo, fecha_inicio_dt, fecha_fin_dt, maquinas, planta_seleccionada)
+        nota = ("Rendimiento medido contra las tasas nominales configuradas (o la mejor tasa demostrada si una máquina/producto no tiene). "
+                if usa_tasas_nominales(cubo_completo) else
+                "Sin tasas nominales configuradas: el rendimiento se mide contra la mejor tasa demostrada de cada máquina y producto. ")
+        nota += "Calidad = 100% (el formulario no registra rechazos)."
+        if cubo.empty:
+            return texto_fechas, [], nota, fig_vacia, html.Div("No hay producción en el período seleccionado.")
+
+        total = oee_total(cubo)
+        kpis = [_kpi_card(titulo, total[col]) for col, titulo in COMPONENTES_OEE]
+
+        tabla_maquinas = obtener_tabla_maquinas(df, version_datos)
+        serie = oee_serie(cubo, frecuencia or 'D')
+        serie['maquina'] = tabla_maquinas.etiquetas(serie['maquina'])
+        fig = px.line(serie, x='fecha', y='oee', color='maquina', markers=True,
+                      labels={'fecha': 'Fecha', 'oee': 'OEE', 'maquina': 'Máquina'},
+                      hover_data={'disponibilidad': ':.1%', 'rendimiento': ':.1%', 'oee': ':.1%'})
+        fig.update_layout(yaxis_tickformat='.0%', yaxis_range=[0, 1.05], height=400, margin=dict(t=10, b=20, l=20, r=10),
+                          legend=dict(orientation='h', yanchor='top', y=-0.15), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
+
+        por_maquina = oee_por_maquina(cubo).sort_values('oee')
+        tabla = pd.DataFrame({
+            'Máquina': tabla_maquinas.etiquetas(por_maquina['maquina']),
+            'Horas Producción': por_maquina['horas_produccion'].round(1),
+            'Horas Parada': por_maquina['horas_parada'].round(1),
+            'Disponibilidad': por_maquina['disponibilidad'].map(_formato_porcentaje),
+            'Rendimiento': por_maquina['rendimiento'].map(_formato_porcentaje),
+            'Calidad': por_maquina['calidad'].map(_formato_porcentaje),
+            'OEE': por_maquina['oee'].map(_formato_porcentaje),
+        })
+        tabla_html = dbc.Table.from_dataframe(tabla, striped=True, bordered=True, hover=True, responsive=True, class_name="align-middle small")
+        return texto_fechas, kpis, nota, fig, tabla_html
+    except Exception as e:
+        print(f"Error en update_oee_page: {e}")
+        traceback.print_exc()
+        return "Error", [], "", fig_vacia, html.Div("Error al calcular el OEE.")
@@ -1,19 +1,26 @@
 # pages/produccion.py
 
 import dash
-from dash import dcc, html, Input, Output, callback, State, no_update
+from dash import dcc, html, Input, Output, callback, State, no_update, ctx, MATCH
 import dash_bootstrap_components as dbc
 import plotly.express as px
 import plotly.graph_objects as go
 import plotly.io as pio
 import pandas as pd
 from dash.exceptions import PreventUpdate
-from datetime import timedelta
 
-# --- Constantes (Asegúrate que coincidan con tu CSV y home.py) ---
-# Siempre utiliza el archivo RESPONSES_SIPROSA.csv
-CSV_FILE = 'RESPONSES_SIPROSA.csv'
+from datos import CSV_FILE, obtener_dataset
+from datos.filtros import rango_desde_slider
+from datos.intermedios import produccion_valida
+from datos.kpis import agregar_produccion_por_maquina
+from datos.maquinas import obtener_tabla_maquinas
+from datos.solapamientos import obtener_tiempo_perdido, filtrar_tiempo_perdido
+from datos.anomalias import ANOMALIA_BAJA, ANOMALIA_ALTA, K_DESVIOS, obtener_detector
+from datos.series import serie_temporal, periodo_ampliado, meta_serie, leer_meta_serie
+from datos.segundo_plano import opciones_segundo_plano, resultado_compartido
+from api.exportacion import opciones_formato_exportacion, url_exportacion
 
+# --- Constantes (Asegúrate que coincidan con tu CSV y home.py) ---
 COLUMNA_TIMESTAMP = 'Timestamp'
 COLUMNA_EVENTO = 'TIPO DE EVENTO A REGISTRAR'
 COLUMNA_FECHA_PROD = 'FECHA DE LA PRODUCCIÓN'
@@ -28,6 +35,7 @@ COLUMNA_HORA_FIN_PROD = 'HORA DE FIN DE LA PRODUCCÓN'
 VALOR_PRODUCCION = 'Producción'
 VALOR_SI_PRODUCCION = 'Sí'
 VALOR_TODOS = 'Todos'
+ETIQUETAS_ANOMALIA = {ANOMALIA_BAJA: '⚠ Bajo rendimiento', ANOMALIA_ALTA: '⚠ Alto rendimiento'}
 
 pio.templates.default = "plotly_dark"
 
@@ -72,7 +80,11 @@ def layout():
 
         # Fila para Gráficos de Serie Temporal por Máquina (cada gráfico ancho completo)
         dbc.Row([
-            dbc.Col(html.H4("Evolución Diaria por Máquina", className="text-center my-4"))
+            dbc.Col([
+                html.H4("Evolución por Máquina", className="text-center mt-4 mb-1"),
+                html.Div("Por día, semana o mes según el rango. Clic en una semana o mes para verlo por día; clic en un día para volver al rango completo.",
+                         className="text-muted small text-center mb-3"),
+            ])
         ]),
         dbc.Spinner(dbc.Row(id='prod-contenedor-graficos-linea', className="g-3")), # Se llenará con cols width=12
 
@@ -86,10 +98,32 @@ def layout():
         ], className="mb-3"),
 
 
+        # Fila para el Tiempo de Producción Perdido (incidentes/mantenimientos durante la producción)
+        dbc.Row([
+            dbc.Col(dbc.Card(dbc.CardBody([
+                html.H5("Minutos de Producción Perdidos por Máquina", className="card-title text-center mb-3"),
+                dbc.Spinner(dcc.Graph(id='prod-grafico-tiempo-perdido', config={'displayModeBar': False})),
+                html.Div("Tiempo en que un incidente o mantenimiento de la máquina se superpuso con una corrida de producción registrada.",
+                         className="text-muted small text-center")
+            ])), width=12, className="mb-3")
+        ]),
+
+        # Fila para las Corridas Atípicas
+        dbc.Row([
+            dbc.Col(dbc.Card([
+                dbc.CardHeader("Corridas con Rendimiento Atípico"),
+                dbc.CardBody(dbc.Spinner(html.Div(id='prod-tabla-atipicos')))
+            ]), width=12, className="mb-3")
+        ]),
+
         # Fila para la Tabla Detallada
         dbc.Row([
             dbc.Col(html.H4("Registros Detallados", className="text-center my-4"))
         ]),
+        dbc.Row([
+            dbc.Col(dcc.Dropdown(id='prod-formato-exportacion', options=opciones_formato_exportacion(), value='csv', clearable=False), width=6, md=2),
+            dbc.Col(html.A("Descargar registros", id='prod-link-exportacion', href='#', download='', className="btn btn-outline-info btn-sm"), width="auto"),
+        ], className="justify-content-end align-items-center g-2 mb-2"),
         dbc.Row([
             dbc.Col(dbc.Card(dbc.Spinner(html.Div(id='prod-tabla-detalle'))), width=12)
         ]),
@@ -97,27 +131,21 @@ def layout():
     ], fluid=True, className="dbc mt-4")
 
 
-# --- Funciones Auxiliares para Cálculo de Duración ---
-# (Sin cambios)
-def calcular_duracion_horas(fecha_str, hora_ini_str, hora_fin_str):
-    try:
-        fecha_base = pd.to_datetime(fecha_str).date()
-        hora_ini_str_clean = hora_ini_str.replace('.', '')
-        hora_fin_str_clean = hora_fin_str.replace('.', '')
-        t_ini = pd.to_datetime(hora_ini_str_clean, format='%I:%M %p', errors='coerce').time()
-        t_fin = pd.to_datetime(hora_fin_str_clean, format='%I:%M %p', errors='coerce').time()
-
-        if pd.isna(t_ini) or pd.isna(t_fin): return None
-
-        dt_ini = pd.Timestamp.combine(fecha_base, t_ini)
-        dt_fin = pd.Timestamp.combine(fecha_base, t_fin)
-
-        if dt_fin < dt_ini: dt_fin += timedelta(days=1)
+# --- Funciones Auxiliares ---
+# (calcular_duracion_horas y los agregados por máquina viven en datos/kpis.py, compartidos con la API)
 
-        duracion = dt_fin - dt_ini
-        return duracion.total_seconds() / 3600.0
-
-    except Exception: return None
+def figura_linea_maquina(produccion_maquinas, maquina, label_y_linea, fecha_inicio, fecha_fin, resolucion, titulo=None):
+    """Línea de producción de una máquina a partir de la serie (maquina, fecha, valor) del período."""
+    produccion_maquina = produccion_maquinas[produccion_maquinas['maquina'] == maquina]
+    produccion_periodo = pd.DataFrame({'Fecha': produccion_maquina['fecha'].dt.date, COLUMNA_CANTIDAD: produccion_maquina['valor']})
+    fig_linea = px.line(produccion_periodo, x='Fecha', y=COLUMNA_CANTIDAD, markers=True,
+                   labels={'Fecha': 'Fecha', COLUMNA_CANTIDAD: label_y_linea})
+    fig_linea.update_traces(marker=dict(size=8))
+    fig_linea.update_layout(title_text=titulo or f"{maquina}", title_font_size=14, title_x=0.5, height=300, # Aumentar altura si es necesario
+                      margin=dict(l=20, r=10, t=40, b=20), font_size=12,
+                      paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
+                      meta=meta_serie(fecha_inicio, fecha_fin, resolucion))
+    return fig_linea
 
 # --- Callbacks Específicos de esta Página ---
 
@@ -137,11 +165,7 @@ def inicializar_controles_produccion(data_json_trigger):
         print("Store vacío, esperando datos para inicializar controles de producción.")
         return [], None, "Esperando datos...", 0, 1, [0, 1], True
     try:
-        # Siempre utiliza el archivo RESPONSES_SIPROSA.csv
-        df = pd.read_csv(CSV_FILE)
-        df[COLUMNA_TIMESTAMP] = pd.to_datetime(df.get(COLUMNA_TIMESTAMP), errors='coerce')
-        df[COLUMNA_FECHA_PROD] = pd.to_datetime(df.get(COLUMNA_FECHA_PROD), errors='coerce')
-        df[COLUMNA_CANTIDAD] = pd.to_numeric(df.get(COLUMNA_CANTIDAD), errors='coerce')
+        df, _ = obtener_dataset()
 
         df_prod = df[
             (df.get(COLUMNA_EVENTO) == VALOR_PRODUCCION) &
@@ -187,8 +211,15 @@ def inicializar_controles_produccion(data_json_trigger):
     Output('prod-tabla-detalle', 'children'),
     Input('prod-dropdown-producto', 'value'),
     Input('prod-slider-fechas', 'value'),
+    Input('filtro-planta', 'value'),
+    **opciones_segundo_plano(cancelar=[Input('prod-slider-fechas', 'value')])
 )
-def update_production_page(producto_seleccionado, rango_fechas_slider):
+def update_production_page(producto_seleccionado, rango_fechas_slider, planta_seleccionada):
+    # En segundo plano (cancelado si el slider vuelve a moverse); pedidos idénticos en curso comparten el cálculo
+    return resultado_compartido('produccion', (producto_seleccionado, rango_fechas_slider, planta_seleccionada), lambda: _construir_pagina_produccion(producto_seleccionado, rango_fechas_slider, planta_seleccionada))
+
+
+def _construir_pagina_produccion(producto_seleccionado, rango_fechas_slider, planta_seleccionada):
 
     # --- Validaciones Iniciales ---
     fig_barras_vacia = go.Figure()
@@ -207,39 +238,16 @@ def update_production_page(producto_seleccionado, rango_fechas_slider):
 
     # --- Carga y Filtrado de Datos ---
     try:
-        # Siempre utiliza el archivo RESPONSES_SIPROSA.csv
-        df_original = pd.read_csv(CSV_FILE)
-        df_original[COLUMNA_FECHA_PROD] = pd.to_datetime(df_original.get(COLUMNA_FECHA_PROD), errors='coerce')
-        df_original[COLUMNA_CANTIDAD] = pd.to_numeric(df_original.get(COLUMNA_CANTIDAD), errors='coerce')
-        df_original[COLUMNA_HORA_INI_PROD] = df_original.get(COLUMNA_HORA_INI_PROD, pd.Series(dtype=str)).astype(str).str.strip()
-        df_original[COLUMNA_HORA_FIN_PROD] = df_original.get(COLUMNA_HORA_FIN_PROD, pd.Series(dtype=str)).astype(str).str.strip()
-        df_original[COLUMNA_MAQUINA_PROD] = df_original.get(COLUMNA_MAQUINA_PROD, pd.Series(dtype=str)).astype(str).str.strip()
-        df_original[COLUMNA_UNIDAD] = df_original.get(COLUMNA_UNIDAD, pd.Series(dtype=str)).astype(str).str.strip()
-
-        df_prod_validos = df_original[
-            (df_original[COLUMNA_EVENTO] == VALOR_PRODUCCION) &
-            (df_original.get(COLUMNA_HUBO_PRODUCCION) == VALOR_SI_PRODUCCION) &
-            df_original[COLUMNA_PRODUCTO].notna() &
-            df_original[COLUMNA_CANTIDAD].notna() & (df_original[COLUMNA_CANTIDAD] > 0) &
-            df_original[COLUMNA_MAQUINA_PROD].notna() & (df_original[COLUMNA_MAQUINA_PROD] != '') &
-            df_original[COLUMNA_UNIDAD].notna() & (df_original[COLUMNA_UNIDAD] != '') &
-            df_original[COLUMNA_FECHA_PROD].notna() &
-            df_original[COLUMNA_HORA_INI_PROD].notna() & (df_original[COLUMNA_HORA_INI_PROD] != '') & (df_original[COLUMNA_HORA_INI_PROD].str.contains(':')) &
-            df_original[COLUMNA_HORA_FIN_PROD].notna() & (df_original[COLUMNA_HORA_FIN_PROD] != '') & (df_original[COLUMNA_HORA_FIN_PROD].str.contains(':'))
-        ].copy()
+        # Dataset tipado compartido (mismo filtro que usa la exportación)
+        df_original, version_datos = obtener_dataset()
 
-        if df_prod_validos.empty:
+        if len(produccion_valida(df_original, version_datos, planta=planta_seleccionada)) == 0:
              raise PreventUpdate("No hay datos de producción válidos después del filtro inicial.")
 
-        fecha_inicio_dt = pd.Timestamp.fromordinal(rango_fechas_slider[0])
-        fecha_fin_dt = pd.Timestamp.fromordinal(rango_fechas_slider[1])
+        fecha_inicio_dt, fecha_fin_dt = rango_desde_slider(rango_fechas_slider)
         texto_fechas_slider = f"{fecha_inicio_dt.strftime('%d/%m/%y')} - {fecha_fin_dt.strftime('%d/%m/%y')}"
 
-        df_filtrado = df_prod_validos[
-            (df_prod_validos[COLUMNA_FECHA_PROD] >= fecha_inicio_dt) &
-            (df_prod_validos[COLUMNA_FECHA_PROD] <= fecha_fin_dt) &
-            (df_prod_validos[COLUMNA_PRODUCTO] == producto_seleccionado)
-        ].copy()
+        df_filtrado = df_original.iloc[produccion_valida(df_original, version_datos, producto_seleccionado, fecha_inicio_dt, fecha_fin_dt, planta_seleccionada)].copy()
 
         if df_filtrado.empty:
             print(f"No hay datos para '{producto_seleccionado}' en el rango seleccionado.")
@@ -275,85 +283,70 @@ def update_production_page(producto_seleccionado, rango_fechas_slider):
 
     maquinas_en_seleccion = sorted(df_filtrado[COLUMNA_MAQUINA_PROD].unique())
     produccion_agregada = pd.DataFrame()
+    tabla_maquinas = obtener_tabla_maquinas(df_original, version_datos)  # Nombres cortos de máquina
 
     if maquinas_en_seleccion:
-        df_filtrado['duracion_horas'] = df_filtrado.apply(
-            lambda row: calcular_duracion_horas(row[COLUMNA_FECHA_PROD], row[COLUMNA_HORA_INI_PROD], row[COLUMNA_HORA_FIN_PROD]),
-            axis=1
-        )
-        df_calculos = df_filtrado.dropna(subset=['duracion_horas']).copy()
-        df_calculos = df_calculos[df_calculos['duracion_horas'] > 0]
-
-        if not df_calculos.empty:
-            produccion_agregada = df_calculos.groupby([COLUMNA_MAQUINA_PROD, COLUMNA_UNIDAD]).agg(
-                cantidad_total=(COLUMNA_CANTIDAD, 'sum'),
-                duracion_total_horas=('duracion_horas', 'sum')
-            ).reset_index()
-
-            if not produccion_agregada.empty:
-                produccion_agregada['eficiencia_prom_hora'] = (produccion_agregada['cantidad_total'] / produccion_agregada['duracion_total_horas']).fillna(0)
-
-                # --- Gráfico de Barras (Agrupado por Unidad y Colores Consistentes) ---
-                fig_barras = px.bar(produccion_agregada.sort_values(['cantidad_total'], ascending=False),
-                                    x=COLUMNA_MAQUINA_PROD,
-                                    y='cantidad_total',
-                                    color=COLUMNA_UNIDAD,
-                                    barmode='group',
-                                    text='cantidad_total',
-                                    labels={COLUMNA_MAQUINA_PROD: 'Máquina',
-                                            'cantidad_total': 'Producción Total',
-                                            COLUMNA_UNIDAD: 'Unidad'},
-                                    hover_data={'cantidad_total':':,.0f', COLUMNA_UNIDAD: True, 'eficiencia_prom_hora': ':.1f'},
-                                    color_discrete_map=MAPA_COLORES_UNIDADES # *** APLICAR MAPA DE COLORES ***
-                                    )
-                fig_barras.update_traces(texttemplate='%{text:,.0f}', textposition='outside')
-                fig_barras.update_layout(
-                    title=None, # Quitar título, ya está en la card
-                    uniformtext_minsize=8, uniformtext_mode='hide',
-                    xaxis_tickangle=0,
-                    height=350,
-                    margin=dict(l=20, r=10, t=10, b=20), # Ajustar b si es necesario
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    legend_title_text='Unidad'
-                )
-
-                # --- KPIs de Eficiencia ---
-                produccion_agregada_sorted = produccion_agregada.sort_values(['eficiencia_prom_hora'], ascending=False)
-                for index, row in produccion_agregada_sorted.iterrows():
-                     unidad_kpi = row[COLUMNA_UNIDAD]
-                     eficiencia_kpi = row['eficiencia_prom_hora']
-                     # Usar un ancho fijo o relativo para las cards para mejor alineación
-                     card = dbc.Card([
-                         dbc.CardHeader(html.H6(row[COLUMNA_MAQUINA_PROD], className="mb-0 text-center small"), className="p-2"),
-                         dbc.CardBody(html.P(f"{eficiencia_kpi:,.1f} {unidad_kpi}/hr", className="card-text text-center fw-bold fs-5"), className="p-2")
-                     ], className="mb-2", style={"width": "18rem"}) # Ejemplo de ancho fijo
-                     kpis_eficiencia_cards.append(card)
-                if not kpis_eficiencia_cards:
-                     kpis_eficiencia_cards = [html.P("No se pudo calcular la eficiencia.", className="text-muted text-center")]
+        # Cantidad, horas y eficiencia por máquina/unidad (solo registros con duración válida > 0)
+        produccion_agregada = agregar_produccion_por_maquina(df_filtrado)
+
+        if not produccion_agregada.empty:
+            # --- Gráfico de Barras (Agrupado por Unidad y Colores Consistentes) ---
+            barras = produccion_agregada.sort_values(['cantidad_total'], ascending=False)
+            barras[COLUMNA_MAQUINA_PROD] = tabla_maquinas.etiquetas(barras[COLUMNA_MAQUINA_PROD])
+            fig_barras = px.bar(barras,
+                                x=COLUMNA_MAQUINA_PROD,
+                                y='cantidad_total',
+                                color=COLUMNA_UNIDAD,
+                                barmode='group',
+                                text='cantidad_total',
+                                labels={COLUMNA_MAQUINA_PROD: 'Máquina',
+                                        'cantidad_total': 'Producción Total',
+                                        COLUMNA_UNIDAD: 'Unidad'},
+                                hover_data={'cantidad_total':':,.0f', COLUMNA_UNIDAD: True, 'eficiencia_prom_hora': ':.1f'},
+                                color_discrete_map=MAPA_COLORES_UNIDADES # *** APLICAR MAPA DE COLORES ***
+                                )
+            fig_barras.update_traces(texttemplate='%{text:,.0f}', textposition='outside')
+            fig_barras.update_layout(
+                title=None, # Quitar título, ya está en la card
+                uniformtext_minsize=8, uniformtext_mode='hide',
+                xaxis_tickangle=0,
+                height=350,
+                margin=dict(l=20, r=10, t=10, b=20), # Ajustar b si es necesario
+                paper_bgcolor='rgba(0,0,0,0)',
+                plot_bgcolor='rgba(0,0,0,0)',
+                legend_title_text='Unidad'
+            )
+
+            # --- KPIs de Eficiencia ---
+            produccion_agregada_sorted = produccion_agregada.sort_values(['eficiencia_prom_hora'], ascending=False)
+            for index, row in produccion_agregada_sorted.iterrows():
+                 unidad_kpi = row[COLUMNA_UNIDAD]
+                 eficiencia_kpi = row['eficiencia_prom_hora']
+                 # Usar un ancho fijo o relativo para las cards para mejor alineación
+                 card = dbc.Card([
+                     dbc.CardHeader(html.H6(tabla_maquinas.etiqueta(row[COLUMNA_MAQUINA_PROD]), className="mb-0 text-center small"), className="p-2"),
+                     dbc.CardBody(html.P(f"{eficiencia_kpi:,.1f} {unidad_kpi}/hr", className="card-text text-center fw-bold fs-5"), className="p-2")
+                 ], className="mb-2", style={"width": "18rem"}) # Ejemplo de ancho fijo
+                 kpis_eficiencia_cards.append(card)
+            if not kpis_eficiencia_cards:
+                 kpis_eficiencia_cards = [html.P("No se pudo calcular la eficiencia.", className="text-muted text-center")]
 
 
             # --- Gráficos de Línea por Máquina (Cada uno ancho completo) ---
+            # Una sola consulta (máquina, período) a las series precalculadas; día, semana o mes según el rango
+            produccion_maquinas, resolucion = serie_temporal(df_original, version_datos, 'produccion', fecha_inicio_dt, fecha_fin_dt,
+                                                             producto=producto_seleccionado, planta=planta_seleccionada, por_maquina=True)
             for maquina in maquinas_en_seleccion:
                 df_maquina_linea = df_filtrado[df_filtrado[COLUMNA_MAQUINA_PROD] == maquina]
                 if not df_maquina_linea.empty:
-                    produccion_diaria = df_maquina_linea.groupby(df_maquina_linea[COLUMNA_FECHA_PROD].dt.date)[COLUMNA_CANTIDAD].sum().reset_index()
-                    produccion_diaria.rename(columns={COLUMNA_FECHA_PROD: 'Fecha'}, inplace=True)
-                    produccion_diaria = produccion_diaria.sort_values(by='Fecha')
                     unidades_maquina = df_maquina_linea[COLUMNA_UNIDAD].unique()
-                    titulo_linea = f"{maquina}"
                     label_y_linea = f"Producción Total ({', '.join(unidades_maquina)})" if len(unidades_maquina) > 1 else f"Producción ({unidades_maquina[0]})"
-
-                    fig_linea = px.line(produccion_diaria, x='Fecha', y=COLUMNA_CANTIDAD, markers=True,
-                                   labels={'Fecha': 'Fecha', COLUMNA_CANTIDAD: label_y_linea})
-                    fig_linea.update_traces(marker=dict(size=8))
-                    fig_linea.update_layout(title_text=titulo_linea, title_font_size=14, title_x=0.5, height=300, # Aumentar altura si es necesario
-                                      margin=dict(l=20, r=10, t=40, b=20), font_size=12,
-                                      paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
+                    fig_linea = figura_linea_maquina(produccion_maquinas, maquina, label_y_linea, fecha_inicio_dt, fecha_fin_dt, resolucion,
+                                                    titulo=tabla_maquinas.etiqueta(maquina))
 
                     # *** ASEGURAR QUE CADA GRÁFICO OCUPE width=12 ***
                     graficos_linea_maquina.append(
-                        dbc.Col(dbc.Card(dcc.Graph(figure=fig_linea, config={'displayModeBar': False})), width=12, className="mb-3") # Añadir margen inferior
+                        dbc.Col(dbc.Card(dcc.Graph(id={'type': 'prod-grafico-linea', 'maquina': maquina}, figure=fig_linea, config={'displayModeBar': False})), width=12, className="mb-3") # Añadir margen inferior
                     )
 
         # --- Tabla Detallada ---
@@ -361,6 +354,12 @@ def update_production_page(producto_seleccionado, rango_fechas_slider):
             columnas_tabla = [COLUMNA_FECHA_PROD, COLUMNA_MAQUINA_PROD, COLUMNA_PRODUCTO, COLUMNA_UNIDAD, COLUMNA_CANTIDAD, COLUMNA_HORA_INI_PROD, COLUMNA_HORA_FIN_PROD]
             columnas_tabla_existentes = [col for col in columnas_tabla if col in df_filtrado.columns]
             df_tabla = df_filtrado[columnas_tabla_existentes].copy()
+            if COLUMNA_MAQUINA_PROD in df_tabla.columns:
+                df_tabla[COLUMNA_MAQUINA_PROD] = tabla_maquinas.etiquetas(df_tabla[COLUMNA_MAQUINA_PROD])
+            # Corridas fuera de la banda EWMA de su máquina y producto (marcadas al ingerir las filas)
+            anomalias = obtener_detector(df_original, version_datos).marcas_de(df_filtrado)['anomalia']
+            if anomalias.notna().any():
+                df_tabla['Atípico'] = anomalias.map(ETIQUETAS_ANOMALIA).fillna('')
             df_tabla[COLUMNA_FECHA_PROD] = df_tabla[COLUMNA_FECHA_PROD].dt.strftime('%d/%m/%Y')
             if COLUMNA_CANTIDAD in df_tabla.columns:
                  df_tabla[COLUMNA_CANTIDAD] = df_tabla[COLUMNA_CANTIDAD].apply(lambda x: f"{int(x):,}" if pd.notna(x) else '')
@@ -387,4 +386,122 @@ def update_production_page(producto_seleccionado, rango_fechas_slider):
          graficos_linea_maquina = [dbc.Col(dbc.Alert("No se pudo generar la evolución diaria.", color="secondary"), width=12)]
 
 
-    return texto_fechas_slider, graficos_linea_maquina, fig_barras, kpis_eficiencia_cards, tabla_detalle_html
\ No newline at end of file
+    return texto_fechas_slider, graficos_linea_maquina, fig_barras, kpis_eficiencia_cards, tabla_detalle_html
+
+
+# Clic en un punto de la línea de una máquina: semana/mes -> ese período por día; día -> rango del slider
+@callback(
+    Output({'type': 'prod-grafico-linea', 'maquina': MATCH}, 'figure'),
+    Input({'type': 'prod-grafico-linea', 'maquina': MATCH}, 'clickData'),
+    State({'type': 'prod-grafico-linea', 'maquina': MATCH}, 'figure'),
+    State('prod-dropdown-producto', 'value'),
+    State('prod-slider-fechas', 'value'),
+    State('filtro-planta', 'value'),
+    prevent_initial_call=True
+)
+def ampliar_linea_maquina(clickData, figura_actual, producto_seleccionado, rango_fechas_slider, planta_seleccionada):
+    mostrado = leer_meta_serie(figura_actual)
+    if not clickData or not mostrado or not rango_fechas_slider:
+        raise PreventUpdate
+    try:
+        maquina = ctx.triggered_id['maquina']
+        fecha_inicio_dt, fecha_fin_dt = rango_desde_slider(rango_fechas_slider)
+        periodo = periodo_ampliado(clickData['points'][0]['x'], mostrado[2], mostrado[0], mostrado[1]) or (fecha_inicio_dt, fecha_fin_dt)
+        df_original, version_datos = obtener_dataset()
+        produccion_maquinas, resolucion = serie_temporal(df_original, version_datos, 'produccion', periodo[0], periodo[1],
+                                                         producto=producto_seleccionado, planta=planta_seleccionada, por_maquina=True)
+        label_y_linea = (((figura_actual.get('layout') or {}).get('yaxis') or {}).get('title') or {}).get('text') or 'Producción'
+        return figura_linea_maquina(produccion_maquinas, maquina, label_y_linea, periodo[0], periodo[1], resolucion,
+                                    titulo=obtener_tabla_maquinas(df_original, version_datos).etiqueta(maquina))
+    except Exception as e:
+        print(f"Error ampliando la línea de producción: {e}")
+        import traceback
+        traceback.print_exc()
+        return no_update
+
+
+# Minutos perdidos por máquina en el rango (máquinas que produjeron el producto seleccionado)
+@callback(
+    Output('prod-grafico-tiempo-perdido', 'figure'),
+    Input('prod-dropdown-producto', 'value'),
+    Input('prod-slider-fechas', 'value'),
+    Input('filtro-planta', 'value'),
+)
+def update_tiempo_perdido_produccion(producto_seleccionado, rango_fechas_slider, planta_seleccionada):
+    fig = go.Figure()
+    fig.update_layout(xaxis=dict(visible=False), yaxis=dict(visible=False), height=350, paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
+    if not rango_fechas_slider:
+        return fig
+    try:
+        df_original, version_datos = obtener_dataset()
+        fecha_inicio_dt, fecha_fin_dt = rango_desde_slider(rango_fechas_slider)
+        filas = produccion_valida(df_original, version_datos, producto_seleccionado, fecha_inicio_dt, fecha_fin_dt, planta_seleccionada)
+        maquinas = df_original[COLUMNA_MAQUINA_PROD].iloc[filas].unique().tolist()
+        tiempo_perdido = filtrar_tiempo_perdido(obtener_tiempo_perdido(df_original, version_datos),
+                                                fecha_inicio_dt, fecha_fin_dt, maquinas, planta_seleccionada)
+        if tiempo_perdido.empty:
+            fig.update_layout(title_text="Sin producción perdida por incidentes o mantenimientos en el período", title_x=0.5)
+            return fig
+        por_maquina = tiempo_perdido.groupby('maquina')[['minutos_incidentes', 'minutos_mantenimiento', 'minutos_perdidos']].sum().reset_index()
+        por_maquina = por_maquina.sort_values('minutos_perdidos', ascending=False)
+        por_maquina['maquina'] = obtener_tabla_maquinas(df_original, version_datos).etiquetas(por_maquina['maquina'])
+        fig = px.bar(por_maquina, x='maquina', y=['minutos_incidentes', 'minutos_mantenimiento'], barmode='group',
+                     labels={'maquina': 'Máquina', 'value': 'Minutos', 'variable': 'Causa'},
+                     hover_data={'minutos_perdidos': ':,.0f'})
+        fig.for_each_trace(lambda t: t.update(name={'minutos_incidentes': 'Incidentes', 'minutos_mantenimiento': 'Mantenimiento'}[t.name]))
+        fig.update_layout(height=350, margin=dict(l=20, r=10, t=10, b=20), legend_title_text='Causa',
+                          paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
+        return fig
+    except Exception as e:
+        print(f"Error calculando el tiempo perdido en producción: {e}")
+        import traceback
+        traceback.print_exc()
+        fig.update_layout(title_text="Error")
+        return fig
+
+
+# Lista de corridas atípicas del producto y rango (lectura de las marcas ya calculadas)
+@callback(
+    Output('prod-tabla-atipicos', 'children'),
+    Input('prod-dropdown-producto', 'value'),
+    Input('prod-slider-fechas', 'value'),
+    Input('filtro-planta', 'value'),
+)
+def update_atipicos_produccion(producto_seleccionado, rango_fechas_slider, planta_seleccionada):
+    if not rango_fechas_slider:
+        return html.Div("Seleccione producto y fechas.")
+    try:
+        df_original, version_datos = obtener_dataset()
+        fecha_inicio_dt, fecha_fin_dt = rango_desde_slider(rango_fechas_slider)
+        df_filtrado = df_original.iloc[produccion_valida(df_original, version_datos, producto_seleccionado, fecha_inicio_dt, fecha_fin_dt, planta_seleccionada)]
+        marcas = obtener_detector(df_original, version_datos).marcas_de(df_filtrado)
+        atipicas = marcas['anomalia'].notna().to_numpy()
+        if not atipicas.any():
+            return html.P(f"Ninguna corrida fuera de la banda de ±{K_DESVIOS:g} desvíos de su máquina y producto.", className="text-muted text-center mb-0")
+        df_atipicas, marcas = df_filtrado[atipicas], marcas[atipicas]
+        tabla = pd.DataFrame({
+            'Fecha': df_atipicas[COLUMNA_FECHA_PROD].dt.strftime('%d/%m/%Y'),
+            'Máquina': obtener_tabla_maquinas(df_original, version_datos).etiquetas(df_atipicas[COLUMNA_MAQUINA_PROD]),
+            'Producto': df_atipicas[COLUMNA_PRODUCTO],
+            'Rendimiento (u/h)': marcas['rendimiento_hora'].map('{:,.1f}'.format),
+            'Esperado (u/h)': (marcas['media_ewma'].map('{:,.1f}'.format) + ' ± ' + (K_DESVIOS * marcas['desvio_ewma']).map('{:,.1f}'.format)),
+            'Atípico': marcas['anomalia'].map(ETIQUETAS_ANOMALIA),
+        })
+        return dbc.Table.from_dataframe(tabla, striped=True, bordered=True, hover=True, responsive=True, class_name="align-middle small")
+    except Exception as e:
+        print(f"Error listando corridas atípicas: {e}")
+        import traceback
+        traceback.print_exc()
+        return html.Div("Error al listar las corridas atípicas.")
+
+
+# Enlace de descarga con los filtros actuales (la descarga la sirve api/exportacion.py en streaming)
+@callback(
+    Output('prod-link-exportacion', 'href'),
+    Input('prod-formato-exportacion', 'value'),
+    Input('prod-dropdown-producto', 'value'),
+    Input('prod-slider-fechas', 'value'),
+    Input('filtro-planta', 'value'),
+)
+def actualizar_link_exportacion_produccion(formato, producto_seleccionado, rango_fechas_slider, planta_seleccionada):
+    return url_exportacion('produccion', formato, rango_fechas_slider, producto=producto_seleccionado, planta=planta_seleccionada)
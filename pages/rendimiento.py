@@ -0,0 +1,210 @@
+# pages/rendimiento.py
+# Rendimiento de la app medido por ella misma (sin monitoreo externo): latencia de cada callback en el
+# tiempo, tasa de aciertos de los cachés, versión del dataset y duración de sus recargas y memoria del
+# worker. Lee los buffers circulares en memoria de datos/instrumentacion.py y datos/carga.py, así que
+# muestra el worker que atiende el pedido (con varios workers, cada uno lleva sus propias métricas).
+
+import os
+import time
+from datetime import datetime
+
+import dash
+from dash import dcc, html, Input, Output, callback
+import dash_bootstrap_components as dbc
+import plotly.express as px
+import plotly.graph_objects as go
+import pandas as pd
+import traceback
+
+from datos.carga import historial_recargas
+from datos.instrumentacion import invocaciones, muestras_memoria, perfilado_activo, resumen_callbacks, serie_latencias
+from datos.memoria import estadisticas_caches, memoria_proceso
+
+# --- Registro de la Página ---
+dash.register_page(__name__, path='/rendimiento', title='Rendimiento de la App', name='Rendimiento')
+
+# Ventanas de tiempo (segundos; None = todo lo registrado) y agrupación de la serie de latencias
+VENTANAS = {'15 min': 15 * 60, '1 hora': 3600, '6 horas': 6 * 3600, 'Todo': None}
+FRECUENCIAS_VENTANA = {'15 min': '1min', '1 hora': '2min', '6 horas': '10min', 'Todo': '10min'}
+PERCENTILES = {'p50': 50, 'p95': 95, 'p99': 99}
+# Callbacks graficados si no se elige ninguno (los más invocados en la ventana)
+MAX_CALLBACKS_GRAFICO = 8
+# Refresco de la página (ms)
+INTERVALO_REFRESCO_MS = 10_000
+
+
+# --- Layout ---
+def layout():
+    return dbc.Container([
+        dbc.Row(dbc.Col(html.H1("Rendimiento de la App", className="text-center display-4 my-4"))),
+        dcc.Interval(id='rend-intervalo', interval=INTERVALO_REFRESCO_MS),
+        dbc.Row([
+            dbc.Col(dbc.Card(dbc.CardBody([
+                html.Label('Ventana:', className="card-title mb-2"),
+                dbc.RadioItems(id='rend-ventana', options=[{'label': k, 'value': k} for k in VENTANAS], value='1 hora', inline=True),
+            ])), width=12, md=4, className="mb-3"),
+            dbc.Col(dbc.Card(dbc.CardBody([
+                html.Label('Percentil:', className="card-title mb-2"),
+                dbc.RadioItems(id='rend-percentil', options=[{'label': k, 'value': k} for k in PERCENTILES], value='p95', inline=True),
+            ])), width=12, md=3, className="mb-3"),
+            dbc.Col(dbc.Card(dbc.CardBody([
+                html.Label('Callbacks:', className="card-title mb-2"),
+                dcc.Dropdown(id='rend-dropdown-callbacks', multi=True, placeholder="Los más invocados"),
+            ])), width=12, md=5, className="mb-3"),
+        ], className="align-items-stretch"),
+        dbc.Row(id='rend-kpis', className="mb-3 g-3"),
+        dbc.Row(dbc.Col(dbc.Card(dbc.CardBody([
+            html.H5("Latencia por Callback", className="card-title text-center mb-3"),
+            dcc.Graph(id='rend-grafico-latencias', config={'displayModeBar': False}),
+        ])), width=12, className="mb-3")),
+        dbc.Row(dbc.Col(dbc.Card([
+            dbc.CardHeader("Resumen por Callback (ventana seleccionada)"),
+            dbc.CardBody(html.Div(id='rend-tabla-callbacks')),
+        ]), width=12, className="mb-3")),
+        dbc.Row([
+            dbc.Col(dbc.Card([
+                dbc.CardHeader("Cachés en Memoria"),
+                dbc.CardBody(html.Div(id='rend-tabla-caches')),
+            ], className="h-100"), width=12, lg=7, className="mb-3"),
+            dbc.Col(dbc.Card([
+                dbc.CardHeader("Recargas del Dataset"),
+                dbc.CardBody(html.Div(id='rend-tabla-recargas')),
+            ], className="h-100"), width=12, lg=5, className="mb-3"),
+        ], className="align-items-stretch"),
+        dbc.Row(dbc.Col(dbc.Card(dbc.CardBody([
+            html.H5("Memoria del Worker", className="card-title text-center mb-3"),
+            dcc.Graph(id='rend-grafico-memoria', config={'displayModeBar': False}),
+        ])), width=12, className="mb-3")),
+        dbc.Row(dbc.Col(html.Div(id='rend-nota', className="text-muted small text-center mb-3"))),
+    ], fluid=True, className="dbc mt-4")
+
+
+def _kpi_card(titulo, valor):
+    return dbc.Col(dbc.Card(dbc.CardBody([
+        html.P(titulo, className="card-text text-center small text-muted mb-1"),
+        html.H4(valor, className="text-center fw-bold"),
+    ]), className="h-100"), width=6, md=True)
+
+
+def _formato_mb(valor):
+    return f"{valor / 2**20:,.1f} MB" if valor is not None else "N/A"
+
+
+def _formato_ms(valor):
+    return f"{valor * 1000:,.0f}" if valor is not None and pd.notna(valor) else "N/A"
+
+
+def _tabla(df):
+    return dbc.Table.from_dataframe(df, striped=True, bordered=True, hover=True, responsive=True, class_name="align-middle small")
+
+
+def _figura_vacia(texto="Sin datos"):
+    fig = go.Figure()
+    fig.update_layout(title_text=texto, xaxis=dict(visible=False), yaxis=dict(visible=False), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', height=350)
+    return fig
+
+
+# --- Callbacks ---
+@callback(
+    Output('rend-kpis', 'children'),
+    Output('rend-dropdown-callbacks', 'options'),
+    Output('rend-grafico-latencias', 'figure'),
+    Output('rend-tabla-callbacks', 'children'),
+    Output('rend-tabla-caches', 'children'),
+    Output('rend-tabla-recargas', 'children'),
+    Output('rend-grafico-memoria', 'figure'),
+    Output('rend-nota', 'children'),
+    Input('rend-intervalo', 'n_intervals'),
+    Input('rend-ventana', 'value'),
+    Input('rend-percentil', 'value'),
+    Input('rend-dropdown-callbacks', 'value'),
+)
+def update_rendimiento_page(_n_intervals, ventana, percentil, callbacks_seleccionados):
+    try:
+        segundos_ventana = VENTANAS.get(ventana)
+        desde = time.time() - segundos_ventana if segundos_ventana else None
+        registro = invocaciones(desde)
+        resumen = resumen_callbacks(registro)
+        nombres = sorted(r['callback'] for r in resumen)
+
+        # KPIs: dataset vigente, última recarga, memoria y volumen de la ventana
+        recargas = historial_recargas()
+        ultima = recargas[-1] if recargas else None
+        kpis = [
+            _kpi_card("Versión del Dataset", ultima['version'] if ultima else "N/A"),
+            _kpi_card("Última Recarga", f"{ultima['segundos']:.2f} s" if ultima else "N/A"),
+            _kpi_card("Memoria del Worker", _formato_mb(memoria_proceso())),
+            _kpi_card("Invocaciones", f"{sum(r['invocaciones'] for r in resumen):,}"),
+            _kpi_card("Perfilado de Memoria", "Activo" if perfilado_activo() else "Inactivo"),
+        ]
+
+        # Latencia en el tiempo (percentil elegido por intervalo)
+        serie = serie_latencias(registro, FRECUENCIAS_VENTANA.get(ventana, '1min'), PERCENTILES.get(percentil, 95))
+        if callbacks_seleccionados:
+            serie = serie[serie['callback'].isin(callbacks_seleccionados)]
+        else:
+            mas_invocados = sorted(resumen, key=lambda r: r['invocaciones'], reverse=True)[:MAX_CALLBACKS_GRAFICO]
+            serie = serie[serie['callback'].isin([r['callback'] for r in mas_invocados])]
+        if serie.empty:
+            fig_latencias = _figura_vacia("Sin invocaciones registradas en la ventana")
+        else:
+            serie = serie.assign(ms=serie['segundos'] * 1000)
+            fig_latencias = px.line(serie, x='instante', y='ms', color='callback', markers=True,
+                                    labels={'instante': 'Hora', 'ms': f'Latencia {percentil} (ms)', 'callback': 'Callback'},
+                                    hover_data={'invocaciones': True})
+            fig_latencias.update_layout(height=400, margin=dict(t=10, b=20, l=20, r=10), legend=dict(orientation='h', yanchor='top', y=-0.15),
+                                        paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
+
+        # Tabla por callback (más lentos primero)
+        if resumen:
+            por_latencia = sorted(resumen, key=lambda r: r['p95_s'], reverse=True)
+            tabla_callbacks = _tabla(pd.DataFrame({
+                'Callback': [r['callback'] for r in por_latencia],
+                'Invocaciones': [r['invocaciones'] for r in por_latencia],
+                'p50 (ms)': [_formato_ms(r['p50_s']) for r in por_latencia],
+                'p95 (ms)': [_formato_ms(r['p95_s']) for r in por_latencia],
+                'p99 (ms)': [_formato_ms(r['p99_s']) for r in por_latencia],
+                'Máx (ms)': [_formato_ms(r['max_s']) for r in por_latencia],
+                'Errores': [r['errores'] for r in por_latencia],
+                'Pico Memoria': [_formato_mb(r['pico_max_bytes']) for r in por_latencia],
+            }))
+        else:
+            tabla_callbacks = html.Div("Sin invocaciones registradas en la ventana.")
+
+        # Cachés: aciertos acumulados desde que arrancó el worker
+        caches = estadisticas_caches()
+        tabla_caches = _tabla(pd.DataFrame({
+            'Caché': [c['cache'] for c in caches],
+            'Entradas': [f"{c['entradas']}/{c['max_entradas']}" for c in caches],
+            'Aciertos': [c['aciertos'] for c in caches],
+            'Fallos': [c['fallos'] for c in caches],
+            'Tasa Aciertos': [f"{c['tasa_aciertos'] * 100:.1f}%" if c['tasa_aciertos'] is not None else "N/A" for c in caches],
+        })) if caches else html.Div("Sin cachés cargados.")
+
+        # Recargas del dataset (la más reciente arriba)
+        tabla_recargas = _tabla(pd.DataFrame({
+            'Hora': [datetime.fromtimestamp(r['instante']).strftime('%d/%m %H:%M:%S') for r in reversed(recargas)],
+            'Versión': [r['version'] for r in reversed(recargas)],
+            'Duración (s)': [f"{r['segundos']:.2f}" for r in reversed(recargas)],
+            'Archivos': [f"{r['parseados']}/{r['archivos']}" for r in reversed(recargas)],
+            'Filas': [f"{r['filas']:,}" for r in reversed(recargas)],
+        })) if recargas else html.Div("Sin recargas registradas.")
+
+        # Memoria residente del worker en el tiempo
+        muestras = [m for m in muestras_memoria() if m['rss_bytes'] is not None and (desde is None or m['instante'] >= desde)]
+        if muestras:
+            df_memoria = pd.DataFrame({'Hora': [datetime.fromtimestamp(m['instante']) for m in muestras],
+                                       'MB': [m['rss_bytes'] / 2**20 for m in muestras]})
+            fig_memoria = px.area(df_memoria, x='Hora', y='MB', labels={'MB': 'Memoria residente (MB)'})
+            fig_memoria.update_layout(height=300, margin=dict(t=10, b=20, l=20, r=10), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
+        else:
+            fig_memoria = _figura_vacia("Sin muestras de memoria (requiere psutil)")
+
+        nota = (f"Métricas del worker PID {os.getpid()} (con varios workers cada uno lleva las suyas). "
+                "Los callbacks en segundo plano se miden por el pedido que los inicia; sus sondeos no se cuentan. "
+                "Pico de memoria solo con el perfilado activo (/api/memoria/perfilado).")
+        return kpis, [{'label': n, 'value': n} for n in nombres], fig_latencias, tabla_callbacks, tabla_caches, tabla_recargas, fig_memoria, nota
+    except Exception as e:
+        print(f"Error en update_rendimiento_page: {e}")
+        traceback.print_exc()
+        return [], [], _figura_vacia("Error"), html.Div("Error al leer las métricas."), html.Div(), html.Div(), _figura_vacia("Error"), ""